@@ -0,0 +1,45 @@
+import threading
+import time
+
+import requests
+
+RETRY_SECONDS = 5
+
+
+def listen_for_changes(url, on_change, is_active, delay=0.5):
+    """Call on_change for the events of the server-sent event stream at url, in a background thread.
+
+    Events within `delay` seconds of each other lead to one call. After a lost
+    connection it reconnects and calls on_change, since events are not replayed.
+    Stops once is_active() returns False, or when the server has no event stream.
+    """
+    timer = None
+
+    def changed():
+        nonlocal timer
+        if timer is None or not timer.is_alive():
+            timer = threading.Timer(delay, lambda: is_active() and on_change())
+            timer.daemon = True
+            timer.start()
+
+    def run():
+        reconnect = False
+        while is_active():
+            try:
+                with requests.get(url, stream=True, timeout=(5, 60)) as res:
+                    if res.status_code == 404:
+                        return
+                    res.raise_for_status()
+                    if reconnect:
+                        changed()
+                    reconnect = True
+                    for line in res.iter_lines(chunk_size=None, decode_unicode=True):
+                        if not is_active():
+                            return
+                        if line.startswith("event:"):
+                            changed()
+            except requests.RequestException:
+                reconnect = True
+            time.sleep(RETRY_SECONDS)
+
+    threading.Thread(target=run, daemon=True).start()
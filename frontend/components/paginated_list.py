@@ -1,8 +1,10 @@
 import flet as ft
 import math
 import requests
+import threading
 from urllib.parse import urlencode, urlparse, urlunparse, parse_qs
 from frontend.components.key import GOOGLE_API_KEY
+from components.live_updates import listen_for_changes
 
 
 def search_google_places(query):
@@ -215,6 +217,8 @@ def paginated_list_view(
     p_color=None,
     ab_color=None,
     but_color=None,
+    list_params=None,
+    events_url=None,
 ):
     container = ft.Column()
     items_column = ft.Column()
@@ -228,7 +232,11 @@ def paginated_list_view(
     search_term = ""
     next_page_url = None
     prev_page_url = None
-    current_page_url = api_base_url
+    # Extra query parameters for the list only, e.g. {"fields": "id,subject"}
+    list_url = f"{api_base_url}?{urlencode(list_params)}" if list_params else api_base_url
+    current_page_url = list_url
+    # ETag and data per page url, so unchanged pages are not downloaded again
+    page_cache = {}
 
     total_results_text = ft.Text()
     page_status_text = ft.Text()
@@ -264,7 +272,7 @@ def paginated_list_view(
     def load_items(url=None):
         nonlocal next_page_url, prev_page_url, current_page_url, render_header
         if not url:
-            url = api_base_url
+            url = list_url
         current_page_url = update_urls_with_search(url)
         items_column.controls.clear()
 
@@ -272,9 +280,16 @@ def paginated_list_view(
             items_column.controls.append(render_header)
 
         try:
-            res = requests.get(current_page_url)
-            res.raise_for_status()
-            data = res.json()
+            cached = page_cache.get(current_page_url)
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            res = requests.get(current_page_url, headers=headers)
+            if res.status_code == 304:
+                data = cached[1]
+            else:
+                res.raise_for_status()
+                data = res.json()
+                if res.headers.get("ETag"):
+                    page_cache[current_page_url] = (res.headers["ETag"], data)
             items = data.get("results", data)
             total_count = data.get("count", len(items))
             page_size = data.get("page_size", len(items))
@@ -283,7 +298,8 @@ def paginated_list_view(
             current_page_num = int(parse_qs(parsed_url.query).get("page", [1])[0])
             total_pages = math.ceil(total_count / page_size)
 
-            total_results_text.value = f"Aantal {title.lower()}: {total_count}"
+            approximate = "~" if data.get("count_is_approximate") else ""
+            total_results_text.value = f"Aantal {title.lower()}: {approximate}{total_count}"
             page_status_text.value = f"Pagina {current_page_num} van {total_pages}"
 
             for item in items:
@@ -304,7 +320,7 @@ def paginated_list_view(
     def on_search(_):
         nonlocal search_term
         search_term = search_input.value.strip()
-        load_items(api_base_url)
+        load_items(list_url)
 
     def delete_item(item_id):
         def confirm_delete(_):
@@ -476,4 +492,9 @@ def paginated_list_view(
     ])
 
     load_items()
+    if events_url:
+        # Reload the current page when the server reports changes, until the view is replaced
+        unmounted = threading.Event()
+        container.will_unmount = unmounted.set
+        listen_for_changes(events_url, lambda: load_items(current_page_url), lambda: not unmounted.is_set())
     return container
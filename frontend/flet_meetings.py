@@ -8,6 +8,7 @@ from components.error import error_container, show_error, hide_error
 from utilities import render_row, render_task_header
 
 API_BASE_URL = "http://127.0.0.1:8000/api/tasks/meetings/"
+EVENTS_URL = "http://127.0.0.1:8000/api/events/meetings/"
 ROOMS_URL = "http://127.0.0.1:8000/api/tasks/meetingrooms/"
 CONTACTS_URL = "http://127.0.0.1:8000/api/contextcontacts/"
 
@@ -89,47 +90,16 @@ def build_meeting_form(current_data, on_submit, on_cancel, page):
     def load_contacts():
         """Load available contacts from API"""
         try:
-            print("Loading contacts...")  # Debug print
-
-            # Load all contacts from paginated API
-            all_contacts = []
-            next_url = CONTACTS_URL
-
-            while next_url:
-                res = requests.get(next_url)
-                res.raise_for_status()
-                data = res.json()
-
-                contacts = data.get("results", [])
-                all_contacts.extend(contacts)
-
-                # Get next page URL
-                next_url = data.get("next")
-                print(f"Loaded {len(contacts)} contacts from current page, total: {len(all_contacts)}")
-
-            print(f"Loaded {len(all_contacts)} total contacts")  # Debug print
-
-            # Create dropdown options using firstname and lastname
-            contacts_dropdown.options = []
-            for cont in all_contacts:
-                cont_id = cont.get("id")
-                if cont_id is None:
-                    continue
-
-                cont_name = cont.get("contextcontact_name", "").strip()
-
-                # Ensure both values are strings to satisfy type checker
-                contact_id_str = str(cont_id)
-                contact_name_str = cont_name or f"Contact {contact_id_str}"
-
-                contacts_dropdown.options.append(
-                    ft.dropdown.Option(contact_id_str, contact_name_str)
-                )
+            # All [id, naam] pairs in one response, already sorted on naam
+            res = requests.get(CONTACTS_URL + "options/")
+            res.raise_for_status()
+            pairs = res.json()
 
-            # Sort contacts by name for better UX
-            contacts_dropdown.options.sort(key=lambda x: x.text)
+            contacts_dropdown.options = [
+                ft.dropdown.Option(str(cont_id), name or f"Contact {cont_id}")
+                for cont_id, name in pairs
+            ]
 
-            print(f"Created {len(contacts_dropdown.options)} dropdown options")  # Debug print
             page.update()
         except requests.exceptions.RequestException as err1:
             show_error(f"Fout bij laden contacten: {err1}", error_container, page)
@@ -138,22 +108,12 @@ def build_meeting_form(current_data, on_submit, on_cancel, page):
 
     def load_meeting_rooms():
         try:
-            print("Loading meeting rooms...")  # Debug print
-            res = requests.get(ROOMS_URL)
+            res = requests.get(ROOMS_URL + "options/")
             res.raise_for_status()
-            data = res.json()
-            rooms = data.get("results", data)
-
-            # Ensure rooms is a list
-            if not isinstance(rooms, list):
-                rooms = []
-
             room_dropdown.options = [
-                ft.dropdown.Option(str(r["id"]), r["name"])
-                for r in rooms
-                if "id" in r and "name" in r  # Safety check
+                ft.dropdown.Option(str(room_id), name)
+                for room_id, name in res.json()
             ]
-            print(f"Loaded {len(room_dropdown.options)} meeting rooms")  # Debug print
             page.update()
 
         except requests.exceptions.RequestException as err1:
@@ -420,4 +380,5 @@ def meetings_view(page: ft.Page):
         p_color=p_color,
         ab_color=ab_color,
         but_color=but_color,
+        events_url=EVENTS_URL,
     )
@@ -5,6 +5,7 @@ from components.error import error_container, show_error, hide_error
 from utilities import render_row, render_task_header
 
 API_BASE_URL = "http://127.0.0.1:8000/api/tasks/projects/"
+EVENTS_URL = "http://127.0.0.1:8000/api/events/projects/"
 
 p_color = ft.Colors.PINK_50
 ab_color = ft.Colors.PINK_500
@@ -66,4 +67,5 @@ def projects_view(page: ft.Page):
         p_color=p_color,
         ab_color=ab_color,
         but_color=but_color,
+        events_url=EVENTS_URL,
     )
@@ -8,6 +8,7 @@ from components.error import error_container, show_error, hide_error
 from utilities import render_row, render_task_header
 
 API_BASE_URL = "http://127.0.0.1:8000/api/tasks/tasks/"
+EVENTS_URL = "http://127.0.0.1:8000/api/events/tasks/"
 PROJECTS_URL = "http://127.0.0.1:8000/api/tasks/projects/"
 CONTEXTCONTACTS_URL = "http://127.0.0.1:8000/api/contextcontacts/"
 
@@ -50,13 +51,11 @@ def build_task_form(current_data, on_submit, on_cancel, page):
         page.update()
 
         try:
-            res = requests.get(PROJECTS_URL, timeout=5)
+            res = requests.get(PROJECTS_URL + "options/", timeout=5)
             res.raise_for_status()
-            data = res.json()
-            projects = data.get("results", data)
             project_input.options = [
-                ft.dropdown.Option(key=str(project["id"]), text=project["name"])
-                for project in projects
+                ft.dropdown.Option(key=str(project_id), text=name)
+                for project_id, name in res.json()
             ]
             project_input.hint_text = "Selecteer een project..."
         except requests.RequestException as e:
@@ -73,19 +72,12 @@ def build_task_form(current_data, on_submit, on_cancel, page):
         page.update()
 
         try:
-            all_contextcontacts = []
-            url = CONTEXTCONTACTS_URL  # Start with the first page
-
-            while url:
-                res = requests.get(url, timeout=5)
-                res.raise_for_status()
-                data = res.json()
-                all_contextcontacts.extend(data.get("results", data))
-                url = data.get("next")  # DRF provides next page URL
-
+            # All [id, naam] pairs in one response, already sorted on naam
+            res = requests.get(CONTEXTCONTACTS_URL + "options/", timeout=5)
+            res.raise_for_status()
             assignment_input.options = [
-                ft.dropdown.Option(key=str(contact["id"]), text=contact["contextcontact_name"])
-                for contact in all_contextcontacts
+                ft.dropdown.Option(key=str(contact_id), text=name)
+                for contact_id, name in res.json()
             ]
             assignment_input.hint_text = "Selecteer een verantwoordelijke..."
         except requests.RequestException as e:
@@ -190,4 +182,6 @@ def tasks_view(page: ft.Page):
         p_color=p_color,
         ab_color=ab_color,
         but_color=but_color,
+        list_params={"fields": ",".join(["id", *FIELD_LABELS, "project_name", "contextcontact_name"])},
+        events_url=EVENTS_URL,
     )
@@ -0,0 +1,4 @@
+"""Helpers shared by the ``contacts`` and ``tasks`` apps: search filters, pagination, view mixins and bulk I/O.
+
+Not an app of its own; nothing here imports the models of either app, so both can build on it.
+"""
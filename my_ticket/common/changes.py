@@ -0,0 +1,92 @@
+"""Change feed of the synced tables, for clients that sync by delta.
+
+Database triggers (installed by migration 0032 of ``tasks``) keep one
+``tasks.Change`` row per object. Every statement that writes an object, or a
+row that is part of it (a task's tags, a meeting's participants), moves that
+row to a new position ``(txid, seq)``: the id of the writing transaction and
+a sequence number. A delete leaves the row behind as a tombstone. Because the
+triggers run in the database, ``update()``, ``bulk_create`` and imports are
+recorded as well.
+
+Transactions can commit in another order than they wrote, so a change is
+only served once every transaction that could still write before it has
+finished: its ``txid`` must lie below the ``xmin`` of the current snapshot.
+No commit can then land behind a cursor that was already handed out. The
+``(model, txid, seq)`` index answers the feed query.
+
+:func:`latest_change` sums up the rows of a set of objects in one aggregate,
+as the validator of a conditional GET.
+"""
+from django.apps import apps
+from django.db import connection
+from django.db.models import Max, Q, Sum
+
+# The models whose writes the triggers of migration 0032 record.
+RECORDED = {
+    'tasks.task', 'tasks.meeting', 'tasks.project', 'tasks.action', 'tasks.context', 'tasks.state', 'tasks.tag',
+    'tasks.tasktype', 'tasks.meetingacceptance', 'tasks.meetingroom', 'contacts.contact', 'contacts.contextcontact',
+    'contacts.address',
+}
+
+
+def change_model():
+    # Looked up when needed, so that importing this module loads no app's models.
+    return apps.get_model('tasks', 'Change')
+
+
+def is_recorded(model):
+    return model._meta.label_lower in RECORDED
+
+
+def related_model(model, path):
+    """The model at the end of the foreign key ``path`` (``assignment__contact``) from ``model``."""
+    for name in path.split('__'):
+        model = model._meta.get_field(name).related_model
+    return model
+
+
+def parse_cursor(value):
+    """``(txid, seq)`` from a cursor written by :func:`format_cursor`; an empty cursor is the start."""
+    if not value:
+        return 0, 0
+    txid, separator, seq = value.partition('.')
+    if not separator:
+        raise ValueError(value)
+    return int(txid), int(seq)
+
+
+def format_cursor(txid, seq):
+    return f'{txid}.{seq}'
+
+
+def changes_since(model, after, limit):
+    """Up to ``limit`` changes to ``model`` after the ``(txid, seq)`` ``after``, oldest first.
+
+    Rows are ``(object_id, deleted, txid, seq)``.
+    """
+    sql = f"""
+        SELECT object_id, deleted, txid, seq FROM {change_model()._meta.db_table}
+        WHERE model = %s AND (txid, seq) > (%s, %s)
+            AND txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        ORDER BY txid, seq
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.label_lower, *after, limit])
+        return cursor.fetchall()
+
+
+def latest_change(model, ids, relations=()):
+    """``(state, changed_at)`` of the objects ``ids`` and of the rows they point to through ``relations``.
+
+    Every write moves a row to a new, higher ``seq``, so the sum of the
+    ``seq`` of a fixed set of rows grows with each write to one of them.
+    ``relations`` are foreign key paths to recorded models.
+    """
+    condition = Q(model=model._meta.label_lower, object_id__in=ids)
+    objects = model._default_manager.filter(pk__in=ids)
+    for path in relations:
+        related = objects.filter(**{f'{path}__isnull': False}).values(path)
+        condition |= Q(model=related_model(model, path)._meta.label_lower, object_id__in=related)
+    latest = change_model().objects.filter(condition).aggregate(state=Sum('seq'), changed_at=Max('changed_at'))
+    return latest['state'], latest['changed_at']
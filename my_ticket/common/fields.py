@@ -0,0 +1,60 @@
+"""Relation fields that take their objects from a lookup done for the whole request."""
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ManyRelatedField that looks up all submitted primary keys in one query, unless they were primed."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        if child.pk_field is not None:
+            data = [child.pk_field.to_internal_value(item) for item in data]
+        objects = child.primed_objects()
+        if any(isinstance(item, bool) or str(item) not in objects for item in data):
+            try:
+                objects = child.get_queryset().in_bulk(data)
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(data).__name__)
+            objects = {str(pk): obj for pk, obj in objects.items()}
+
+        result = []
+        for item in data:
+            if isinstance(item, bool) or str(item) not in objects:
+                child.fail('does_not_exist', pk_value=item)
+            result.append(objects[str(item)])
+        return result
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that takes objects looked up in advance from ``context['primed']``.
+
+    ``context['primed'][field_name]`` maps primary keys, as strings, to their
+    objects (see ``common.mixins.BatchMixin``). Keys that are not there are
+    looked up as usual, so errors stay the same.
+    """
+
+    def primed_objects(self):
+        # The child of a many relation is bound without a name of its own.
+        name = self.field_name or self.parent.field_name
+        return self.context.get('primed', {}).get(name, {})
+
+    def to_internal_value(self, data):
+        if self.pk_field is None and not isinstance(data, bool):
+            obj = self.primed_objects().get(str(data))
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -0,0 +1,88 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from rest_framework import filters
+
+
+def search_vector(*fields, config='simple'):
+    """The tsvector over ``fields``, as used by both the GIN indexes and the filter.
+
+    The index is only used when the expression in the query is identical to
+    the indexed one, so models declare their index with this helper and the
+    same fields, in the same order, as the viewset's ``search_fields``.
+    """
+    return SearchVector(*fields, config=config)
+
+
+def trigram_expression(*fields):
+    """The text that trigram indexes and :class:`TrigramSimilarityFilter` compare.
+
+    Several fields are joined with spaces, e.g. ``firstname lastname``. As with
+    :func:`search_vector`, the index and the view must use the same fields.
+    """
+    if len(fields) == 1:
+        return F(fields[0])
+    parts = [F(fields[0])]
+    for field in fields[1:]:
+        parts += [Value(' '), F(field)]
+    return Concat(*parts)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """PostgreSQL full-text search over the view's ``search_fields``.
+
+    Every word in ``?search=`` is matched as a prefix (``word:*``), so partial
+    input works for search-as-you-type. Results are ordered by rank, unless the
+    client asked for an explicit ``?ordering=``.
+    """
+    search_config = 'simple'
+    rank_annotation = 'search_rank'
+
+    def get_search_query(self, request):
+        words = re.findall(r'\w+', request.query_params.get(self.search_param, ''))
+        if not words:
+            return None
+        return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=self.search_config)
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        query = self.get_search_query(request)
+        if not search_fields or query is None:
+            return queryset
+
+        vector = search_vector(*search_fields, config=self.search_config)
+        queryset = queryset.alias(search_vector=vector).filter(search_vector=query).annotate(
+            **{self.rank_annotation: SearchRank(vector, query)}
+        )
+
+        if filters.OrderingFilter.ordering_param in request.query_params:
+            return queryset
+        return queryset.order_by(f'-{self.rank_annotation}', *queryset.query.order_by)
+
+
+class TrigramSimilarityFilter(filters.BaseFilterBackend):
+    """Fuzzy matching over the view's ``trigram_fields`` with ``?fuzzy=``.
+
+    Uses the pg_trgm word similarity operator, which a ``gin_trgm_ops`` index
+    on :func:`trigram_expression` can answer, so typos and partial names are
+    found without scanning the table. Results are ordered by similarity.
+    """
+    fuzzy_param = 'fuzzy'
+    similarity_annotation = 'similarity'
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'trigram_fields', None)
+        term = request.query_params.get(self.fuzzy_param, '').strip()
+        if not fields or not term:
+            return queryset
+        return self.search(queryset, term, fields)
+
+    def search(self, queryset, term, fields):
+        expression = trigram_expression(*fields)
+        return queryset.alias(trigram_target=expression).filter(
+            trigram_target__trigram_word_similar=term
+        ).annotate(
+            **{self.similarity_annotation: TrigramWordSimilarity(term, expression)}
+        ).order_by(f'-{self.similarity_annotation}', 'pk')
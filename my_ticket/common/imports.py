@@ -0,0 +1,508 @@
+"""Bulk import of CSV or NDJSON files through ``COPY`` and set-based SQL.
+
+The file is streamed with ``COPY`` into a temporary staging table of text
+columns, one row per line; lines that cannot be parsed are set aside on the
+way. The rest happens in a few statements over the whole table: values are
+checked with ``pg_input_is_valid`` (PostgreSQL 16+), references are resolved
+by natural key (the name of a project, the ``contextcontact_name`` of a
+context contact, an address as ``str()`` writes it) and the valid rows are
+upserted. A line with an ``id`` (as exported) updates that row; a line without
+one updates the row with its key, or is inserted when there is none. Keys are
+not unique, so a line whose key matches several rows is rejected, as is an
+unknown ``id``. When several lines are for the same row the last one wins.
+Only the columns in the file are written; the others keep their value or
+default. A line that would repeat a unique combination (a cycle occurrence
+of a task) of another row or of an earlier line is rejected.
+
+What a table takes is described by a :class:`Spec`; the apps keep theirs in
+their own ``imports`` module. The import is one transaction. Rejected lines
+are reported with their number and reason instead of failing it.
+"""
+import codecs
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from rest_framework.parsers import BaseParser
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 100
+STAGING = 'import_staging'
+ROWS = 'import_rows'
+TEXT_FIELDS = {'CharField', 'TextField', 'EmailField', 'URLField', 'SlugField', 'FileField'}
+
+Reference = namedtuple('Reference', ['field', 'key'])
+Upload = namedtuple('Upload', ['stream', 'format'])
+
+
+class InvalidFile(Exception):
+    pass
+
+
+class Spec:
+    """What can be imported into ``model``.
+
+    ``columns`` are model fields, ``references`` map a column to a foreign key
+    and the expression (on the related model) its text is matched against, and
+    ``key`` lists the fields an existing row is found by when a line has no
+    ``id``. Text may be empty,
+    as the database allows, except in the ``required`` fields. ``unique`` lists
+    the field combinations no two rows may share once none of them is null.
+    """
+
+    def __init__(self, model, columns, key, references=None, required=(), unique=(), after=None):
+        self.model = model
+        self.columns = columns
+        self.key = key
+        self.references = references or {}
+        self.required = required
+        self.unique = unique
+        self.after = after
+
+    def is_required(self, field):
+        """Whether a value must be given: text in ``required``, or ``NOT NULL`` without a default."""
+        if field.primary_key:
+            return False
+        if is_text(field):
+            return field.name in self.required
+        automatic = getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        return not (field.null or field.has_default() or automatic)
+
+    def column_of(self, field_name):
+        for column, reference in self.references.items():
+            if reference.field == field_name:
+                return column
+        return field_name
+
+
+def lines(stream, size=1 << 16):
+    """The lines of a binary UTF-8 ``stream``, read ``size`` bytes at a time."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(size)
+        pending += decoder.decode(chunk, final=not chunk)
+        *complete, pending = pending.split('\n')
+        for line in complete:
+            yield line + '\n'
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def csv_records(stream):
+    """``(header, records)``; the records are ``(line, values or None, error)``."""
+    reader = csv.reader(lines(stream))
+    header = next(reader, None)
+    if not header:
+        raise InvalidFile("Het bestand is leeg.")
+    header = [name.strip() for name in header]
+
+    def records():
+        for values in reader:
+            if not values:
+                continue
+            if len(values) != len(header):
+                yield reader.line_num, None, f"{len(values)} waarden voor {len(header)} kolommen"
+            else:
+                yield reader.line_num, values, None
+    return header, records()
+
+
+def text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value)
+
+
+def ndjson_records(stream):
+    """As :func:`csv_records`; the keys of the first object are the header."""
+    numbered = ((number, line) for number, line in enumerate(lines(stream), 1) if line.strip())
+
+    def parse(line):
+        try:
+            item = json.loads(line)
+        except ValueError:
+            return None, "geen geldige JSON"
+        if not isinstance(item, dict):
+            return None, "geen JSON-object"
+        return item, None
+
+    first = next(numbered, None)
+    if first is None:
+        raise InvalidFile("Het bestand is leeg.")
+    item, error = parse(first[1])
+    if item is None:
+        raise InvalidFile(f"Regel {first[0]}: {error}.")
+    header = list(item)
+
+    def records():
+        yield from convert(first[0], item)
+        for number, line in numbered:
+            parsed, error = parse(line)
+            if parsed is None:
+                yield number, None, error
+            else:
+                yield from convert(number, parsed)
+
+    def convert(number, parsed):
+        extra = [key for key in parsed if key not in header]
+        if extra:
+            yield number, None, f"onbekende kolom {extra[0]}"
+        else:
+            yield number, [text(parsed.get(name)) for name in header], None
+    return header, records()
+
+
+def staging_chunks(records, positions, rejected_width):
+    """The records as CSV for ``COPY``, ``CHUNK_SIZE`` rows per chunk: line, error and the kept values."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    empty = [None] * rejected_width
+    for count, (line, values, error) in enumerate(records, 1):
+        writer.writerow([line, error, *empty] if values is None else [line, None, *(values[i] for i in positions)])
+        if count % CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class ChunkReader:
+    """A file for psycopg2's ``copy_expert`` that hands out one chunk per ``read()``."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def read(self, size=-1):
+        return next(self.chunks, '')
+
+
+def copy_from(cursor, sql, chunks):
+    if is_psycopg3:
+        with cursor.copy(sql) as copy:
+            for chunk in chunks:
+                copy.write(chunk)
+    else:
+        cursor.copy_expert(sql, ChunkReader(chunks))
+
+
+def is_text(field):
+    return field.get_internal_type() in TEXT_FIELDS
+
+
+def value_sql(field, staged):
+    """The typed value of a staged text column, with its params."""
+    if is_text(field):
+        return (f"NULLIF({staged}, '')" if field.null else f"COALESCE({staged}, '')"), []
+    value = f"NULLIF({staged}, '')::{field.db_type(connection)}"
+    if not field.null and field.has_default():
+        return f"COALESCE({value}, %s)", [field.get_db_prep_save(field.get_default(), connection)]
+    return value, []
+
+
+class Import:
+    """One run of :func:`load`; the steps share the columns and SQL fragments."""
+
+    def __init__(self, spec, header):
+        self.spec = spec
+        self.fields = {field.name: field for field in spec.model._meta.concrete_fields}
+        self.pk = spec.model._meta.pk
+        self.columns = [
+            name for name in dict.fromkeys(header)
+            if name in spec.columns or name in spec.references or name == self.pk.name
+        ]
+        self.positions = [header.index(name) for name in self.columns]
+        self.ignored = [name for name in header if name not in self.columns]
+        self.references = {name: spec.references[name] for name in self.columns if name in spec.references}
+
+        missing = []
+        for name, field in self.fields.items():
+            column = spec.column_of(name)
+            needed = spec.is_required(field) or name in spec.key and not field.null
+            if needed and column not in self.columns and (column in spec.columns or column in spec.references):
+                missing.append(column)
+        if missing:
+            raise InvalidFile(f"Kolom ontbreekt: {', '.join(missing)}.")
+
+    @staticmethod
+    def quote(name):
+        return connection.ops.quote_name(name)
+
+    def field_of(self, column):
+        return self.fields[self.references[column].field] if column in self.references else self.fields[column]
+
+    def create_staging(self, cursor):
+        definitions = ['line bigint', 'error text', *(f'{self.quote(name)} text' for name in self.columns)]
+        definitions += [f'{self.quote(self.field_of(name).column)} bigint' for name in self.references]
+        cursor.execute(f'DROP TABLE IF EXISTS {STAGING}, {ROWS}')
+        cursor.execute(f'CREATE TEMPORARY TABLE {STAGING} ({", ".join(definitions)}) ON COMMIT DROP')
+
+    def copy(self, cursor, records):
+        names = ', '.join(['line', 'error', *map(self.quote, self.columns)])
+        chunks = staging_chunks(records, self.positions, len(self.columns))
+        copy_from(cursor, f'COPY {STAGING} ({names}) FROM STDIN WITH (FORMAT csv)', chunks)
+        cursor.execute(f'ANALYZE {STAGING}')
+
+    def check(self, cursor):
+        """Reject the rows with a missing, too long or malformed value."""
+        cases, params = [], []
+        for name in self.columns:
+            field, staged = self.field_of(name), f's.{self.quote(name)}'
+            if self.spec.is_required(field):
+                cases.append(f"WHEN COALESCE({staged}, '') = '' THEN %s")
+                params.append(f"{name} is verplicht")
+            if name in self.references:
+                continue
+            if is_text(field) and field.max_length:
+                cases.append(f"WHEN char_length({staged}) > {int(field.max_length)} THEN %s")
+                params.append(f"{name} is langer dan {field.max_length} tekens")
+            elif not is_text(field):
+                cases.append(f"WHEN {staged} <> '' AND NOT pg_input_is_valid({staged}, %s) THEN %s || {staged}")
+                params += [field.db_type(connection), f"ongeldige waarde voor {name}: "]
+        if cases:
+            error = f"CASE {' '.join(cases)} END"
+            cursor.execute(
+                f"UPDATE {STAGING} s SET error = {error} WHERE s.error IS NULL AND {error} IS NOT NULL", params * 2
+            )
+
+    def resolve(self, cursor):
+        """Fill in the foreign keys, matching each referenced text against its natural key in one join."""
+        for name, reference in self.references.items():
+            field, staged = self.field_of(name), f's.{self.quote(name)}'
+            target = self.quote(field.column)
+            lookup = field.related_model._default_manager.order_by().annotate(import_key=reference.key).values(
+                'import_key'
+            ).annotate(import_id=Min('pk'), import_matches=Count('pk'))
+            sql, params = lookup.query.sql_with_params()
+            cursor.execute(f"""
+                UPDATE {STAGING} s SET
+                    {target} = CASE WHEN r.import_matches = 1 THEN r.import_id END,
+                    error = CASE WHEN r.import_matches > 1 THEN %s || {staged} END
+                FROM ({sql}) r
+                WHERE s.error IS NULL AND r.import_key = {staged}
+            """, [f"meerdere treffers voor {name}: ", *params])
+            cursor.execute(f"""
+                UPDATE {STAGING} s SET error = %s || {staged}
+                WHERE s.error IS NULL AND COALESCE({staged}, '') <> '' AND s.{target} IS NULL
+            """, [f"onbekende {name}: "])
+
+    def key_match(self, outer, inner):
+        conditions = []
+        for name in self.spec.key:
+            field = self.fields[name]
+            column = self.quote(field.column)
+            if self.spec.column_of(name) not in self.columns:
+                conditions.append(f'{outer}.{column} IS NULL')
+            elif field.null:
+                empty = "''" if is_text(field) else '0'
+                conditions.append(f'COALESCE({outer}.{column}, {empty}) = COALESCE({inner}.{column}, {empty})')
+            else:
+                conditions.append(f'{outer}.{column} = {inner}.{column}')
+        return ' AND '.join(conditions)
+
+    def collect(self, cursor):
+        """Put the typed values of the valid rows in ``import_rows``, with the ``import_id`` they update."""
+        values, params = [], []
+        for name in self.columns:
+            field = self.field_of(name)
+            if name in self.references:
+                values.append(f's.{self.quote(field.column)}')
+            elif field is not self.pk:
+                sql, value_params = value_sql(field, f's.{self.quote(name)}')
+                values.append(f'{sql} AS {self.quote(field.column)}')
+                params += value_params
+        if self.pk.name in self.columns:
+            import_id = f"NULLIF(s.{self.quote(self.pk.name)}, '')::bigint"
+        else:
+            import_id = 'NULL::bigint'
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {ROWS} ON COMMIT DROP AS
+            SELECT s.line, {import_id} AS import_id, 0 AS import_matches, {', '.join(values)}
+            FROM {STAGING} s WHERE s.error IS NULL
+        """, params)
+        cursor.execute(f'ANALYZE {ROWS}')
+
+    def reject_rows(self, cursor, condition, error, params=()):
+        """Move the rows matching ``condition`` from ``import_rows`` to the rejected lines."""
+        cursor.execute(f"""
+            WITH rejected AS (DELETE FROM {ROWS} r WHERE {condition} RETURNING r.line, r.import_id)
+            UPDATE {STAGING} s SET error = {error} FROM rejected r WHERE s.line = r.line
+        """, params)
+
+    def match(self, cursor):
+        """Find the row each line updates: by ``id``, or else by key when exactly one row has it."""
+        table = self.quote(self.spec.model._meta.db_table)
+        pk = self.quote(self.pk.column)
+        cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        self.reject_rows(
+            cursor, f'r.import_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{pk} = r.import_id)',
+            '%s || r.import_id', [f"onbekende {self.pk.name}: "],
+        )
+        cursor.execute(f"""
+            UPDATE {ROWS} r SET import_id = m.id, import_matches = m.matches
+            FROM (
+                SELECT r.line, min(t.{pk}) AS id, count(*) AS matches
+                FROM {ROWS} r JOIN {table} t ON {self.key_match('t', 'r')}
+                WHERE r.import_id IS NULL
+                GROUP BY r.line
+            ) m
+            WHERE r.line = m.line
+        """)
+        key = ', '.join(self.spec.column_of(name) for name in self.spec.key)
+        self.reject_rows(cursor, 'r.import_matches > 1', '%s', [f"meerdere treffers voor {key}"])
+
+        # The last line per row, or per key for new rows.
+        keys = [
+            f'CASE WHEN import_id IS NULL THEN {self.quote(self.fields[name].column)} END'
+            for name in self.spec.key if self.spec.column_of(name) in self.columns
+        ]
+        cursor.execute(f"""
+            DELETE FROM {ROWS} WHERE line IN (
+                SELECT line FROM (
+                    SELECT line, row_number() OVER (PARTITION BY {', '.join(['import_id', *keys])} ORDER BY line DESC)
+                    FROM {ROWS}
+                ) lines WHERE row_number > 1
+            )
+        """)
+
+    def check_unique(self, cursor):
+        """Reject the rows that would share a ``unique`` combination with another row, or with an earlier line."""
+        table = self.quote(self.spec.model._meta.db_table)
+        pk = self.quote(self.pk.column)
+        for names in self.spec.unique:
+            columns = [self.quote(self.fields[name].column) for name in names]
+            # Fields missing from the file keep the value of the row the line updates.
+            values = [
+                f'r.{column}' if self.spec.column_of(name) in self.columns else f't.{column}'
+                for name, column in zip(names, columns)
+            ]
+            selected = ', '.join(f'{value} AS {column}' for value, column in zip(values, columns))
+            lines = f"""
+                SELECT r.line, r.import_id, {selected},
+                    row_number() OVER (PARTITION BY {', '.join(values)} ORDER BY r.line)
+                FROM {ROWS} r LEFT JOIN {table} t ON t.{pk} = r.import_id
+                WHERE {' AND '.join(f'{value} IS NOT NULL' for value in values)}
+            """
+            taken = ' AND '.join(f'o.{column} = u.{column}' for column in columns)
+            self.reject_rows(cursor, f"""r.line IN (
+                SELECT u.line FROM ({lines}) u
+                WHERE EXISTS (SELECT 1 FROM {table} o WHERE {taken} AND o.{pk} IS DISTINCT FROM u.import_id)
+            )""", '%s', [f"{' en '.join(names)} bestaan al"])
+            self.reject_rows(
+                cursor, f'r.line IN (SELECT u.line FROM ({lines}) u WHERE u.row_number > 1)',
+                '%s', [f"{' en '.join(names)} al eerder in het bestand"],
+            )
+
+    def upsert(self, cursor):
+        """Update the matched rows and insert the others; returns ``(inserted, updated, unchanged)``."""
+        table = self.quote(self.spec.model._meta.db_table)
+        pk = self.quote(self.pk.column)
+        present = [self.field_of(name).column for name in self.columns if name != self.pk.name]
+
+        # Rows that would not change are left alone, so importing a file again writes nothing.
+        changed = [self.quote(column) for column in present]
+        if changed:
+            sets = [f'{column} = r.{column}' for column in changed]
+            sets += [
+                f'{self.quote(field.column)} = now()'
+                for field in self.fields.values() if getattr(field, 'auto_now', False)
+            ]
+            cursor.execute(f"""
+                UPDATE {table} t SET {', '.join(sets)} FROM {ROWS} r
+                WHERE t.{pk} = r.import_id AND ({', '.join(f't.{column}' for column in changed)})
+                    IS DISTINCT FROM ({', '.join(f'r.{column}' for column in changed)})
+            """)
+            updated = cursor.rowcount
+        else:
+            updated = 0
+
+        columns, values, params = [], [], []
+        for field in self.fields.values():
+            if field.primary_key:
+                continue
+            if field.column in present:
+                values.append(f'r.{self.quote(field.column)}')
+            elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                values.append('now()')
+            elif not field.null:
+                values.append('%s')
+                params.append(field.get_db_prep_save(field.get_default(), connection))
+            else:
+                continue
+            columns.append(self.quote(field.column))
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            SELECT {', '.join(values)} FROM {ROWS} r
+            WHERE r.import_id IS NULL
+            ORDER BY r.line
+        """, params)
+        inserted = cursor.rowcount
+        cursor.execute(f'SELECT count(*) FROM {ROWS}')
+        return inserted, updated, max(cursor.fetchone()[0] - inserted - updated, 0)
+
+    def rejected(self, cursor):
+        cursor.execute(f'SELECT count(*), count(error) FROM {STAGING}')
+        rows, rejected = cursor.fetchone()
+        cursor.execute(f'SELECT line, error FROM {STAGING} WHERE error IS NOT NULL ORDER BY line LIMIT {MAX_ERRORS}')
+        return rows, rejected, [{'line': line, 'error': error} for line, error in cursor.fetchall()]
+
+
+def load(spec, stream, format='csv'):
+    """Import the binary CSV or NDJSON ``stream`` as described by ``spec``; returns a report.
+
+    Raises :class:`InvalidFile` when the file as a whole cannot be imported
+    (empty, or without a required column).
+    """
+    started = time.monotonic()
+    header, records = (ndjson_records if format == 'ndjson' else csv_records)(stream)
+    run = Import(spec, header)
+    with transaction.atomic(), connection.cursor() as cursor:
+        run.create_staging(cursor)
+        run.copy(cursor, records)
+        run.check(cursor)
+        run.resolve(cursor)
+        run.collect(cursor)
+        run.match(cursor)
+        run.check_unique(cursor)
+        inserted, updated, unchanged = run.upsert(cursor)
+        rows, rejected, errors = run.rejected(cursor)
+        if spec.after is not None:
+            spec.after()
+    seconds = time.monotonic() - started
+    return {
+        'rows': rows,
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': unchanged,
+        'rejected': rejected,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds) if seconds else rows,
+        'ignored_columns': run.ignored,
+        'errors': errors,
+    }
+
+
+class CSVStreamParser(BaseParser):
+    """Hands the body on as a stream, for :func:`load`."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return Upload(stream, 'csv')
+
+
+class NDJSONStreamParser(CSVStreamParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return Upload(stream, 'ndjson')
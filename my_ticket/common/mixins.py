@@ -0,0 +1,497 @@
+import hashlib
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, Max, Sum
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.text import slugify
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from .changes import changes_since, format_cursor, is_recorded, latest_change, parse_cursor
+from .export import CSVRenderer, NDJSONRenderer, stream_rows, streaming_response
+from .fields import BulkPrimaryKeyRelatedField
+from .filters import TrigramSimilarityFilter
+from .imports import CSVStreamParser, InvalidFile, NDJSONStreamParser, Upload, load
+from .pagination import KeysetPagination, UnsupportedOrdering
+
+
+class TypeaheadMixin:
+    """Adds a ``typeahead`` list action that returns the top matches for ``?q=``.
+
+    The view declares ``trigram_fields``; at most ``?limit=`` (default
+    ``typeahead_limit``, capped at ``typeahead_max_limit``) of the most similar
+    objects are serialized, without pagination or count.
+    """
+    typeahead_limit = 10
+    typeahead_max_limit = 50
+
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return Response([])
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.typeahead_limit)), 1), self.typeahead_max_limit)
+        except ValueError:
+            limit = self.typeahead_limit
+
+        queryset = TrigramSimilarityFilter().search(self.get_queryset(), term, self.trigram_fields)[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+def primed_objects(serializer, items):
+    """The objects behind the primary keys ``items`` send for the bulk related fields of ``serializer``.
+
+    One ``in_bulk`` query per ``BulkPrimaryKeyRelatedField`` (also inside a
+    many relation) for all items, instead of one per item; the result is the
+    serializer's ``context['primed']``. Unknown or malformed keys are left
+    out, for the field's own lookup to report.
+    """
+    primed = {}
+    for name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+        many = isinstance(field, serializers.ManyRelatedField)
+        relation = field.child_relation if many else field
+        if not isinstance(relation, BulkPrimaryKeyRelatedField) or relation.pk_field is not None:
+            continue
+
+        keys = set()
+        for item in items:
+            value = item.get(name) if isinstance(item, dict) else None
+            for key in (value if many and isinstance(value, list) else [value]):
+                if not isinstance(key, bool) and (isinstance(key, int) or (isinstance(key, str) and key.isdigit())):
+                    keys.add(int(key))
+        if keys:
+            primed[name] = {str(pk): obj for pk, obj in relation.get_queryset().in_bulk(keys).items()}
+    return primed
+
+
+class BatchMixin:
+    """Adds a ``batch`` list action that creates, updates or deletes many objects in one request.
+
+    ``POST`` takes a list of objects, ``PATCH`` a list of partial objects with
+    their ``id`` and ``DELETE`` a list of ids, at most ``batch_max_size`` at a
+    time. All items are validated first, with related objects looked up in
+    bulk; any error fails the whole batch, with ``errors`` by item index.
+    Otherwise everything is written with bulk queries in one transaction.
+
+    ``bulk_create``/``bulk_update`` skip model signals; views whose models
+    rely on them override the ``perform_batch_*`` hooks.
+    """
+    batch_max_size = 5000
+    batch_write_size = 1000
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def batch(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Verwacht een lijst.']})
+        if len(items) > self.batch_max_size:
+            raise ValidationError({'non_field_errors': [f'Maximaal {self.batch_max_size} items per keer.']})
+
+        if request.method == 'DELETE':
+            return self.batch_destroy(items)
+        if request.method == 'PATCH':
+            return self.batch_update(items)
+        return self.batch_create(items)
+
+    @staticmethod
+    def check_found(ids, known):
+        missing = [index for index, pk in enumerate(ids) if pk not in known]
+        if missing:
+            raise ValidationError({'errors': {index: {'id': ['Niet gevonden.']} for index in missing}})
+
+    def validate_batch(self, items, instances=None):
+        """The validated data of every item, or raise the errors per item.
+
+        The serializer's context has ``batch`` set, for checks a view makes
+        over all items together rather than per item, and ``primed``, the
+        related objects of all items (see :func:`primed_objects`).
+        """
+        serializer = self.get_serializer(
+            partial=instances is not None, context={**self.get_serializer_context(), 'batch': True}
+        )
+        serializer.context['primed'] = primed_objects(serializer, items)
+        validated, errors = [], {}
+        for index, item in enumerate(items):
+            serializer.instance = instances[index] if instances is not None else None
+            serializer.initial_data = item
+            try:
+                validated.append(serializer.run_validation(item))
+            except ValidationError as error:
+                errors[index] = error.detail
+        if errors:
+            raise ValidationError({'errors': errors})
+        return validated
+
+    @staticmethod
+    def split_many(model, attrs):
+        """Take the many-to-many values out of ``attrs``, which can then build the model."""
+        return {field.name: attrs.pop(field.name) for field in model._meta.many_to_many if field.name in attrs}
+
+    def set_many(self, model, objects, many):
+        """Replace the many-to-many relations of ``objects`` given in ``many`` (a list of dicts)."""
+        for field in model._meta.many_to_many:
+            owners = [obj.pk for obj, values in zip(objects, many) if field.name in values]
+            if not owners:
+                continue
+            through = getattr(model, field.name).through
+            source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+            through.objects.filter(**{f'{source}__in': owners}).delete()
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: related.pk})
+                for obj, values in zip(objects, many) if field.name in values
+                for related in dict.fromkeys(values[field.name])
+            ], batch_size=self.batch_write_size)
+
+    def batch_create(self, items):
+        model = self.get_queryset().model
+        validated = self.validate_batch(items)
+        many = [self.split_many(model, attrs) for attrs in validated]
+        objects = [model(**attrs) for attrs in validated]
+        with transaction.atomic():
+            self.perform_batch_create(objects)
+            self.set_many(model, objects, many)
+        return Response({'ids': [obj.pk for obj in objects]}, status=status.HTTP_201_CREATED)
+
+    def batch_update(self, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        known = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)])
+        self.check_found(ids, known)
+
+        model = self.get_queryset().model
+        instances = [known[pk] for pk in ids]
+        validated = self.validate_batch(items, instances)
+        many = [self.split_many(model, attrs) for attrs in validated]
+        fields = {name for attrs in validated for name in attrs}
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+                for instance in instances:
+                    setattr(instance, field.attname, now)
+        for instance, attrs in zip(instances, validated):
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+
+        with transaction.atomic():
+            self.perform_batch_update(instances, sorted(fields))
+            self.set_many(model, instances, many)
+        return Response({'ids': ids})
+
+    def batch_destroy(self, items):
+        ids = [pk for pk in items if isinstance(pk, int) and not isinstance(pk, bool)]
+        queryset = self.get_queryset().filter(pk__in=ids)
+        known = set(queryset.values_list('pk', flat=True))
+        self.check_found(items, known)
+        with transaction.atomic():
+            self.perform_batch_destroy(queryset)
+        return Response({'deleted': len(known)})
+
+    def perform_batch_create(self, objects):
+        self.get_queryset().model.objects.bulk_create(objects, batch_size=self.batch_write_size)
+
+    def perform_batch_update(self, objects, fields):
+        if fields:
+            self.get_queryset().model.objects.bulk_update(objects, fields, batch_size=self.batch_write_size)
+
+    def perform_batch_destroy(self, queryset):
+        queryset.delete()
+
+
+class ConditionalGetMixin:
+    """Conditional GETs for ``list`` and ``retrieve``.
+
+    Responses carry a strong ``ETag`` and a ``Last-Modified``; a matching
+    ``If-None-Match`` (or ``If-Modified-Since``) gets a 304 before anything
+    is serialized. The validators come from two cheap queries: the ids of
+    the page (or the object), with no joins or prefetches beyond what the
+    filters and ordering need, and one aggregate over their rows.
+
+    For models whose changes are recorded (see :mod:`common.changes`) the
+    aggregate is :func:`~common.changes.latest_change` over the objects and
+    the rows the serializer shows from ``etag_relations`` (foreign key paths
+    such as ``project`` or ``assignment__contact``); a meeting's participants
+    are recorded as changes to the meeting. Other models sum a hash of each
+    row and take the latest ``updated_at``. Both also cover the URL and media
+    type.
+
+    A view that knows its validators before fetching anything (see
+    :class:`LookupCacheMixin`) returns them from :meth:`list_validators`.
+    """
+    last_modified_field = 'updated_at'
+    etag_relations = []
+
+    def make_etag(self, request, state):
+        key = repr([request.get_full_path(), getattr(request, 'accepted_media_type', ''), state])
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def has_last_modified(self, model):
+        return any(field.name == self.last_modified_field for field in model._meta.concrete_fields)
+
+    def page_ids(self, queryset):
+        """The ids of the page the list serves, read without the serializer's joins and prefetches."""
+        # The ordering keys too, for keyset pagination cursors.
+        try:
+            keys = [name for name, _ in KeysetPagination.get_keys(queryset)]
+        except UnsupportedOrdering:
+            keys = []
+        rows = queryset.select_related(None).prefetch_related(None).values(*dict.fromkeys(['pk', *keys]))
+        page = self.paginate_queryset(rows)
+        return [row['pk'] for row in (rows if page is None else page)]
+
+    def validators(self, request, model, ids):
+        """``(etag, last_modified)`` of the objects ``ids`` with one aggregate query."""
+        if not ids:
+            return self.make_etag(request, []), None
+        if is_recorded(model):
+            state, last_modified = latest_change(model, ids, self.etag_relations)
+        else:
+            row = connection.ops.quote_name(model._meta.db_table)
+            aggregates = {'state': Sum(RawSQL(f'hashtextextended({row}::text, 0)', [], output_field=BigIntegerField()))}
+            if self.has_last_modified(model):
+                aggregates['last_modified'] = Max(self.last_modified_field)
+            latest = model._default_manager.filter(pk__in=ids).aggregate(**aggregates)
+            state, last_modified = latest['state'], latest.get('last_modified')
+        return self.make_etag(request, [ids, state]), last_modified
+
+    def list_validators(self, request, queryset):
+        return self.validators(request, queryset.model, self.page_ids(queryset))
+
+    @staticmethod
+    def conditional_response(request, etag, last_modified, respond):
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp) or respond()
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.list_validators(request, self.filter_queryset(self.get_queryset()))
+        return self.conditional_response(
+            request, etag, last_modified, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.validators(request, type(instance), [instance.pk])
+        return self.conditional_response(
+            request, etag, last_modified, lambda: Response(self.get_serializer(instance).data)
+        )
+
+
+class SparseFieldsetMixin:
+    """``?fields=`` and ``?omit=`` (comma separated) trim the serialized fields of GET requests.
+
+    The queryset is narrowed to match: ``only()`` the columns behind the kept
+    fields, ``select_related`` only the relations they traverse and no
+    prefetches for many-to-many fields that are left out. Fields whose columns
+    cannot be derived from their ``source`` (method fields) are listed in the
+    serializer's ``field_sources``; any other such field keeps the full query.
+    """
+
+    @staticmethod
+    def split_param(value):
+        return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+    def sparse_fields(self):
+        """The names of the fields to serialize, or ``None`` for all of them."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            params = self.request.query_params if self.request is not None else {}
+            fields, omit = self.split_param(params.get('fields')), self.split_param(params.get('omit'))
+            if self.request is not None and self.request.method in SAFE_METHODS and (fields or omit):
+                names = self.get_serializer_class()(context=self.get_serializer_context()).fields
+                self._sparse_fields = [name for name in names if (not fields or name in fields) and name not in omit]
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        kept = self.sparse_fields()
+        if kept is not None:
+            fields = getattr(serializer, 'child', serializer).fields
+            for name in list(fields):
+                if name not in kept:
+                    fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        kept = self.sparse_fields()
+        if kept is None:
+            return queryset
+        return self.narrow_queryset(queryset, self.get_serializer_class()(context=self.get_serializer_context()), kept)
+
+    @staticmethod
+    def narrow_queryset(queryset, serializer, kept):
+        opts = queryset.model._meta
+        sources = getattr(serializer, 'field_sources', {})
+        columns, relations, many = {opts.pk.name}, set(), set()
+        for name in kept:
+            field = serializer.fields[name]
+            if name in sources:
+                targets = sources[name]
+            elif field.source == '*':
+                return queryset
+            else:
+                targets = ['__'.join(field.source_attrs)]
+            for target in targets:
+                parts = target.split('__')
+                try:
+                    model_field = opts.get_field(parts[0])
+                except FieldDoesNotExist:
+                    return queryset
+                if model_field.many_to_many or model_field.one_to_many:
+                    many.add(model_field.name)
+                elif len(parts) == 1:
+                    columns.add(model_field.name)
+                else:
+                    columns.add('__'.join([model_field.name, *parts[1:]]))
+                    relations.add('__'.join([model_field.name, *parts[1:-1]]))
+
+        prefetches = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in many
+        ]
+        queryset = queryset.select_related(None).prefetch_related(None).only(*columns)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.prefetch_related(*prefetches)
+
+
+class OptionsMixin:
+    """Adds ``options/``: the ``[id, label]`` pairs of all objects, for dropdowns, in one response.
+
+    The label is built in SQL from ``option_label`` (a field name or an
+    expression) and the pairs are sorted on it. ``?q=`` keeps the labels that
+    start with it. Not paginated; the ETag is a hash of the pairs.
+    """
+    option_label = 'name'
+
+    @action(detail=False, methods=['get'], url_path='options', url_name='options')
+    def choices(self, request):
+        label = F(self.option_label) if isinstance(self.option_label, str) else self.option_label
+        queryset = self.get_queryset().select_related(None).prefetch_related(None).annotate(option_label=label)
+        term = request.query_params.get('q', '').strip()
+        if term:
+            queryset = queryset.filter(option_label__istartswith=term)
+        pairs = [list(pair) for pair in queryset.order_by('option_label', 'pk').values_list('pk', 'option_label')]
+
+        etag = quote_etag(hashlib.md5(json.dumps(pairs).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag) or Response(pairs)
+        response['ETag'] = etag
+        return response
+
+
+class ExportMixin:
+    """Adds ``export/``: all objects that pass the list's filters, streamed as NDJSON or CSV.
+
+    Columns are the view's ``export_fields``: model fields (a foreign key gives
+    the id) or names in ``export_expressions``, which join related names into
+    the same query. ``?fields=`` and ``?omit=`` pick columns, ``?search=`` and
+    ``?ordering=`` apply as for the list, and ``?format=csv`` (or
+    ``Accept: text/csv``) switches from NDJSON to CSV.
+    """
+    export_fields = []
+    export_expressions = {}
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        fields = SparseFieldsetMixin.split_param(request.query_params.get('fields'))
+        omit = SparseFieldsetMixin.split_param(request.query_params.get('omit'))
+        columns = [name for name in self.export_fields if (not fields or name in fields) and name not in omit]
+        if not columns:
+            raise ValidationError({'fields': 'Kies minstens één kolom om te exporteren.'})
+
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        expressions = {name: expression for name, expression in self.export_expressions.items() if name in columns}
+        rows = queryset.annotate(**expressions).values_list(*columns)
+
+        renderer = request.accepted_renderer
+        response = streaming_response(
+            request, stream_rows(rows, columns, renderer.format), f'{renderer.media_type}; charset=utf-8'
+        )
+        filename = slugify(queryset.model._meta.verbose_name_plural)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+        return response
+
+
+class ImportMixin:
+    """Adds ``import/``: POST a CSV (``text/csv``) or NDJSON (``application/x-ndjson``) body to load it.
+
+    The body is streamed into the table with :func:`common.imports.load`, which
+    upserts on the model's natural key; the response is its report. Views set
+    ``import_spec`` to the :class:`~common.imports.Spec` of their table.
+    """
+    import_spec = None
+
+    @action(
+        detail=False, methods=['post'], url_path='import', url_name='import',
+        parser_classes=[CSVStreamParser, NDJSONStreamParser],
+    )
+    def bulk_import(self, request):
+        upload = request.data
+        if not isinstance(upload, Upload):
+            raise ValidationError({'detail': "Stuur een CSV- of NDJSON-bestand."})
+        try:
+            report = load(self.import_spec, upload.stream, upload.format)
+        except InvalidFile as error:
+            raise ValidationError({'detail': str(error)})
+        return Response(report)
+
+
+class ChangeFeedMixin:
+    """Adds ``changes/``: what changed since ``?updated_since=<cursor>``, for delta sync (see :mod:`common.changes`).
+
+    Changes come oldest first, each with its ``cursor``, the object's ``id``
+    and its serialized ``object``, or ``deleted: true`` for a tombstone. The
+    next request passes the returned ``cursor``; ``more`` says whether there
+    is more right away. Without a cursor the feed starts at the beginning and
+    yields every object once. At most ``?limit=`` changes are returned.
+    """
+    change_limit = 500
+    change_max_limit = 5000
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            after = parse_cursor(request.query_params.get('updated_since', ''))
+        except ValueError:
+            raise ValidationError({'updated_since': "Geef een cursor zoals die in een vorig antwoord stond."})
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.change_limit)), 1), self.change_max_limit)
+        except ValueError:
+            limit = self.change_limit
+
+        queryset = self.get_queryset()
+        rows = changes_since(queryset.model, after, limit)
+        ids = [object_id for object_id, deleted, _, _ in rows if not deleted]
+        objects = list(queryset.filter(pk__in=ids)) if ids else []
+        data = dict(zip((obj.pk for obj in objects), self.get_serializer(objects, many=True).data))
+
+        return Response({
+            'cursor': format_cursor(*rows[-1][2:]) if rows else format_cursor(*after),
+            'more': len(rows) == limit,
+            'changes': [
+                {
+                    'cursor': format_cursor(txid, seq),
+                    'id': object_id,
+                    'deleted': object_id not in data,
+                    'object': data.get(object_id),
+                }
+                for object_id, _, txid, seq in rows
+            ],
+        })
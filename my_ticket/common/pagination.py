@@ -0,0 +1,349 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, OrderBy, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision, cursor values are compared for equality."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class UnsupportedOrdering(Exception):
+    """An ordering term that is not a (possibly descending) field, so it cannot be a keyset."""
+
+
+def is_nullable(model, name):
+    """Whether ``name``, a field or a path across relations as in ``order_by()``, can be NULL."""
+    if name == 'pk':
+        return False
+    for part in name.split('__'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return True
+        if field.null or not field.concrete or field.many_to_many:
+            return True
+        if field.is_relation:
+            model = field.related_model
+    return False
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the ordering keys instead of using OFFSET.
+
+    The ordering of the (already filtered) queryset is used as keyset, with the
+    primary key appended as tiebreaker, e.g. ``-deadline,id`` or
+    ``created_at,id``. NULLs sort the way PostgreSQL sorts them by default
+    (last when ascending, first when descending), so a plain btree index on the
+    keys can serve every page. Orderings on expressions other than fields
+    raise :class:`UnsupportedOrdering`.
+    """
+    page_size = 6
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Ongeldige cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_keys(queryset)
+        self.nullable = {name: is_nullable(queryset.model, name) for name, _ in self.keys}
+
+        position, reverse = self.decode_cursor(request)
+        keys = [(name, not descending) for name, descending in self.keys] if reverse else self.keys
+
+        queryset = queryset.order_by(*[f'-{name}' if descending else name for name, descending in keys])
+        if position is not None:
+            queryset = queryset.filter(self.after(keys, position, self.nullable))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_position = self.get_position(rows[0]) if rows else None
+        self.last_position = self.get_position(rows[-1]) if rows else None
+        self.position = position
+        self.reverse = reverse
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'page_size': self.page_size,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return page_size
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    @staticmethod
+    def get_keys(queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        keys = []
+        for field in ordering:
+            if isinstance(field, OrderBy) and isinstance(field.expression, F) and not (
+                field.nulls_first or field.nulls_last
+            ):
+                name, descending = field.expression.name, field.descending
+            elif isinstance(field, str) and field != '?':
+                name, descending = field.lstrip('-'), field.startswith('-')
+            else:
+                raise UnsupportedOrdering(field)
+            keys.append(('pk' if name == 'id' else name, descending))
+        if 'pk' not in [name for name, _ in keys]:
+            keys.append(('pk', False))
+        return keys
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            # A values() row that selects the keys (see ValuesListMixin).
+            return [instance[name] for name, _ in self.keys]
+        position = []
+        for name, _ in self.keys:
+            value = instance
+            for part in name.split('__'):
+                value = getattr(value, part, None) if value is not None else None
+            position.append(value)
+        return position
+
+    @staticmethod
+    def after(keys, position, nullable):
+        """Build the filter for rows that sort after ``position``.
+
+        Expands the lexicographic comparison over all keys and adds a plain
+        range bound on the leading key, which the database can use to seek in
+        the index. NULLs are only considered for keys in ``nullable``.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(keys, position):
+            ascending = not descending
+            if value is None:
+                # NULLs come last when ascending and first when descending.
+                greater = Q(pk__in=[]) if ascending else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'gt' if ascending else 'lt'
+                greater = Q(**{f'{name}__{lookup}': value})
+                if ascending and nullable[name]:
+                    greater |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & greater
+            equal &= same
+
+        name, descending = keys[0]
+        value = position[0]
+        if value is None:
+            if not descending:
+                condition &= Q(**{f'{name}__isnull': True})
+        else:
+            bound = Q(**{f'{name}__{"lte" if descending else "gte"}': value})
+            if not descending and nullable[name]:
+                bound |= Q(**{f'{name}__isnull': True})
+            condition &= bound
+        return condition
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': reverse}, cls=CursorEncoder, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        # An empty page reached by going back continues from the same spot.
+        position = self.last_position if self.last_position is not None else self.position
+        return self.encode_cursor(position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.first_position if self.first_position is not None else self.position
+        return self.encode_cursor(position, True)
+
+
+class CountStrategyPaginator(Paginator):
+    """Paginator that avoids exact counts on large results.
+
+    Results up to ``exact_count_limit`` rows are counted exactly with a bounded
+    ``COUNT(*)``. Larger unfiltered tables use the planner estimate from
+    ``pg_class.reltuples``, larger filtered results an exact count that is
+    cached for ``count_cache_timeout`` seconds. Both are reported as
+    approximate, and pages then detect the next page by fetching one extra row
+    instead of trusting ``num_pages``.
+    """
+    exact_count_limit = 10000
+    count_cache_timeout = 60
+
+    @cached_property
+    def counted(self):
+        """``(count, is_approximate)``, decided once per paginator."""
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count, False
+
+        # Only the ids, so a values() page does not count through its joins.
+        queryset = queryset.order_by().values('pk')
+        bounded = queryset[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit:
+            return bounded, False
+
+        if not queryset.query.where:
+            estimate = self.estimate_table_count(queryset)
+            if estimate is not None:
+                return max(estimate, bounded), True
+        return self.cached_count(queryset), True
+
+    @property
+    def count(self):
+        return self.counted[0]
+
+    @property
+    def count_is_approximate(self):
+        return self.counted[1]
+
+    @staticmethod
+    def estimate_table_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for tables that were never analyzed.
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
+
+    def cached_count(self, queryset):
+        key = 'paginator-count:' + hashlib.md5(str(queryset.order_by().query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return ApproximatePage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class ApproximatePage(Page):
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CustomPageNumberPagination(PageNumberPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    Requests that pass ``?pagination=cursor`` (or follow a ``cursor`` link)
+    are paginated by :class:`KeysetPagination`, which skips the ``COUNT(*)``
+    and the ``OFFSET`` so deep pages cost the same as the first one. Querysets
+    it cannot seek in are paginated by page number instead.
+
+    Page responses carry ``count_is_approximate``, see
+    :class:`CountStrategyPaginator`.
+    """
+    django_paginator_class = CountStrategyPaginator
+    page_size = 6
+    page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.page_size
+            try:
+                return self.keyset.paginate_queryset(queryset, request, view)
+            except UnsupportedOrdering:
+                # Ordered on an expression: page numbers still work.
+                self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_approximate': self.page.paginator.count_is_approximate,
+            'page_size': self.get_page_size(self.request),
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
@@ -0,0 +1,21 @@
+"""What can be bulk imported into the contacts tables (see :mod:`common.imports`)."""
+from common.imports import Reference, Spec
+from .models import Address, Contact, ContextContact, address_name, contact_name
+
+SPECS = {
+    'addresses': Spec(
+        Address, ['name', 'street', 'zip', 'city', 'country'], key=['name', 'street', 'zip', 'city', 'country'],
+        required=['name'],
+    ),
+    'contacts': Spec(
+        Contact, ['firstname', 'lastname', 'date_of_birth'], key=['firstname', 'lastname'], required=['firstname'],
+    ),
+    'contextcontacts': Spec(
+        ContextContact, ['context', 'function', 'emailaddress', 'telephone', 'parking_info'],
+        key=['contact', 'context'],
+        references={
+            'contact_name': Reference('contact', contact_name()),
+            'postaladdress_name': Reference('postaladdress', address_name()),
+        },
+    ),
+}
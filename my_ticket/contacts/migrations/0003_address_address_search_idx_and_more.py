@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_contact_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', 'street', 'city', 'zip', 'country', config='simple'), name='address_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('firstname', 'lastname', config='simple'), name='contact_search_idx'),
+        ),
+    ]
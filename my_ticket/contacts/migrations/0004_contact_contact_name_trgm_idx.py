@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:26
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_address_address_search_idx_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Concat(models.F('firstname'), models.Value(' '), models.F('lastname')), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+        ),
+    ]
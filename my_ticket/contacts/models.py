@@ -1,5 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 import datetime
+from common.filters import search_vector, trigram_expression
 
 
 class Address(models.Model):
@@ -12,6 +16,11 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.street}, {self.zip} {self.city}, {self.country} ({self.name})"
 
+    class Meta:
+        indexes = [
+            GinIndex(search_vector('name', 'street', 'city', 'zip', 'country'), name='address_search_idx'),
+        ]
+
 
 class Contact(models.Model):
     firstname = models.CharField(max_length=255)
@@ -21,6 +30,12 @@ class Contact(models.Model):
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
 
+    class Meta:
+        indexes = [
+            GinIndex(search_vector('firstname', 'lastname'), name='contact_search_idx'),
+            GinIndex(OpClass(trigram_expression('firstname', 'lastname'), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+        ]
+
 
 class ContextContact(models.Model):
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE)
@@ -34,3 +49,29 @@ class ContextContact(models.Model):
     def __str__(self):
         return f"{self.contact} - {self.context}"
 
+
+def contextcontact_name(prefix=''):
+    """The serializers' ``contextcontact_name`` in SQL.
+
+    ``prefix`` leads to the context contact from another model, e.g. ``'assignment__'`` from a task.
+    """
+    name = Trim(Concat(
+        f'{prefix}contact__firstname', Value(' '), f'{prefix}contact__lastname',
+        Value(' ('), Coalesce(NullIf(f'{prefix}function', Value('')), Value('onbekend')), Value(')'),
+    ))
+    if not prefix:
+        return name
+    return Case(When(**{f'{prefix}contact__isnull': True}, then=Value('')), default=name)
+
+
+def contact_name(prefix=''):
+    """``str()`` of a contact in SQL; ``prefix`` leads to it from another model, as for :func:`contextcontact_name`."""
+    return Concat(f'{prefix}firstname', Value(' '), f'{prefix}lastname')
+
+
+def address_name(prefix=''):
+    """``str()`` of an address in SQL; ``prefix`` leads to it from another model, as for :func:`contextcontact_name`."""
+    return Concat(
+        f'{prefix}street', Value(', '), f'{prefix}zip', Value(' '), f'{prefix}city', Value(', '), f'{prefix}country',
+        Value(' ('), f'{prefix}name', Value(')'),
+    )
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from common.fields import BulkPrimaryKeyRelatedField
 from .models import Address, Contact, ContextContact
 
 
@@ -15,10 +16,14 @@ class ContactSerializer(serializers.ModelSerializer):
 
 
 class ContextContactSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     contextcontact_firstname = serializers.CharField(source='contact.firstname', read_only=True)
     contextcontact_lastname = serializers.CharField(source='contact.lastname', read_only=True)
     contextcontact_name = serializers.SerializerMethodField()
 
+    # Columns behind the method fields, for ?fields= (see common.mixins.SparseFieldsetMixin).
+    field_sources = {'contextcontact_name': ['contact__firstname', 'contact__lastname', 'function']}
+
     def get_contextcontact_name(self, obj):
         if obj.contact:
             firstname = obj.contact.firstname or ""
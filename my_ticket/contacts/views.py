@@ -1,22 +1,37 @@
 from rest_framework import filters, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Address, Contact, ContextContact
+from common.filters import FullTextSearchFilter, TrigramSimilarityFilter
+from common.mixins import (
+    BatchMixin, ChangeFeedMixin, ConditionalGetMixin, ExportMixin, ImportMixin, OptionsMixin, SparseFieldsetMixin,
+    TypeaheadMixin
+)
+from .imports import SPECS
+from .models import Address, Contact, ContextContact, address_name, contact_name, contextcontact_name
 from .serializers import AddressSerializer, ContactSerializer, ContextContactSerializer
 
 
-class AddressViewSet(viewsets.ModelViewSet):
+class AddressViewSet(
+    SparseFieldsetMixin, ConditionalGetMixin, BatchMixin, ChangeFeedMixin, ImportMixin, viewsets.ModelViewSet
+):
     queryset = Address.objects.all()
     serializer_class = AddressSerializer
-    filter_backends = [filters.SearchFilter]
+    import_spec = SPECS['addresses']
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['name', 'street', 'city', 'zip', 'country']
 
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(
+    SparseFieldsetMixin, ConditionalGetMixin, BatchMixin, ChangeFeedMixin, ExportMixin, ImportMixin, TypeaheadMixin,
+    viewsets.ModelViewSet
+):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['firstname', 'lastname', 'date_of_birth']
+    import_spec = SPECS['contacts']
+    filter_backends = [FullTextSearchFilter, TrigramSimilarityFilter]
+    search_fields = ['firstname', 'lastname']
+    trigram_fields = ['firstname', 'lastname']
+    export_fields = ['id', 'firstname', 'lastname', 'date_of_birth']
 
     @action(detail=True, methods=['get'])
     def context_contacts(self, request, pk=None):
@@ -24,8 +39,29 @@ class ContactViewSet(viewsets.ModelViewSet):
         context_contacts = ContextContact.objects.filter(contact=contact)
         serializer = ContextContactSerializer(context_contacts, many=True)
         return Response(serializer.data)
-class ContextContactViewSet(viewsets.ModelViewSet):
-    queryset = ContextContact.objects.all()
+
+
+class ContextContactViewSet(
+    SparseFieldsetMixin, ConditionalGetMixin, BatchMixin, ChangeFeedMixin, ExportMixin, ImportMixin, OptionsMixin,
+    TypeaheadMixin, viewsets.ModelViewSet
+):
+    queryset = ContextContact.objects.select_related('contact')
     serializer_class = ContextContactSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['contact', 'context', 'function', 'emailadress', 'telephone', 'postaladdress', 'parking_info']
\ No newline at end of file
+    import_spec = SPECS['contextcontacts']
+    etag_relations = ['contact']
+    filter_backends = [filters.SearchFilter, TrigramSimilarityFilter]
+    search_fields = ['contact', 'context', 'function', 'emailadress', 'telephone', 'postaladdress', 'parking_info']
+    # Served by the trigram index on Contact, through the join (see TrigramSearchTests).
+    trigram_fields = ['contact__firstname', 'contact__lastname']
+    # Same text as ContextContactSerializer.contextcontact_name.
+    option_label = contextcontact_name()
+    # Also the columns of an import (see contacts.imports).
+    export_fields = [
+        'id', 'contact', 'contact_name', 'contextcontact_name', 'context', 'function', 'emailaddress', 'telephone',
+        'postaladdress', 'postaladdress_name', 'parking_info',
+    ]
+    export_expressions = {
+        'contact_name': contact_name('contact__'),
+        'contextcontact_name': contextcontact_name(),
+        'postaladdress_name': address_name('postaladdress__'),
+    }
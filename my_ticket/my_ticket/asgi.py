@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_ticket.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from tasks.events import EventStream  # noqa: E402 (needs the apps loaded)
+
+# Server-Sent Events under /api/events/ bypass Django; everything else goes to it.
+application = EventStream(django_application)
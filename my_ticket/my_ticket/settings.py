@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'contacts',
     'tasks',
     'rest_framework',
@@ -128,7 +129,18 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Keep materialized paths on tasks so subtrees are read with one index scan
+# (run `manage.py rebuild_task_paths` after enabling).
+TASK_TREE_PATHS = False
+
+# Where tasks.lookups keeps the lookup tables: 'process' for an LRU per process,
+# or the alias of a cache in CACHES to share them between processes. Writes only
+# invalidate the LRU of the process that made them; the others catch up after
+# LOOKUP_CACHE_TIMEOUT seconds, so use a shared cache with several workers.
+LOOKUP_CACHE = 'process'
+LOOKUP_CACHE_TIMEOUT = 60
+
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'tasks.pagination.CustomPageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'common.pagination.CustomPageNumberPagination',
     'PAGE_SIZE': 6,  # number of records per page
 }
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""Double-booking of meeting rooms.
+
+A meeting occupies its room for ``[startdate, enddate)``. The
+``meeting_room_no_overlap`` exclusion constraint keeps two such ranges of the
+same room from overlapping; its GiST index (btree_gist for the room id) also
+answers :func:`conflicts`, as long as the query uses the same range expression
+and repeats the constraint's condition, as done here.
+"""
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import F, Func, Q
+
+CONSTRAINT_NAME = 'meeting_room_no_overlap'
+
+# Meetings without both dates, or ending before they start, do not occupy a room.
+BOOKED = Q(startdate__isnull=False, enddate__isnull=False, enddate__gt=F('startdate'))
+
+
+class TsTzRange(Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+def booked_range():
+    return TsTzRange('startdate', 'enddate', RangeBoundary())
+
+
+def exclusion_expressions():
+    return [('meetingroom', RangeOperators.EQUAL), (booked_range(), RangeOperators.OVERLAPS)]
+
+
+def booked_between(meetings, start, end):
+    """The ``meetings`` that occupy their room during part of ``[start, end)``."""
+    return meetings.filter(BOOKED).alias(booked=booked_range()).filter(
+        booked__overlap=DateTimeTZRange(start, end, '[)')
+    )
+
+
+def conflicts(meetings, meetingroom, start, end, exclude=None):
+    """The meetings in ``meetingroom`` that overlap ``[start, end)``, ``exclude`` (a meeting id) left out."""
+    meetings = booked_between(meetings.filter(meetingroom=meetingroom), start, end)
+    if exclude is not None:
+        meetings = meetings.exclude(pk=exclude)
+    return meetings.order_by('startdate', 'pk')
@@ -0,0 +1,128 @@
+"""Calendar of stored and virtual occurrences for a date window.
+
+Stored tasks and meetings are read in date order straight from the database.
+Cycles are expanded in memory with :mod:`tasks.recurrence`, bounded by the
+window, and the expansion is cached per cycle and window. Nothing is written:
+occurrences of a cycle that were already materialized (see
+:mod:`tasks.materialize`) are read as stored tasks and not repeated.
+"""
+import datetime
+import hashlib
+import heapq
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cycle, Meeting, Task
+
+CACHE_TIMEOUT = 60 * 60
+CHUNK_SIZE = 2000
+
+
+def sort_key(moment):
+    if isinstance(moment, datetime.datetime):
+        moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+        return moment.date(), moment.time()
+    return moment, datetime.time.min
+
+
+def cached_occurrences(cycle, start, end):
+    """The dates of ``cycle`` within the window, cached on the cycle's rule and the window."""
+    rule = [cycle.pk, cycle.cycle_model, cycle.start, cycle.end, cycle.number, cycle.level,
+            cycle.one_level, cycle.weekday, cycle.month, start, end]
+    key = 'calendar-cycle:' + hashlib.md5(repr(rule).encode()).hexdigest()
+    dates = cache.get(key)
+    if dates is None:
+        dates = list(cycle.occurrences(start, end))
+        cache.set(key, dates, CACHE_TIMEOUT)
+    return dates
+
+
+def window_bounds(start, end):
+    """The window as aware datetimes ``[lower, upper)``, for range lookups that can use an index."""
+    lower = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    upper = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return lower, upper
+
+
+def task_entries(tasks, start, end):
+    """Tasks by execution start, or by deadline for tasks without one, as two sorted streams."""
+    lower, upper = window_bounds(start, end)
+    fields = ['pk', 'subject', 'execution_startdate', 'execution_starttime', 'deadline', 'cycle_group']
+    planned = tasks.filter(execution_startdate__range=(start, end)).order_by(
+        'execution_startdate', F('execution_starttime').asc(nulls_first=True), 'pk'
+    ).values_list(*fields)
+    unplanned = tasks.filter(
+        execution_startdate__isnull=True, deadline__gte=lower, deadline__lt=upper
+    ).order_by('deadline', 'pk').values_list(*fields)
+    return [task_stream(planned), task_stream(unplanned)]
+
+
+def task_stream(tasks):
+    for pk, subject, startdate, starttime, deadline, cycle_group in tasks.iterator(chunk_size=CHUNK_SIZE):
+        if startdate is None:
+            moment = deadline
+        elif starttime is None:
+            moment = startdate
+        else:
+            moment = datetime.datetime.combine(startdate, starttime)
+        yield sort_key(moment), {
+            'kind': 'task', 'date': moment, 'id': pk, 'cycle': cycle_group, 'title': subject
+        }
+
+
+def meeting_entries(meetings, start, end):
+    lower, upper = window_bounds(start, end)
+    meetings = meetings.filter(startdate__gte=lower, startdate__lt=upper).order_by('startdate', 'pk').values_list(
+        'pk', 'name', 'startdate', 'enddate'
+    )
+    for pk, name, startdate, enddate in meetings.iterator(chunk_size=CHUNK_SIZE):
+        yield sort_key(startdate), {
+            'kind': 'meeting', 'date': startdate, 'end': enddate, 'id': pk, 'cycle': None, 'title': name
+        }
+
+
+def cycle_entries(cycle, dates, materialized):
+    source = cycle.source_task
+    for date in dates:
+        if (cycle.pk, date) not in materialized:
+            moment = date
+            if source.execution_starttime is not None:
+                moment = datetime.datetime.combine(date, source.execution_starttime)
+            yield sort_key(moment), {
+                'kind': 'occurrence', 'date': moment, 'id': source.pk, 'cycle': cycle.pk, 'title': source.subject
+            }
+
+
+def calendar_entries(start, end, tasks=None, meetings=None, cycles=None):
+    """Yield the calendar entries of the window ``[start, end]`` in date order."""
+    tasks = Task.objects.all() if tasks is None else tasks
+    meetings = Meeting.objects.all() if meetings is None else meetings
+    cycles = Cycle.objects.all() if cycles is None else cycles
+
+    cycles = list(
+        cycles.filter(source_task__isnull=False, start__lte=end, end__gte=start).select_related('source_task')
+    )
+    materialized = set(
+        Task.objects.filter(
+            cycle_group__in=[cycle.pk for cycle in cycles], execution_startdate__range=(start, end)
+        ).values_list('cycle_group', 'execution_startdate')
+    ) if cycles else set()
+
+    streams = task_entries(tasks, start, end) + [meeting_entries(meetings, start, end)]
+    streams += [cycle_entries(cycle, cached_occurrences(cycle, start, end), materialized) for cycle in cycles]
+    for _, entry in heapq.merge(*streams, key=lambda item: item[0]):
+        yield entry
+
+
+def stream_json(entries):
+    """Render ``entries`` as a JSON array, one chunk per entry."""
+    yield '['
+    separator = ''
+    for entry in entries:
+        yield separator + json.dumps(entry, cls=DjangoJSONEncoder)
+        separator = ','
+    yield ']'
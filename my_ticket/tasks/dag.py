@@ -0,0 +1,165 @@
+"""Scheduling over the ``Task.prerequisites`` dependency graph.
+
+``task.prerequisites`` are the tasks that have to be finished before ``task``
+can start. A project's graph (its tasks plus every prerequisite they reach,
+also in other projects) is loaded with one recursive query; ordering, earliest
+start/finish and the critical path are then computed in memory in O(V + E).
+"""
+import datetime
+from collections import deque
+
+from django.db import connection
+
+from .models import Task
+
+
+class CycleError(Exception):
+    def __init__(self, task_ids):
+        super().__init__(f"De voorwaarden van taken {sorted(task_ids)} vormen een kring.")
+        self.task_ids = task_ids
+
+
+def prerequisite_table():
+    field = Task._meta.get_field('prerequisites')
+    return field.m2m_db_table(), field.m2m_column_name(), field.m2m_reverse_name()
+
+
+def load_project_graph(project_id):
+    """Return ``(durations, prerequisites)`` for the project's dependency graph.
+
+    ``durations`` maps task id to its projected internal plus external time,
+    ``prerequisites`` maps task id to the ids of its prerequisites.
+    """
+    table, task_column, prerequisite_column = prerequisite_table()
+    sql = f"""
+        WITH RECURSIVE graph(id) AS (
+            SELECT id FROM {Task._meta.db_table} WHERE project_id = %s
+            UNION
+            SELECT p.{prerequisite_column} FROM {table} p JOIN graph g ON p.{task_column} = g.id
+        )
+        SELECT t.id, t.duration_projected_internal, t.duration_projected_external,
+               array_remove(array_agg(p.{prerequisite_column}), NULL)
+        FROM graph g
+        JOIN {Task._meta.db_table} t ON t.id = g.id
+        LEFT JOIN {table} p ON p.{task_column} = t.id
+        GROUP BY t.id
+    """
+    durations, prerequisites = {}, {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [project_id])
+        for task_id, internal, external, required in cursor.fetchall():
+            durations[task_id] = (internal or datetime.timedelta()) + (external or datetime.timedelta())
+            prerequisites[task_id] = required
+    return durations, prerequisites
+
+
+def topological_order(prerequisites):
+    """Kahn's algorithm; prerequisites come before the tasks that need them."""
+    dependents = {task_id: [] for task_id in prerequisites}
+    waiting = {}
+    for task_id, required in prerequisites.items():
+        waiting[task_id] = len(required)
+        for prerequisite in required:
+            dependents[prerequisite].append(task_id)
+
+    ready = deque(sorted(task_id for task_id, count in waiting.items() if count == 0))
+    order = []
+    while ready:
+        task_id = ready.popleft()
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+
+    if len(order) < len(prerequisites):
+        raise CycleError({task_id for task_id, count in waiting.items() if count > 0})
+    return order
+
+
+def schedule(durations, prerequisites):
+    """Earliest start and finish per task (as offsets from the start) and the critical path."""
+    order = topological_order(prerequisites)
+    earliest_start, earliest_finish, critical_prerequisite = {}, {}, {}
+    for task_id in order:
+        start = datetime.timedelta()
+        for prerequisite in prerequisites[task_id]:
+            if task_id not in critical_prerequisite or earliest_finish[prerequisite] > start:
+                start = earliest_finish[prerequisite]
+                critical_prerequisite[task_id] = prerequisite
+        earliest_start[task_id] = start
+        earliest_finish[task_id] = start + durations[task_id]
+
+    critical_path = []
+    if order:
+        task_id = max(order, key=lambda pk: earliest_finish[pk])
+        while task_id is not None:
+            critical_path.append(task_id)
+            task_id = critical_prerequisite.get(task_id)
+        critical_path.reverse()
+
+    return {
+        'order': order,
+        'critical_path': critical_path,
+        'duration': max(earliest_finish.values(), default=datetime.timedelta()),
+        'earliest_start': earliest_start,
+        'earliest_finish': earliest_finish,
+    }
+
+
+def would_create_cycle(task_id, prerequisite_ids):
+    """Whether making ``prerequisite_ids`` prerequisites of ``task_id`` closes a loop.
+
+    Only the part of the graph reachable from the new prerequisites is walked,
+    looking for ``task_id``; nothing else is loaded.
+    """
+    prerequisite_ids = list(prerequisite_ids)
+    if task_id in prerequisite_ids:
+        return True
+    if not prerequisite_ids:
+        return False
+
+    table, task_column, prerequisite_column = prerequisite_table()
+    sql = f"""
+        WITH RECURSIVE reachable(id) AS (
+            SELECT unnest(%s::bigint[])
+            UNION
+            SELECT p.{prerequisite_column} FROM {table} p JOIN reachable r ON p.{task_column} = r.id
+        )
+        SELECT EXISTS (SELECT 1 FROM reachable WHERE id = %s)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [prerequisite_ids, task_id])
+        return cursor.fetchone()[0]
+
+
+def cycles_in_batch(prerequisites):
+    """The tasks whose new prerequisites would close a loop, checked for a whole batch in one query.
+
+    ``prerequisites`` maps a task id to the ids that replace its prerequisites.
+    The graph walked is the stored one with those tasks' edges swapped for the
+    new ones, so loops made by several tasks of the batch together are found.
+    """
+    tasks = list(prerequisites)
+    edges = [(task_id, prerequisite) for task_id, required in prerequisites.items() for prerequisite in required]
+    if not edges:
+        return set()
+
+    table, task_column, prerequisite_column = prerequisite_table()
+    sql = f"""
+        WITH RECURSIVE batch(task, prerequisite) AS (
+            SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+        ), edges(task, prerequisite) AS (
+            SELECT task, prerequisite FROM batch
+            UNION ALL
+            SELECT {task_column}, {prerequisite_column} FROM {table} WHERE {task_column} <> ALL(%s::bigint[])
+        ), reachable(origin, id) AS (
+            SELECT task, prerequisite FROM batch
+            UNION
+            SELECT r.origin, e.prerequisite FROM reachable r JOIN edges e ON e.task = r.id
+        )
+        SELECT DISTINCT origin FROM reachable WHERE id = origin
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [[task for task, _ in edges], [required for _, required in edges], tasks])
+        return {row[0] for row in cursor.fetchall()}
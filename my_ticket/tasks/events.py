@@ -0,0 +1,211 @@
+"""Live change notifications as Server-Sent Events.
+
+``GET /api/events/<topic>/`` keeps a ``text/event-stream`` open on one of the
+topics ``tasks``, ``meetings``, ``projects`` or ``projects/<id>`` (the project
+and its tasks). It is served by :class:`EventStream`, a plain ASGI app in
+front of Django (see ``my_ticket/asgi.py``), so it only runs under an ASGI
+server; an idle connection costs a coroutine and a small buffer, not a thread.
+
+Model signals (see :mod:`tasks.signals`), and the bulk writes that skip them
+(batches, imports, materialized cycles), publish to the in-process
+:data:`broker` once the write has committed::
+
+    event: change
+    data: {"resource": "tasks", "id": 12, "deleted": false}
+
+``event: reload`` asks for the whole list to be fetched again, after a bulk
+import or when a client fell too far behind. Events only say what changed,
+not what it looks like now, and they are not replayed: a client fetches what
+it shows on (re)connect and again on each event. The broker only sees writes
+made by its own process, so run one worker, or sync through ``changes/``.
+"""
+import asyncio
+import json
+import re
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+PREFIX = '/api/events/'
+TOPIC = re.compile(r'(tasks|meetings|projects|projects/\d+)')
+HEARTBEAT = 15  # seconds between keepalive comments, so proxies keep idle streams open
+MAX_PENDING = 100  # events buffered per client; beyond this it gets a single reload
+HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def message(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+RELOAD = message('reload', {})
+KEEPALIVE = b': keepalive\n\n'
+
+
+class Subscription:
+    """The events of one topic that one client has not received yet.
+
+    Only touched from the event loop of its client. Pending events are kept in
+    order without duplicates and sent together in one write. Setting
+    :attr:`ready` without events wakes the client for a keepalive.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    def put(self, event):
+        if len(self.pending) >= MAX_PENDING:
+            self.pending.clear()
+            event = RELOAD
+        self.pending[event] = None
+        self.ready.set()
+
+    async def get(self):
+        await self.ready.wait()
+        events, self.pending = b''.join(self.pending), {}
+        self.ready.clear()
+        return events
+
+
+class Broker:
+    """Fans events out to the subscriptions of a topic in this process.
+
+    :meth:`publish` may be called from any thread; each event loop with
+    subscribers is woken once per event.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, topic):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.setdefault(topic, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self.lock:
+                subscriptions = self.subscriptions[topic]
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[topic]
+
+    def topics(self):
+        with self.lock:
+            return list(self.subscriptions)
+
+    def publish(self, topic, event):
+        loops = {}
+        with self.lock:
+            for subscription in self.subscriptions.get(topic, ()):
+                loops.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in loops.items():
+            loop.call_soon_threadsafe(deliver, subscriptions, event)
+
+
+def deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.put(event)
+
+
+broker = Broker()
+
+
+def publish(topics, resource, pk, deleted=False):
+    """Tell the subscribers of ``topics`` that an object changed, once the transaction commits."""
+    if not broker.subscriptions:
+        return
+    event = message('change', {'resource': resource, 'id': pk, 'deleted': deleted})
+
+    def send():
+        for topic in topics:
+            broker.publish(topic, event)
+    transaction.on_commit(send)
+
+
+def task_changed(pk, project_ids, deleted=False):
+    """A task changed; its projects' totals changed with it."""
+    project_ids = [project_id for project_id in dict.fromkeys(project_ids) if project_id is not None]
+    publish(['tasks', *(f'projects/{project_id}' for project_id in project_ids)], 'tasks', pk, deleted)
+    for project_id in project_ids:
+        publish(['projects'], 'projects', project_id)
+
+
+def tasks_changed(project_ids):
+    """Several tasks changed at once; ``project_ids`` maps each to its projects, as for :func:`task_changed`.
+
+    Beyond ``MAX_PENDING`` tasks a client would get a reload anyway, so that is
+    sent instead.
+    """
+    if len(project_ids) > MAX_PENDING:
+        reload('tasks', 'projects')
+        return
+    for pk, projects in project_ids.items():
+        task_changed(pk, projects)
+
+
+def reload(*resources):
+    """Ask the subscribers of ``resources`` to fetch everything again, e.g. after writes without signals."""
+    def send():
+        for topic in broker.topics():
+            if topic.partition('/')[0] in resources:
+                broker.publish(topic, RELOAD)
+    if broker.subscriptions:
+        transaction.on_commit(send)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class EventStream:
+    """ASGI app serving the event streams under :data:`PREFIX`; other requests go to ``application``."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(PREFIX):
+            return await self.application(scope, receive, send)
+        topic = scope['path'][len(PREFIX):].strip('/')
+        if not TOPIC.fullmatch(topic):
+            return await self.respond(send, 404, b'Onbekend onderwerp.')
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, b'Alleen GET is toegestaan.')
+        await self.stream(topic, receive, send)
+
+    async def respond(self, send, status, body):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, topic, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': HEADERS})
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        loop = asyncio.get_running_loop()
+        with broker.subscribe(topic) as subscription:
+            disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+            disconnect.add_done_callback(lambda _: subscription.close())
+            try:
+                while not subscription.closed:
+                    heartbeat = loop.call_later(HEARTBEAT, subscription.ready.set)
+                    body = await subscription.get()
+                    heartbeat.cancel()
+                    if not subscription.closed:
+                        await send({'type': 'http.response.body', 'body': body or KEEPALIVE, 'more_body': True})
+            finally:
+                disconnect.cancel()
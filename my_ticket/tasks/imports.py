@@ -0,0 +1,43 @@
+"""What can be bulk imported into the tasks table (see :mod:`common.imports`).
+
+:data:`SPECS` also holds the contacts tables, for the ``bulk_import`` command.
+"""
+from django.db.models import F
+
+from common.imports import Reference, Spec
+from contacts.imports import SPECS as CONTACT_SPECS
+from contacts.models import address_name, contextcontact_name
+from . import events, rollups, tree
+from .models import Task
+
+
+def tasks_imported():
+    rollups.rebuild()
+    if tree.paths_enabled():
+        tree.rebuild_paths()
+    events.reload('tasks', 'projects')
+
+
+SPECS = {
+    **CONTACT_SPECS,
+    'tasks': Spec(
+        Task, [
+            'subject', 'execution_startdate', 'execution_starttime', 'execution_enddate', 'execution_endtime',
+            'full_days', 'deadline', 'duration_registered', 'duration_projected_internal',
+            'duration_projected_external', 'cycle_group', 'git_branch',
+        ],
+        key=['project', 'subject'],
+        required=['subject'],
+        unique=[('cycle_group', 'execution_startdate')],
+        references={
+            'project_name': Reference('project', F('name')),
+            'contextcontact_name': Reference('assignment', contextcontact_name()),
+            'action_name': Reference('action', F('name')),
+            'context_name': Reference('context', F('name')),
+            'tasktype_name': Reference('tasktype', F('name')),
+            'state_name': Reference('state', F('name')),
+            'location_name': Reference('location', address_name()),
+        },
+        after=tasks_imported,
+    ),
+}
@@ -0,0 +1,135 @@
+"""Cache of the small, rarely written lookup tables.
+
+Each table is read with one query and kept under a versioned key
+(``lookups:<model>:<version>``). Saving or deleting a row bumps the table's
+version (see :mod:`tasks.signals`) and old entries simply age out.
+``QuerySet.update()`` and ``bulk_*`` writes send no signals; call
+:func:`invalidate` after them.
+
+``settings.LOOKUP_CACHE`` picks the backend: ``'process'`` for an LRU in each
+process, or the alias of a Django cache to share tables (and invalidations)
+between processes. A process only bumps its own versions, so with several
+worker processes the LRU serves a table written elsewhere for up to
+``settings.LOOKUP_CACHE_TIMEOUT`` seconds; use a shared cache there.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Action, Context, MeetingAcceptance, MeetingRoom, State, Tag, TaskType
+
+MODELS = [Action, Context, State, Tag, TaskType, MeetingAcceptance, MeetingRoom]
+
+
+class ProcessBackend:
+    """A small thread-safe LRU in this process whose entries expire after ``timeout`` seconds."""
+
+    def __init__(self, max_entries=128, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        """Whether ``key`` has an entry that has not expired; call with the lock held."""
+        if key not in self.entries:
+            return False
+        if self.entries[key][0] <= time.monotonic():
+            del self.entries[key]
+            return False
+        return True
+
+    def get(self, key):
+        with self.lock:
+            if not self.live(key):
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def add(self, key, value):
+        with self.lock:
+            if not self.live(key):
+                self.entries[key] = (time.monotonic() + self.timeout, value)
+            return self.entries[key][1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCacheBackend:
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, None)
+
+    def add(self, key, value):
+        self.cache.add(key, value, None)
+        return self.cache.get(key, value)
+
+    def clear(self):
+        self.cache.delete_many([version_key(model) for model in MODELS])
+
+
+_backends = {}
+
+
+def backend():
+    name = getattr(settings, 'LOOKUP_CACHE', 'process')
+    if name not in _backends:
+        if name == 'process':
+            _backends[name] = ProcessBackend(timeout=getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 60))
+        else:
+            _backends[name] = DjangoCacheBackend(name)
+    return _backends[name]
+
+
+def is_lookup(model):
+    return model in MODELS
+
+
+def version_key(model):
+    return f'lookups:{model._meta.label_lower}:version'
+
+
+def version(model):
+    """The current version of ``model``'s table; starts from the clock so it differs between restarts."""
+    return backend().add(version_key(model), time.time_ns())
+
+
+def invalidate(model):
+    backend().set(version_key(model), time.time_ns())
+
+
+def table(model):
+    """All rows of ``model`` by primary key, from the cache or with one query."""
+    key = f'lookups:{model._meta.label_lower}:{version(model)}'
+    rows = backend().get(key)
+    if rows is None:
+        rows = {obj.pk: obj for obj in model._default_manager.order_by('pk')}
+        backend().set(key, rows)
+    return rows
+
+
+def rows(model):
+    return list(table(model).values())
+
+
+def name(model, pk):
+    """The display name of a row, or ``None`` for an unknown or empty ``pk``."""
+    obj = table(model).get(pk) if pk is not None else None
+    return str(obj) if obj is not None else None
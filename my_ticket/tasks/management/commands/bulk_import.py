@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.imports import InvalidFile, load
+from tasks.imports import SPECS
+
+
+class Command(BaseCommand):
+    help = "Load a CSV or NDJSON file into tasks, contacts, contextcontacts or addresses, updating existing rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(SPECS))
+        parser.add_argument('path', help="The file to load, or - for standard input.")
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'], help="Format of the file; by default taken from its extension."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        try:
+            if path == '-':
+                report = load(SPECS[options['table']], sys.stdin.buffer, format)
+            else:
+                with open(path, 'rb') as stream:
+                    report = load(SPECS[options['table']], stream, format)
+        except (InvalidFile, OSError) as error:
+            raise CommandError(error)
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"regel {error['line']}: {error['error']}"))
+        if report['ignored_columns']:
+            self.stdout.write(self.style.WARNING(f"genegeerde kolommen: {', '.join(report['ignored_columns'])}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rijen in {report['seconds']:.1f} s ({report['rows_per_second']} rijen/s): "
+            f"{report['inserted']} nieuw, {report['updated']} bijgewerkt, {report['unchanged']} ongewijzigd, "
+            f"{report['rejected']} geweigerd"
+        ))
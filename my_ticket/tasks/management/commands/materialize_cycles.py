@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tasks.materialize import HORIZON_DAYS, materialize_cycles
+
+
+class Command(BaseCommand):
+    help = "Create the tasks for all cycle occurrences within the rolling horizon."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=HORIZON_DAYS, help="Length of the horizon in days.")
+
+    def handle(self, *args, **options):
+        created = materialize_cycles(horizon_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{created} taken aangemaakt"))
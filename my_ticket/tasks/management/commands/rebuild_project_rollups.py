@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tasks.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the task totals of every project from scratch."
+
+    def handle(self, *args, **options):
+        updated = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{updated} projecten bijgewerkt"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tasks.tree import rebuild_paths
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized path of every task (see TASK_TREE_PATHS)."
+
+    def handle(self, *args, **options):
+        updated = rebuild_paths()
+        self.stdout.write(self.style.SUCCESS(f"{updated} paden bijgewerkt"))
@@ -0,0 +1,107 @@
+"""Turn Cycle occurrences into concrete Task rows.
+
+Each occurrence of a cycle with a ``source_task`` becomes a copy of that task
+whose execution dates and deadline are shifted to the occurrence, and whose
+``cycle_group`` is the id of the cycle. Occurrences that already have a task
+with that ``cycle_group`` and ``execution_startdate``, or that fall on the
+source task's own date, are skipped, so running the job again only fills in
+what is missing within the horizon. The ``task_cycle_occurrence_unique``
+constraint keeps concurrent runs from adding an occurrence twice.
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, rollups, tree
+from .models import Cycle, Task
+
+HORIZON_DAYS = 90
+BATCH_SIZE = 1000
+
+# Copied from the source task onto every occurrence.
+SKIPPED_FIELDS = {'id', 'created_at', 'updated_at', 'cycle_group', 'path'}
+SHIFTED_FIELDS = ['execution_startdate', 'execution_enddate', 'deadline']
+
+
+def clone_task(source, anchor, occurrence, cycle_group):
+    clone = Task(cycle_group=cycle_group)
+    for field in Task._meta.concrete_fields:
+        if field.name not in SKIPPED_FIELDS:
+            setattr(clone, field.attname, getattr(source, field.attname))
+
+    delta = occurrence - anchor
+    for name in SHIFTED_FIELDS:
+        value = getattr(source, name)
+        if value is not None:
+            setattr(clone, name, value + delta)
+    clone.execution_startdate = occurrence
+    return clone
+
+
+def materialize_cycles(cycles=None, today=None, horizon_days=HORIZON_DAYS):
+    """Create the missing tasks for all occurrences in ``[today, today + horizon_days]``.
+
+    Works on all cycles with a source task unless a queryset is given, and
+    returns the number of tasks created. Every step is a batched query: one
+    for the cycles (locked, so runs over the same cycles take turns), one for
+    the existing occurrences, bulk inserts for the tasks, one to read back
+    their ids and bulk inserts for their tags. With ``TASK_TREE_PATHS`` the
+    clones get their paths as batch-created tasks do.
+    """
+    today = today or timezone.localdate()
+    horizon = today + datetime.timedelta(days=horizon_days)
+    if cycles is None:
+        cycles = Cycle.objects.all()
+    with transaction.atomic():
+        cycles = list(
+            cycles.filter(source_task__isnull=False, start__lte=horizon, end__gte=today)
+            .select_related('source_task')
+            .prefetch_related('source_task__tags')
+            .select_for_update(of=('self',))
+        )
+        if not cycles:
+            return 0
+
+        occurrences = Task.objects.filter(
+            cycle_group__in=[cycle.pk for cycle in cycles], execution_startdate__range=(today, horizon)
+        )
+        stored = list(occurrences.values_list('pk', 'cycle_group', 'execution_startdate'))
+        existing = {(cycle_group, startdate) for _, cycle_group, startdate in stored}
+        existing.update((cycle.pk, cycle.source_task.execution_startdate) for cycle in cycles)
+
+        clones = []
+        for cycle in cycles:
+            source = cycle.source_task
+            anchor = source.execution_startdate or cycle.start
+            for occurrence in cycle.occurrences(today, horizon):
+                if (cycle.pk, occurrence) not in existing:
+                    clones.append(clone_task(source, anchor, occurrence, cycle.pk))
+
+        # Occurrences another writer added meanwhile are skipped by the constraint; the
+        # ids are not returned then, so they are read back by occurrence.
+        if not clones:
+            return 0
+        Task.objects.bulk_create(clones, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        ids = {
+            (cycle_group, startdate): pk
+            for pk, cycle_group, startdate in occurrences.exclude(pk__in=[pk for pk, _, _ in stored]).values_list(
+                'pk', 'cycle_group', 'execution_startdate'
+            )
+        }
+        for clone in clones:
+            clone.pk = ids[clone.cycle_group, clone.execution_startdate]
+        rollups.tasks_created(clones)
+        if tree.paths_enabled():
+            tree.update_paths([clone.pk for clone in clones])
+        events.tasks_changed({clone.pk: [clone.project_id] for clone in clones})
+
+        sources = {cycle.pk: cycle.source_task for cycle in cycles}
+        Tagging = Task.tags.through
+        Tagging.objects.bulk_create([
+            Tagging(task_id=clone.pk, tag_id=tag.pk)
+            for clone in clones
+            for tag in sources[clone.cycle_group].tags.all()
+        ], batch_size=BATCH_SIZE)
+
+    return len(clones)
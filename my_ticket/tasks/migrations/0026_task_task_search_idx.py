@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_address_address_search_idx_and_more'),
+        ('tasks', '0025_task_task_deadline_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('subject', config='simple'), name='task_search_idx'),
+        ),
+    ]
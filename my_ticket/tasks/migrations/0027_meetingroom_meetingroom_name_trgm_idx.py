@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:26
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0026_task_task_search_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meetingroom',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('name'), name='gin_trgm_ops'), name='meetingroom_name_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0027_meetingroom_meetingroom_name_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['cycle_group', 'execution_startdate'], name='task_cycle_occurrence_idx'),
+        ),
+    ]
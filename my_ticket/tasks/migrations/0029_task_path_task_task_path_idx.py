@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0028_task_task_cycle_occurrence_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['path'], name='task_path_idx', opclasses=['text_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:36
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+import tasks.bookings
+from django.db import migrations, models
+
+# Bookings that already overlap would make adding the constraint fail with a bare IntegrityError.
+OVERLAPS = """
+    SELECT a.meetingroom_id, a.id, b.id
+    FROM tasks_meeting a
+    JOIN tasks_meeting b ON b.meetingroom_id = a.meetingroom_id AND b.id > a.id
+    WHERE a.enddate > a.startdate AND b.enddate > b.startdate
+        AND tstzrange(a.startdate, a.enddate) && tstzrange(b.startdate, b.enddate)
+    ORDER BY a.meetingroom_id, a.startdate, a.id, b.id
+    LIMIT 21
+"""
+
+
+def report_overlaps(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAPS)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        listed = '\n'.join(
+            f'  lokaal {room}: vergaderingen {first} en {second}' for room, first, second in overlaps[:20]
+        )
+        more = '\n  ...' if len(overlaps) > 20 else ''
+        raise RuntimeError(
+            'Deze vergaderingen overlappen in hetzelfde lokaal. Geef ze een ander lokaal of andere tijden '
+            f'en voer de migratie opnieuw uit:\n{listed}{more}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0029_task_path_task_task_path_idx'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(report_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='meeting',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('enddate__gt', models.F('startdate')), ('enddate__isnull', False), ('startdate__isnull', False)), expressions=[('meetingroom', '='), (tasks.bookings.TsTzRange('startdate', 'enddate', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&')], name='meeting_room_no_overlap', violation_error_message='Het lokaal is in deze periode al geboekt.'),
+        ),
+    ]
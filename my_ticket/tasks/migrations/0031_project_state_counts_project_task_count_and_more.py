@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:39
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0030_meeting_meeting_room_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='state_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='total_registered_time',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='total_projected_time_external',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='total_projected_time_internal',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+    ]
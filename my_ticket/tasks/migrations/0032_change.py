@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+# Tables whose rows are synced: (model label, table).
+SYNCED = [
+    ('tasks.task', 'tasks_task'),
+    ('tasks.meeting', 'tasks_meeting'),
+    ('tasks.project', 'tasks_project'),
+    ('tasks.action', 'tasks_action'),
+    ('tasks.context', 'tasks_context'),
+    ('tasks.state', 'tasks_state'),
+    ('tasks.tag', 'tasks_tag'),
+    ('tasks.tasktype', 'tasks_tasktype'),
+    ('tasks.meetingacceptance', 'tasks_meetingacceptance'),
+    ('tasks.meetingroom', 'tasks_meetingroom'),
+    ('contacts.contact', 'contacts_contact'),
+    ('contacts.contextcontact', 'contacts_contextcontact'),
+    ('contacts.address', 'contacts_address'),
+]
+# Tables whose rows are part of another object: (model label of the object, table, column with its id).
+TOUCHING = [
+    ('tasks.task', 'tasks_task_tags', 'task_id'),
+    ('tasks.task', 'tasks_task_meetings', 'task_id'),
+    ('tasks.task', 'tasks_task_prerequisites', 'from_task_id'),
+    ('tasks.meeting', 'tasks_meetingcontextcontact', 'meeting_id'),
+]
+
+# Records the objects a statement wrote, once per statement. Arguments: model label, id column and
+# whether the rows are the object itself (a delete leaves a tombstone) or only part of it.
+RECORD_CHANGES = """
+CREATE SEQUENCE tasks_change_seq;
+
+CREATE FUNCTION tasks_record_changes() RETURNS trigger LANGUAGE plpgsql AS $function$
+BEGIN
+    EXECUTE format($query$
+        INSERT INTO tasks_change (model, object_id, deleted, txid, seq, changed_at)
+        SELECT %L, object_id, %L, pg_current_xact_id()::text::bigint, nextval('tasks_change_seq'), now()
+        FROM (SELECT DISTINCT %I AS object_id FROM %I ORDER BY 1) written
+        ON CONFLICT (model, object_id) DO UPDATE SET
+            deleted = %s, txid = EXCLUDED.txid, seq = EXCLUDED.seq, changed_at = EXCLUDED.changed_at
+    $query$,
+        TG_ARGV[0], TG_OP = 'DELETE' AND TG_ARGV[2] = 'object', TG_ARGV[1],
+        CASE WHEN TG_OP = 'DELETE' THEN 'old_rows' ELSE 'new_rows' END,
+        CASE WHEN TG_ARGV[2] = 'object' THEN 'EXCLUDED.deleted' ELSE 'tasks_change.deleted' END
+    );
+    RETURN NULL;
+END
+$function$;
+"""
+
+
+def triggers(label, table, column, kind):
+    return [
+        f"""
+        CREATE TRIGGER {table}_{event.lower()}_changes AFTER {event} ON {table}
+        REFERENCING {'OLD' if event == 'DELETE' else 'NEW'} TABLE AS {'old_rows' if event == 'DELETE' else 'new_rows'}
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_record_changes('{label}', '{column}', '{kind}');
+        """
+        for event in ['INSERT', 'UPDATE', 'DELETE']
+    ]
+
+
+def install_sql():
+    sql = [RECORD_CHANGES]
+    for label, table in SYNCED:
+        sql += triggers(label, table, 'id', 'object')
+        sql.append(f"""
+            INSERT INTO tasks_change (model, object_id, deleted, txid, seq, changed_at)
+            SELECT '{label}', id, false, pg_current_xact_id()::text::bigint, nextval('tasks_change_seq'), now()
+            FROM {table} ORDER BY id;
+        """)
+    for label, table, column in TOUCHING:
+        sql += triggers(label, table, column, 'part')
+    return sql
+
+
+def uninstall_sql():
+    sql = [
+        f'DROP TRIGGER {table}_{event}_changes ON {table};'
+        for table in [table for _, table in SYNCED] + [table for _, table, _ in TOUCHING]
+        for event in ['insert', 'update', 'delete']
+    ]
+    return sql + ['DROP FUNCTION tasks_record_changes();', 'DROP SEQUENCE tasks_change_seq;']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0031_project_state_counts_project_task_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('txid', models.BigIntegerField()),
+                ('seq', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'txid', 'seq'], name='change_feed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id'), name='change_model_object_uniq')],
+            },
+        ),
+        migrations.RunSQL(install_sql(), uninstall_sql()),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+# Occurrences stored twice would make adding the constraint fail with a bare IntegrityError.
+DUPLICATES = """
+    SELECT cycle_group, execution_startdate, array_agg(id ORDER BY id)
+    FROM tasks_task
+    WHERE cycle_group IS NOT NULL
+    GROUP BY cycle_group, execution_startdate
+    HAVING count(*) > 1
+    ORDER BY cycle_group, execution_startdate
+    LIMIT 21
+"""
+
+
+def report_duplicates(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DUPLICATES)
+        duplicates = cursor.fetchall()
+    if duplicates:
+        listed = '\n'.join(
+            f'  reeks {cycle_group} op {startdate}: taken {", ".join(map(str, ids))}'
+            for cycle_group, startdate, ids in duplicates[:20]
+        )
+        more = '\n  ...' if len(duplicates) > 20 else ''
+        raise RuntimeError(
+            'Deze herhalingen staan meer dan eens als taak opgeslagen. Verwijder de dubbels '
+            f'en voer de migratie opnieuw uit:\n{listed}{more}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_contact_name_trgm_idx'),
+        ('tasks', '0032_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(report_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('cycle_group__isnull', False)), fields=('cycle_group', 'execution_startdate'), name='task_cycle_occurrence_unique'),
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_cycle_occurrence_idx',
+        ),
+    ]
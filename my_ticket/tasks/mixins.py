@@ -0,0 +1,81 @@
+"""View mixins that need the lookup cache or the row compiler of ``tasks``; the others are in :mod:`common.mixins`."""
+from django.http import Http404
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from common.pagination import KeysetPagination, UnsupportedOrdering
+from . import lookups
+from .rows import compile_fields, represent
+
+
+class LookupCacheMixin:
+    """Serves unfiltered lists and details of a lookup table from :mod:`tasks.lookups`.
+
+    Requests with filter, search or ordering parameters, and all writes, use
+    the database. The list ETag is the table's cache version, so refreshing an
+    unchanged table costs no query at all.
+    """
+    cached_query_params = {'page', 'page_size', 'format', 'fields', 'omit'}
+
+    def from_cache(self):
+        request = self.request
+        return request.method in SAFE_METHODS and set(request.query_params) <= self.cached_query_params
+
+    def paginate_queryset(self, queryset):
+        if self.from_cache():
+            queryset = lookups.rows(queryset.model)
+        return super().paginate_queryset(queryset)
+
+    def get_object(self):
+        if not self.from_cache():
+            return super().get_object()
+        obj = lookups.table(self.get_queryset().model).get(self.cached_pk())
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def cached_pk(self):
+        value = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return int(value) if str(value).isdigit() else None
+
+    def list_validators(self, request, queryset):
+        if not self.from_cache():
+            return super().list_validators(request, queryset)
+        return self.make_etag(request, ['lookups', lookups.version(queryset.model)]), None
+
+    def validators(self, request, model, ids):
+        if not self.from_cache():
+            return super().validators(request, model, ids)
+        return self.make_etag(request, ['lookups', lookups.version(model), ids]), None
+
+
+class ValuesListMixin:
+    """JSON lists are built from ``values()`` rows instead of model instances and serializer fields.
+
+    The output is the same as the serializer's (see :mod:`tasks.rows`), at a
+    fraction of the cost per row. Other renderers, and serializers with
+    fields that cannot be read from columns, use the normal list. Put it after
+    :class:`~common.mixins.SparseFieldsetMixin` and :class:`~common.mixins.ConditionalGetMixin`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        is_json = isinstance(request.accepted_renderer, JSONRenderer)
+        compiled = compile_fields(serializer, queryset) if is_json else None
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        # The ordering keys too, for keyset pagination cursors.
+        try:
+            keys = [name for name, _ in KeysetPagination.get_keys(queryset)]
+        except UnsupportedOrdering:
+            keys = []
+        columns = dict.fromkeys([*compiled.columns, *keys])
+        queryset = queryset.select_related(None).prefetch_related(None).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(represent(compiled, page))
+        return Response(represent(compiled, list(queryset)))
@@ -1,7 +1,10 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
-from datetime import datetime
+from datetime import timedelta
+from common.filters import search_vector, trigram_expression
 from contacts.models import Address, ContextContact
-from dateutil.relativedelta import relativedelta
+from . import bookings, recurrence
 
 
 class Action(models.Model):
@@ -46,6 +49,11 @@ class MeetingRoom(models.Model):
     def __str__(self):
         return f"{self.name}"
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(trigram_expression('name'), name='gin_trgm_ops'), name='meetingroom_name_trgm_idx'),
+        ]
+
 
 class Meeting(models.Model):
     name = models.CharField()
@@ -60,6 +68,14 @@ class Meeting(models.Model):
 
     class Meta:
         ordering = ['-startdate']
+        constraints = [
+            ExclusionConstraint(
+                name=bookings.CONSTRAINT_NAME,
+                expressions=bookings.exclusion_expressions(),
+                condition=bookings.BOOKED,
+                violation_error_message="Het lokaal is in deze periode al geboekt.",
+            ),
+        ]
 
 
 class MeetingAcceptance(models.Model):
@@ -79,8 +95,12 @@ class Project(models.Model):
     name = models.CharField(max_length=255)
     startdate = models.DateField(null=True)
     enddate = models.DateField(null=True)
-    total_projected_time_internal = models.TimeField(default="00:00.000", null=True)
-    total_projected_time_external = models.TimeField(default="00:00.000", null=True)
+    # Totals over the project's tasks, maintained by tasks.rollups.
+    total_projected_time_internal = models.DurationField(default=timedelta)
+    total_projected_time_external = models.DurationField(default=timedelta)
+    total_registered_time = models.DurationField(default=timedelta)
+    task_count = models.PositiveIntegerField(default=0)
+    state_counts = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"{self.name} {self.startdate} - {self.enddate}"
@@ -114,6 +134,8 @@ class Task(models.Model):
     meetings = models.ManyToManyField(Meeting, related_name='tasks', blank=True)
 
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='subtasks')
+    # Materialized "<root id>/.../<id>/" path, only maintained with settings.TASK_TREE_PATHS (see tasks.tree).
+    path = models.TextField(blank=True, default='', editable=False)
     prerequisites = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='unlocks')
 
     project = models.ForeignKey(Project, on_delete=models.CASCADE, blank=True, null=True)
@@ -127,6 +149,21 @@ class Task(models.Model):
     def __str__(self):
         return f"{self.subject}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-deadline', 'id'], name='task_deadline_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='task_created_at_id_idx'),
+            models.Index(fields=['path'], opclasses=['text_pattern_ops'], name='task_path_idx'),
+            GinIndex(search_vector('subject'), name='task_search_idx'),
+        ]
+        constraints = [
+            # One task per occurrence of a cycle (see tasks.materialize).
+            models.UniqueConstraint(
+                fields=['cycle_group', 'execution_startdate'], condition=models.Q(cycle_group__isnull=False),
+                name='task_cycle_occurrence_unique',
+            ),
+        ]
+
 
 class Cycle(models.Model):
     source_task = models.ForeignKey(Task, on_delete=models.SET_NULL, blank=True, null=True)
@@ -148,87 +185,50 @@ class Cycle(models.Model):
     weekday = models.CharField(max_length=50, choices=WEEKDAYS, blank=True, default='')
     month = models.CharField(max_length=50, choices=MONTHS, blank=True, default='')
 
+    def rule(self):
+        """The :mod:`tasks.recurrence` rule this cycle follows."""
+        return recurrence.rule_for(
+            self.cycle_model, self.start, number=self.number, level=self.level,
+            one_level=self.one_level, weekday=self.weekday, month=self.month
+        )
+
+    def occurrences(self, start=None, end=None):
+        """Yield the dates of this cycle within ``[start, end]``, in order."""
+        start = max(start, self.start) if start else self.start
+        end = min(end, self.end) if end else self.end
+        if start > end:
+            return iter(())
+        return self.rule().dates(start, end)
+
+    def next_occurrence(self, after):
+        """The first date of this cycle after ``after``, or ``None``."""
+        return next(iter(self.occurrences(start=after + timedelta(days=1))), None)
+
     def each(self):
-        step = self.one_level
-        date_to_add = self.start
-        dates = []
-
-        while date_to_add <= self.end:
-            dates.append(date_to_add)
-
-            if step == 'day':
-                date_to_add += relativedelta(days=1)
-            elif step == 'week':
-                date_to_add += relativedelta(weeks=1)
-            elif step == 'month':
-                date_to_add += relativedelta(months=1)
-            elif step == 'year':
-                date_to_add += relativedelta(years=1)
-            else:
-                break
-
-        return dates
+        return list(recurrence.rule_for('each', self.start, one_level=self.one_level).dates(self.start, self.end))
 
     def every(self):
-        step_size = self.number
-        level = self.level
-        date_to_add = self.start
-        dates = []
-
-        while date_to_add <= self.end:
-            dates.append(date_to_add)
-
-            if level == 'days':
-                date_to_add += relativedelta(days=int(step_size))
-            elif level == 'weeks':
-                date_to_add += relativedelta(weeks=int(step_size))
-            elif level == 'months':
-                date_to_add += relativedelta(months=int(step_size))
-            elif level == 'years':
-                date_to_add += relativedelta(years=int(step_size))
-            else:
-                break
-
-        return dates
+        return list(recurrence.rule_for('every', self.start, number=self.number, level=self.level).dates(
+            self.start, self.end
+        ))
 
     def dayofweek(self):
-        date_to_add = self.start
-        startdate_weekday = date_to_add.weekday()
-
-        weekday_map = {
-            "Monday": 0,
-            "Tuesday": 1,
-            "Wednesday": 2,
-            "Thursday": 3,
-            "Friday": 4,
-            "Saturday": 5,
-            "Sunday": 6
-        }
-
-        def get_weekday_number(weekdayword):
-            return weekday_map.get(weekdayword, -1)  #
-
-        desired_weekday = get_weekday_number(self.weekday)
-        if not startdate_weekday == desired_weekday:
-            if desired_weekday < startdate_weekday:
-                days_to_add = 7 - (startdate_weekday - desired_weekday)
-            else:
-                days_to_add = abs(desired_weekday - startdate_weekday)
-            date_to_add += relativedelta(days=days_to_add)
-        dates = []
-
-        while date_to_add <= self.end:
-            dates.append(date_to_add)
-            date_to_add += relativedelta(weeks=1)
-
-        return dates
+        return list(recurrence.rule_for('dayofweek', self.start, weekday=self.weekday).dates(self.start, self.end))
 
     def get_repeating_dates(self):
-        if self.cycle_model == 'each':
-            return self.each()
-        elif self.cycle_model == 'every':
-            return self.every()
-        elif self.cycle_model == 'dayofweek':
-            return self.dayofweek()
-        else:
-            return []
+        return list(self.occurrences())
+
+
+class Change(models.Model):
+    """The latest write to a row of a synced table, kept by database triggers (see :mod:`common.changes`)."""
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # Id of the writing transaction (pg_current_xact_id) and position within all changes.
+    txid = models.BigIntegerField()
+    seq = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['model', 'object_id'], name='change_model_object_uniq')]
+        indexes = [models.Index(fields=['model', 'txid', 'seq'], name='change_feed_idx')]
@@ -1,16 +0,0 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
-
-
-class CustomPageNumberPagination(PageNumberPagination):
-    page_size = 6
-    page_size_query_param = 'page_size'
-
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,
-            'page_size': self.get_page_size(self.request),
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data
-        })
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""Closed-form recurrence rules for :class:`tasks.models.Cycle`.
+
+Every rule computes its n-th occurrence directly instead of adding steps from
+the start date, so the occurrences in a window ``[start, end]`` are found by
+jumping to the first index inside the window and yielding lazily from there.
+Expanding a window therefore costs O(window), whatever the age of the cycle.
+"""
+import calendar
+import datetime
+
+WEEKDAY_NUMBERS = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3, 'Friday': 4, 'Saturday': 5, 'Sunday': 6
+}
+MONTH_NUMBERS = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
+    'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+DAY_STEPS = {'day': 1, 'days': 1, 'week': 7, 'weeks': 7}
+MONTH_STEPS = {'month': 1, 'months': 1, 'year': 12, 'years': 12}
+
+
+def month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def last_day(year, month):
+    return calendar.monthrange(year, month)[1]
+
+
+class Never:
+    def dates(self, start, end):
+        return iter(())
+
+
+class Once:
+    def __init__(self, date):
+        self.date = date
+
+    def dates(self, start, end):
+        if start <= self.date <= end:
+            yield self.date
+
+
+class DayRule:
+    """``anchor + k * interval`` days."""
+
+    def __init__(self, anchor, interval):
+        self.anchor = anchor
+        self.interval = interval
+
+    def dates(self, start, end):
+        # First k with anchor + k * interval >= start.
+        k = max(0, -(-(start - self.anchor).days // self.interval))
+        date = self.anchor + datetime.timedelta(days=k * self.interval)
+        step = datetime.timedelta(days=self.interval)
+        while date <= end:
+            yield date
+            date += step
+
+
+class MonthRule:
+    """One date picked in every ``interval``-th month from the anchor month.
+
+    ``pick(year, month)`` chooses the day and may return ``None`` to skip a
+    month, e.g. for a fifth Friday that does not exist.
+    """
+
+    def __init__(self, anchor, interval, pick):
+        self.anchor = month_index(anchor)
+        self.interval = interval
+        self.pick = pick
+
+    def dates(self, start, end):
+        k = max(0, (month_index(start) - self.anchor) // self.interval)
+        last = month_index(end)
+        while self.anchor + k * self.interval <= last:
+            year, month = divmod(self.anchor + k * self.interval, 12)
+            date = self.pick(year, month + 1)
+            if date is not None and start <= date <= end:
+                yield date
+            k += 1
+
+
+def same_day(day):
+    """Day ``day`` of the month, clamped to the last day (31 January -> 28 February)."""
+    def pick(year, month):
+        return datetime.date(year, month, min(day, last_day(year, month)))
+    return pick
+
+
+def day_of_month(number):
+    """Day ``number`` of the month, counted from the end when negative, clamped to the month."""
+    def pick(year, month):
+        days = last_day(year, month)
+        day = number if number > 0 else days + number + 1
+        return datetime.date(year, month, min(max(day, 1), days))
+    return pick
+
+
+def nth_of_month(number, weekday=None):
+    """The ``number``-th (or from the end when negative) day or ``weekday`` of the month."""
+    def pick(year, month):
+        days = last_day(year, month)
+        if weekday is None:
+            day = number if number > 0 else days + number + 1
+        elif number > 0:
+            day = 1 + (weekday - calendar.weekday(year, month, 1)) % 7 + 7 * (number - 1)
+        else:
+            day = days - (calendar.weekday(year, month, days) - weekday) % 7 + 7 * (number + 1)
+        if 1 <= day <= days:
+            return datetime.date(year, month, day)
+        return None
+    return pick
+
+
+def step_rule(start, unit, count):
+    if count < 1:
+        return Once(start)
+    if unit in DAY_STEPS:
+        return DayRule(start, DAY_STEPS[unit] * count)
+    if unit in MONTH_STEPS:
+        return MonthRule(start, MONTH_STEPS[unit] * count, same_day(start.day))
+    return Once(start)
+
+
+def first_last_rule(start, period, number, weekday):
+    number = number or 1
+    if period == 'week':
+        monday = start - datetime.timedelta(days=start.weekday())
+        if weekday is None:
+            weekday = number - 1 if number > 0 else 7 + number
+        if not 0 <= weekday <= 6:
+            return Never()
+        return DayRule(monday + datetime.timedelta(days=weekday), 7)
+    if period == 'month':
+        return MonthRule(start.replace(day=1), 1, nth_of_month(number, weekday))
+    if period == 'year':
+        # Counted within January from the start, within December from the end.
+        anchor = start.replace(month=1 if number > 0 else 12, day=1)
+        return MonthRule(anchor, 12, nth_of_month(number, weekday))
+    return Never()
+
+
+def rule_for(cycle_model, start, number=None, level='', one_level='', weekday='', month=''):
+    """Build the rule for one of the ``Cycle.MODELS``."""
+    weekday_number = WEEKDAY_NUMBERS.get(weekday)
+
+    if cycle_model == 'each':
+        return step_rule(start, one_level, 1)
+    if cycle_model == 'every':
+        return step_rule(start, level, int(number or 0))
+    if cycle_model == 'dayofweek':
+        if weekday_number is None:
+            return Never()
+        return DayRule(start + datetime.timedelta(days=(weekday_number - start.weekday()) % 7), 7)
+    if cycle_model == 'monthsofyear':
+        if month not in MONTH_NUMBERS:
+            return Never()
+        return MonthRule(start.replace(month=MONTH_NUMBERS[month], day=1), 12, same_day(start.day))
+    if cycle_model == 'firstlastof':
+        return first_last_rule(start, one_level, int(number or 0), weekday_number)
+    if cycle_model == 'dayofmonth':
+        if not number:
+            return Never()
+        return MonthRule(start, 1, day_of_month(int(number)))
+    return Never()
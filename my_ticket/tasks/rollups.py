@@ -0,0 +1,173 @@
+"""Per-project totals of the project's tasks, kept up to date incrementally.
+
+Every task write turns into a delta on its project (and on its former project
+when it moved), applied with a single ``UPDATE ... SET total = total + delta``
+so concurrent writes do not lose updates and nothing is aggregated. Code that
+bypasses the model signals (``bulk_create``, ``bulk_update``) calls
+:func:`tasks_created` or :func:`tasks_updated` itself; :func:`rebuild`
+recomputes everything from the tasks to repair drift
+(``manage.py rebuild_project_rollups``).
+"""
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import DurationField, F, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Project, Task
+
+DURATIONS = {
+    'duration_projected_internal': 'total_projected_time_internal',
+    'duration_projected_external': 'total_projected_time_external',
+    'duration_registered': 'total_registered_time',
+}
+TRACKED_FIELDS = ['project_id', 'state_id', *DURATIONS]
+
+_deferred = threading.local()
+
+
+class Delta:
+    def __init__(self):
+        self.durations = dict.fromkeys(DURATIONS.values(), datetime.timedelta())
+        self.task_count = 0
+        self.state_counts = Counter()
+
+    def add(self, values, sign):
+        for field, total in DURATIONS.items():
+            if values[field] is not None:
+                self.durations[total] += sign * values[field]
+        self.task_count += sign
+        if values['state_id'] is not None:
+            self.state_counts[str(values['state_id'])] += sign
+
+    def changes(self):
+        changes = {}
+        for total, delta in self.durations.items():
+            if delta:
+                changes[total] = F(total) + Value(delta, output_field=DurationField())
+        if self.task_count:
+            changes['task_count'] = F('task_count') + self.task_count
+        states = {key: count for key, count in self.state_counts.items() if count}
+        if states:
+            changes['state_counts'] = state_counts_sql(states)
+        return changes
+
+
+def state_counts_sql(states):
+    """Add ``states`` (state id -> delta) to ``state_counts`` in place, dropping states that reach zero."""
+    sql, params = "COALESCE(state_counts, '{}'::jsonb)", []
+    for key, count in sorted(states.items()):
+        sql = f"jsonb_set({sql}, %s::text[], to_jsonb(COALESCE((state_counts ->> %s)::int, 0) + %s))"
+        params += [[key], key, count]
+    sql = f"(SELECT COALESCE(jsonb_object_agg(key, value), '{{}}'::jsonb) FROM jsonb_each({sql}) WHERE value <> '0')"
+    return RawSQL(sql, params)
+
+
+def values_of(task):
+    return {field: getattr(task, field) for field in TRACKED_FIELDS}
+
+
+def stored_values(task_id):
+    """The tracked fields of a task as stored, before a save changes them."""
+    return Task.objects.filter(pk=task_id).values(*TRACKED_FIELDS).first()
+
+
+def collect(deltas, values, sign):
+    if values is not None and values['project_id'] is not None:
+        deltas.setdefault(values['project_id'], Delta()).add(values, sign)
+
+
+def apply(deltas):
+    """Write ``deltas`` (project id -> :class:`Delta`), one UPDATE per project."""
+    for project_id, delta in deltas.items():
+        changes = delta.changes()
+        if changes:
+            Project.objects.filter(pk=project_id).update(**changes)
+
+
+def task_changed(before, after):
+    """Apply the difference between two versions of a task; either may be ``None`` (created, deleted)."""
+    if before == after:
+        return
+    pending = getattr(_deferred, 'deltas', None)
+    deltas = pending if pending is not None else {}
+    collect(deltas, before, -1)
+    collect(deltas, after, 1)
+    if pending is None:
+        apply(deltas)
+
+
+@contextmanager
+def deferred():
+    """Collect the changes of all task writes in the block and apply them together when it ends.
+
+    Turns the one UPDATE per deleted task of a cascading or queryset delete
+    into one per project.
+    """
+    if getattr(_deferred, 'deltas', None) is not None:
+        yield
+        return
+    _deferred.deltas = {}
+    try:
+        yield
+        deltas = _deferred.deltas
+    finally:
+        _deferred.deltas = None
+    apply(deltas)
+
+
+def tasks_created(tasks):
+    """Account for tasks written without signals, e.g. with ``bulk_create``."""
+    deltas = {}
+    for task in tasks:
+        collect(deltas, values_of(task), 1)
+    apply(deltas)
+
+
+def tasks_updated(before, tasks):
+    """Account for ``tasks`` written without signals; ``before`` maps their ids to :func:`stored_values`."""
+    deltas = {}
+    for task in tasks:
+        collect(deltas, before.get(task.pk), -1)
+        collect(deltas, values_of(task), 1)
+    apply(deltas)
+
+
+def stored_values_in_bulk(task_ids):
+    return {
+        values.pop('id'): values for values in Task.objects.filter(pk__in=task_ids).values('id', *TRACKED_FIELDS)
+    }
+
+
+def rebuild():
+    """Recompute the totals of every project from its tasks; returns the number of projects."""
+    project, task = Project._meta.db_table, Task._meta.db_table
+    sql = f"""
+        WITH per_state AS (
+            SELECT project_id, state_id, count(*) AS tasks,
+                   sum(duration_projected_internal) AS internal,
+                   sum(duration_projected_external) AS external,
+                   sum(duration_registered) AS registered
+            FROM {task} WHERE project_id IS NOT NULL
+            GROUP BY project_id, state_id
+        ), totals AS (
+            SELECT project_id, sum(tasks) AS tasks, sum(internal) AS internal, sum(external) AS external,
+                   sum(registered) AS registered,
+                   jsonb_object_agg(state_id::text, tasks) FILTER (WHERE state_id IS NOT NULL) AS states
+            FROM per_state GROUP BY project_id
+        )
+        UPDATE {project} p SET
+            total_projected_time_internal = COALESCE(t.internal, interval '0'),
+            total_projected_time_external = COALESCE(t.external, interval '0'),
+            total_registered_time = COALESCE(t.registered, interval '0'),
+            task_count = COALESCE(t.tasks, 0),
+            state_counts = COALESCE(t.states, '{{}}'::jsonb)
+        FROM {project} p2 LEFT JOIN totals t ON t.project_id = p2.id
+        WHERE p.id = p2.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.rowcount
@@ -0,0 +1,221 @@
+"""List responses built from ``values()`` rows instead of serializer fields.
+
+DRF serializes a list by building a model instance per row and asking every
+field for its attribute and then its representation. :func:`compile_fields`
+does the field work once per request instead: each readable field of a
+``ModelSerializer`` becomes the ``values()`` columns it reads and a function
+from those columns to the field's representation. :func:`represent` then
+turns the rows of a page into the serializer's output, key for key, with one
+query per many-to-many field.
+
+A field that cannot be read from columns (a nested serializer, a source that
+is a property or method) makes :func:`compile_fields` return ``None``, and
+the list is serialized the usual way. Method fields are read from the
+columns in the serializer's ``field_sources`` by its
+``<method name>_from_values`` method.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+from common.export import datetime_formatter
+from .serializers import LookupNameField
+
+SKIP = object()
+
+# Fields whose representation depends on the value only, not on the instance.
+VALUE_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.DateField,
+    serializers.DateTimeField, serializers.DecimalField, serializers.DurationField, serializers.FloatField,
+    serializers.IntegerField, serializers.JSONField, serializers.ReadOnlyField, serializers.TimeField,
+    serializers.UUIDField, LookupNameField,
+)
+# The same representation as a builtin, without the method call.
+PLAIN = {serializers.CharField.to_representation: str, serializers.IntegerField.to_representation: int}
+
+
+class Fields:
+    """The compiled fields of a serializer: ``values()`` columns and a reader per field."""
+
+    def __init__(self):
+        self.columns = {'pk': None}
+        self.readers = []
+        self.many = []
+
+    def add_column(self, column):
+        self.columns[column] = None
+        return column
+
+
+def compile_fields(serializer, queryset):
+    """The :class:`Fields` of ``serializer`` over ``queryset``'s model, or ``None`` if a field is not supported."""
+    opts = queryset.model._meta
+    custom_prefetches = {
+        lookup.prefetch_through for lookup in queryset._prefetch_related_lookups
+        if isinstance(lookup, Prefetch) and lookup.queryset is not None
+    }
+    compiled = Fields()
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            reader = method_reader(serializer, field, compiled)
+        elif isinstance(field, ManyRelatedField):
+            reader = many_reader(field, opts, custom_prefetches, compiled)
+        else:
+            reader = column_reader(field, opts, compiled)
+        if reader is None:
+            return None
+        compiled.readers.append((field.field_name, reader))
+    return compiled
+
+
+def method_reader(serializer, field, compiled):
+    columns = getattr(serializer, 'field_sources', {}).get(field.field_name)
+    method = getattr(serializer, f'{field.method_name}_from_values', None)
+    if columns is None or method is None:
+        return None
+    columns = [compiled.add_column(column) for column in columns]
+    return lambda row: method(*[row[column] for column in columns])
+
+
+def many_reader(field, opts, custom_prefetches, compiled):
+    child = field.child_relation
+    if not isinstance(child, PrimaryKeyRelatedField) or child.pk_field is not None or len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = opts.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.many_to_many or model_field.auto_created or model_field.name in custom_prefetches:
+        return None
+    groups = {}
+    compiled.many.append((model_field, groups))
+    return lambda row: groups.get(row['pk'], [])
+
+
+def column_reader(field, opts, compiled):
+    """A reader for a field whose source is a column, possibly across foreign keys (``project.name``)."""
+    if isinstance(field, PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            return None
+        convert = None
+    elif isinstance(field, serializers.FileField):
+        convert = file_converter(field, opts)
+        if convert is None:
+            return None
+    elif type(field) is serializers.DateTimeField:
+        convert = datetime_converter(field)
+    elif isinstance(field, VALUE_FIELDS):
+        convert = PLAIN.get(type(field).to_representation, field.to_representation)
+    else:
+        return None
+
+    relations, model = [], opts.model
+    for attr in field.source_attrs[:-1]:
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+            return None
+        relations.append(attr)
+        model = model_field.related_model
+    try:
+        model_field = model._meta.get_field(field.source_attrs[-1])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete:
+        return None
+
+    column = compiled.add_column('__'.join(field.source_attrs))
+    nulls = [compiled.add_column('__'.join(relations[:index + 1])) for index in range(len(relations))]
+    if nulls:
+        # A missing related object is handled as in Field.get_attribute.
+        if field.default is not empty:
+            missing = field.get_default()
+        elif field.allow_null:
+            missing = None
+        elif not field.required:
+            missing = SKIP
+        else:
+            return None
+        return related_column(column, convert, nulls, missing)
+    return plain_column(column, convert)
+
+
+def datetime_converter(field):
+    """``to_representation`` of a DateTimeField, with the current time zone looked up once instead of per value."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if not settings.USE_TZ or hasattr(field, 'timezone') or str(output_format).lower() != ISO_8601:
+        return field.to_representation
+    # Columns are aware datetimes, which DRF only moves to the time zone.
+    return datetime_formatter(timezone.get_current_timezone())
+
+
+def file_converter(field, opts):
+    """The file's URL from its name, through the ``FieldFile`` the model would have built."""
+    if len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = opts.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    attr_class = getattr(model_field, 'attr_class', None)
+    if attr_class is None:
+        return None
+    return lambda name: field.to_representation(attr_class(None, model_field, name))
+
+
+def plain_column(column, convert):
+    if convert is None:
+        return lambda row: row[column]
+
+    def read(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return read
+
+
+def related_column(column, convert, nulls, missing):
+    def read(row):
+        for null in nulls:
+            if row[null] is None:
+                return missing
+        value = row[column]
+        return value if value is None or convert is None else convert(value)
+    return read
+
+
+def related_ids(model_field, ids):
+    """The ids related through ``model_field`` to each of ``ids``, in the order a prefetch would give them."""
+    query_name = model_field.related_query_name()
+    groups = {}
+    related = model_field.related_model._default_manager.filter(**{f'{query_name}__in': ids})
+    for pk, related_pk in related.values_list(query_name, 'pk'):
+        groups.setdefault(pk, []).append(related_pk)
+    return groups
+
+
+def represent(compiled, rows):
+    """The serializer's output for ``rows``, dicts of the ``values()`` columns of ``compiled``."""
+    ids = [row['pk'] for row in rows]
+    for model_field, groups in compiled.many:
+        groups.clear()
+        if ids:
+            groups.update(related_ids(model_field, ids))
+    readers = compiled.readers
+    data = []
+    for row in rows:
+        item = {}
+        for name, read in readers:
+            value = read(row)
+            if value is not SKIP:
+                item[name] = value
+        data.append(item)
+    return data
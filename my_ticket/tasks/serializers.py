@@ -1,9 +1,47 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from .models import (
     Action, Context, State, Tag, TaskType, MeetingRoom, Meeting,
     MeetingAcceptance, MeetingContextContact, Project, Task, Cycle
 )
+from common.fields import BulkPrimaryKeyRelatedField
 from contacts.models import Address, ContextContact
+from . import bookings, lookups
+from .dag import would_create_cycle
+from .tree import is_in_subtree
+
+PARENT_LOOP = "Een taak kan niet onder zichzelf of een subtaak hangen."
+PREREQUISITE_LOOP = "Deze voorwaarden zouden een kring vormen met deze taak."
+OCCURRENCE_TAKEN = "Deze cyclus heeft al een taak op deze datum."
+
+
+def cycle_occurrence(attrs, instance=None):
+    """The ``(cycle_group, execution_startdate)`` a write gives a task, or ``None`` when it sets neither or no cycle.
+
+    Fields missing from ``attrs`` keep the value of ``instance``.
+    """
+    if 'cycle_group' not in attrs and 'execution_startdate' not in attrs:
+        return None
+    occurrence = tuple(
+        attrs[name] if name in attrs else getattr(instance, name, None)
+        for name in ('cycle_group', 'execution_startdate')
+    )
+    return occurrence if occurrence[0] is not None else None
+
+
+class LookupNameField(serializers.Field):
+    """Read-only name of a lookup row, taken from :mod:`tasks.lookups` instead of a join.
+
+    Use with the foreign key's id as source, e.g. ``source='state_id'``.
+    """
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return lookups.name(self.model, value)
 
 
 class ActionSerializer(serializers.ModelSerializer):
@@ -61,8 +99,8 @@ class MeetingContextContactSerializer(serializers.ModelSerializer):
 
 
 class MeetingSerializer(serializers.ModelSerializer):
-    meetingroom_name = serializers.CharField(source='meetingroom.name', read_only=True)
-    contacts = serializers.PrimaryKeyRelatedField(
+    meetingroom_name = LookupNameField(MeetingRoom, source='meetingroom_id')
+    contacts = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=ContextContact.objects.all(),
         required=False
@@ -72,63 +110,82 @@ class MeetingSerializer(serializers.ModelSerializer):
         model = Meeting
         fields = ['id', 'name', 'startdate', 'enddate', 'contacts', 'digital_space', 'meetingroom', 'meetingroom_name']
 
+    def validate(self, attrs):
+        def current(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+
+        start, end, meetingroom = current('startdate'), current('enddate'), current('meetingroom')
+        if start is not None and end is not None and end < start:
+            raise serializers.ValidationError({'enddate': "Het einde ligt voor het begin van de vergadering."})
+        if start is not None and end is not None and meetingroom is not None:
+            exclude = self.instance.pk if self.instance is not None else None
+            clash = bookings.conflicts(Meeting.objects.all(), meetingroom, start, end, exclude).first()
+            if clash is not None:
+                raise serializers.ValidationError({'meetingroom': self.booked_message(clash)})
+        return attrs
+
+    @staticmethod
+    def booked_message(clash=None):
+        if clash is None:
+            return "Het lokaal is in deze periode al geboekt."
+        return f"Het lokaal is in deze periode al geboekt voor '{clash.name}' (vergadering {clash.pk})."
+
+    @classmethod
+    def save_meeting(cls, meeting):
+        """Save, turning a booking that slipped past ``validate`` in a concurrent request into a 400."""
+        try:
+            with transaction.atomic():
+                meeting.save()
+        except IntegrityError as error:
+            if bookings.CONSTRAINT_NAME not in str(error):
+                raise
+            raise serializers.ValidationError({'meetingroom': cls.booked_message()})
+
+    @transaction.atomic
     def create(self, validated_data):
-        print(f"Validated data in create: {validated_data}")
-
         contacts_data = validated_data.pop('contacts', [])
-        print(f"Contacts data: {contacts_data}")
 
         # Create the meeting without contacts first
-        meeting = Meeting.objects.create(**validated_data)
-        print(f"Created meeting: {meeting.id}")
-
-        # Handle the through table manually
-        if contacts_data:
-            for contact in contacts_data:
-                MeetingContextContact.objects.create(
-                    meeting=meeting,
-                    contextcontact=contact  # Use the correct field name from your through model
-                )
-            print(f"Created {len(contacts_data)} contact relationships")
+        meeting = Meeting(**validated_data)
+        self.save_meeting(meeting)
+        self.set_contacts(meeting, contacts_data)
 
         return meeting
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        print(f"Validated data in update: {validated_data}")
-
         contacts_data = validated_data.pop('contacts', None)
-        print(f"Contacts data for update: {contacts_data}")
 
         # Update regular fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        self.save_meeting(instance)
 
-        # Handle contacts update through the through table
         if contacts_data is not None:
-            # Delete existing relationships
-            MeetingContextContact.objects.filter(meeting=instance).delete()
-
-            # Create new relationships
-            for contact in contacts_data:
-                MeetingContextContact.objects.create(
-                    meeting=instance,
-                    contextcontact=contact  # Use the correct field name
-                )
-            print(f"Updated with {len(contacts_data)} contact relationships")
+            self.set_contacts(instance, contacts_data)
 
         return instance
 
-    def to_representation(self, instance):
-        """Customize the output to include contact details if needed"""
-        representation = super().to_representation(instance)
+    @staticmethod
+    def set_contacts(meeting, contacts):
+        """Bring the participants of a meeting in line with the given contacts.
 
-        # Get contacts through the through table
-        meeting_contacts = MeetingContextContact.objects.filter(meeting=instance)
-        contact_ids = [mc.contextcontact.id for mc in meeting_contacts]
-        representation['contacts'] = contact_ids
+        Only the difference with the stored participants is written, so the
+        status of participants that stay on the meeting is kept.
+        """
+        wanted = list(dict.fromkeys(contact.pk for contact in contacts))
+        current = set(
+            MeetingContextContact.objects.filter(meeting=meeting).values_list('contextcontact_id', flat=True)
+        )
 
-        return representation
+        removed = current.difference(wanted)
+        if removed:
+            MeetingContextContact.objects.filter(meeting=meeting, contextcontact_id__in=removed).delete()
+
+        MeetingContextContact.objects.bulk_create([
+            MeetingContextContact(meeting=meeting, contextcontact_id=pk)
+            for pk in wanted if pk not in current
+        ])
 
 
 class AddressSerializer(serializers.ModelSerializer):
@@ -141,23 +198,76 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = '__all__'
+        read_only_fields = [
+            'total_projected_time_internal', 'total_projected_time_external', 'total_registered_time',
+            'task_count', 'state_counts',
+        ]
 
 
 class TaskSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     project_name = serializers.CharField(source='project.name', read_only=True)
     contextcontact_name = serializers.SerializerMethodField()
+    action_name = LookupNameField(Action, source='action_id')
+    context_name = LookupNameField(Context, source='context_id')
+    tasktype_name = LookupNameField(TaskType, source='tasktype_id')
+    state_name = LookupNameField(State, source='state_id')
+
+    # Columns behind the method fields, for ?fields= (see SparseFieldsetMixin).
+    field_sources = {
+        'contextcontact_name': [
+            'assignment__contact__firstname', 'assignment__contact__lastname', 'assignment__function'
+        ],
+    }
 
     def get_contextcontact_name(self, obj):
         if obj.assignment and obj.assignment.contact:
-            firstname = obj.assignment.contact.firstname or ""
-            lastname = obj.assignment.contact.lastname or ""
-            function = obj.assignment.function or "onbekend"
-            return f"{firstname} {lastname} ({function})".strip()
+            contact = obj.assignment.contact
+            return self.get_contextcontact_name_from_values(
+                contact.firstname, contact.lastname, obj.assignment.function
+            )
         return ""
 
+    @staticmethod
+    def get_contextcontact_name_from_values(firstname, lastname, function):
+        """The name from the ``field_sources`` columns; all ``None`` when there is no assignment (see tasks.rows)."""
+        if firstname is None and lastname is None and function is None:
+            return ""
+        firstname = firstname or ""
+        lastname = lastname or ""
+        function = function or "onbekend"
+        return f"{firstname} {lastname} ({function})".strip()
+
+    def validate(self, attrs):
+        occurrence = cycle_occurrence(attrs, self.instance)
+        if occurrence is not None:
+            others = Task.objects.filter(cycle_group=occurrence[0], execution_startdate=occurrence[1])
+            if self.instance is not None:
+                others = others.exclude(pk=self.instance.pk)
+            if others.exists():
+                raise serializers.ValidationError({'execution_startdate': OCCURRENCE_TAKEN})
+
+        if self.context.get('batch'):
+            # Checked for the whole batch at once, see TaskViewSet.validate_batch.
+            return attrs
+        parent = attrs.get('parent')
+        if self.instance is not None and parent is not None and is_in_subtree(self.instance.pk, parent.pk):
+            raise serializers.ValidationError({'parent': PARENT_LOOP})
+
+        prerequisites = attrs.get('prerequisites')
+        if self.instance is not None and prerequisites and would_create_cycle(
+            self.instance.pk, [task.pk for task in prerequisites]
+        ):
+            raise serializers.ValidationError({'prerequisites': PREREQUISITE_LOOP})
+        return attrs
+
     class Meta:
         model = Task
-        fields = '__all__'
+        exclude = ['path']
+        # task_cycle_occurrence_unique is checked in validate; DRF's validator would
+        # make both fields required, or default them to None and unlink the task.
+        validators = []
+
 
 class CycleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import events, lookups, rollups
+from .models import Meeting, MeetingContextContact, Project, Task
+from .tree import paths_enabled, update_path
+
+
+@receiver(post_save, sender=Task)
+def keep_task_path(sender, instance, raw=False, **kwargs):
+    if paths_enabled() and not raw:
+        update_path(instance)
+
+
+@receiver(pre_save, sender=Task)
+def remember_rollup_values(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._rollup_values = rollups.stored_values(instance.pk) if instance.pk is not None else None
+
+
+@receiver(post_save, sender=Task)
+def publish_task(sender, instance, raw=False, **kwargs):
+    # Connected before update_rollups, which pops the stored values with the former project.
+    if not raw:
+        before = getattr(instance, '_rollup_values', None) or {}
+        events.task_changed(instance.pk, [before.get('project_id'), instance.project_id])
+
+
+@receiver(post_save, sender=Task)
+def update_rollups(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.task_changed(instance.__dict__.pop('_rollup_values', None), rollups.values_of(instance))
+
+
+@receiver(post_delete, sender=Task)
+def remove_from_rollups(sender, instance, **kwargs):
+    rollups.task_changed(rollups.values_of(instance), None)
+
+
+@receiver(post_delete, sender=Task)
+def publish_deleted_task(sender, instance, **kwargs):
+    events.task_changed(instance.pk, [instance.project_id], deleted=True)
+
+
+def publish_task_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """Tags, meetings and prerequisites are part of a task; ``reverse`` writes come from the other side."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        events.task_changed(instance.pk, [instance.project_id])
+    elif pk_set is None:
+        events.reload('tasks', 'projects')
+    else:
+        for pk, project_id in Task.objects.filter(pk__in=pk_set).values_list('pk', 'project_id'):
+            events.task_changed(pk, [project_id])
+
+
+for through in (Task.tags.through, Task.meetings.through, Task.prerequisites.through):
+    m2m_changed.connect(publish_task_relations, sender=through, dispatch_uid=f'publish_{through.__name__}')
+
+
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+def publish_meeting(sender, instance, signal, raw=False, **kwargs):
+    if not raw:
+        events.publish(['meetings'], 'meetings', instance.pk, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=MeetingContextContact)
+@receiver(post_delete, sender=MeetingContextContact)
+def publish_participant(sender, instance, raw=False, **kwargs):
+    if not raw:
+        events.publish(['meetings'], 'meetings', instance.meeting_id)
+
+
+@receiver(m2m_changed, sender=MeetingContextContact)
+def publish_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        events.publish(['meetings'], 'meetings', instance.pk)
+    elif pk_set is None:
+        events.reload('meetings')
+    else:
+        for pk in pk_set:
+            events.publish(['meetings'], 'meetings', pk)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def publish_project(sender, instance, signal, raw=False, **kwargs):
+    if not raw:
+        topics = ['projects', f'projects/{instance.pk}']
+        events.publish(topics, 'projects', instance.pk, deleted=signal is post_delete)
+
+
+def invalidate_lookup(sender, **kwargs):
+    # Again on commit: a reader may have cached the old rows under the new version
+    # before the write was visible. This only reaches the backend of this process;
+    # other processes' LRUs notice once their entries expire (LOOKUP_CACHE_TIMEOUT).
+    lookups.invalidate(sender)
+    transaction.on_commit(lambda: lookups.invalidate(sender))
+
+
+for model in lookups.MODELS:
+    post_save.connect(invalidate_lookup, sender=model, dispatch_uid=f'invalidate_lookup_{model.__name__}')
+    post_delete.connect(invalidate_lookup, sender=model, dispatch_uid=f'invalidate_lookup_delete_{model.__name__}')
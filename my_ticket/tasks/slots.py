@@ -0,0 +1,141 @@
+"""Free slots for a meeting of several participants in a room that fits.
+
+The busy intervals of all participants (their meetings and timed task
+executions) are read in two queries, sorted and merged in one sweep; the gaps
+that remain are walked in time order. Rooms are read with their bookings in the
+window and checked smallest first, each with a pointer into its own merged
+bookings that only moves forward, so finding K slots costs
+O(n log n) for the sort plus O(n + K * rooms) for the walk.
+"""
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import bookings
+from .models import Meeting, MeetingContextContact, MeetingRoom, Task
+
+
+def merge(intervals):
+    """Sort ``(start, end)`` intervals and merge the ones that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def gaps(busy, start, end):
+    """The free ``(start, end)`` intervals of ``[start, end)`` between the merged ``busy`` intervals."""
+    moment = start
+    for busy_start, busy_end in busy:
+        if busy_end <= moment:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > moment:
+            yield moment, busy_start
+        moment = max(moment, busy_end)
+    if moment < end:
+        yield moment, end
+
+
+def task_interval(startdate, starttime, enddate, endtime, full_days, duration):
+    """The busy interval of a task execution, or ``None`` when it is not planned in time."""
+    enddate = enddate or startdate
+    if full_days:
+        start, end = datetime.datetime.combine(startdate, datetime.time.min), \
+            datetime.datetime.combine(enddate + datetime.timedelta(days=1), datetime.time.min)
+    elif starttime is None:
+        return None
+    else:
+        start = datetime.datetime.combine(startdate, starttime)
+        if endtime is not None:
+            end = datetime.datetime.combine(enddate, endtime)
+        else:
+            end = start + (duration or datetime.timedelta())
+    start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return (start, end) if end > start else None
+
+
+def participant_busy(participants, start, end):
+    """The merged busy intervals of the given context contacts in ``[start, end)``."""
+    meetings = bookings.booked_between(
+        Meeting.objects.filter(
+            pk__in=MeetingContextContact.objects.filter(contextcontact__in=participants).values('meeting')
+        ),
+        start, end,
+    ).values_list('startdate', 'enddate')
+
+    tasks = Task.objects.filter(
+        Q(execution_starttime__isnull=False) | Q(full_days=True),
+        Q(execution_enddate__gte=start.date())
+        | Q(execution_enddate__isnull=True, execution_startdate__gte=start.date()),
+        assignment__in=participants,
+        execution_startdate__lte=end.date(),
+    ).values_list(
+        'execution_startdate', 'execution_starttime', 'execution_enddate', 'execution_endtime', 'full_days',
+        'duration_projected_internal',
+    )
+
+    intervals = list(meetings)
+    intervals += filter(None, (task_interval(*task) for task in tasks))
+    return merge(intervals)
+
+
+class RoomSchedule:
+    """The rooms of at least ``capacity`` seats, smallest first, with their merged bookings."""
+
+    def __init__(self, capacity, start, end):
+        self.rooms = list(MeetingRoom.objects.filter(capacity__gte=capacity).order_by('capacity', 'pk'))
+        booked = {}
+        meetings = bookings.booked_between(Meeting.objects.filter(meetingroom__in=self.rooms), start, end)
+        for room_id, booked_start, booked_end in meetings.values_list('meetingroom_id', 'startdate', 'enddate'):
+            booked.setdefault(room_id, []).append((booked_start, booked_end))
+        self.busy = [merge(booked.get(room.pk, [])) for room in self.rooms]
+        self.positions = [0] * len(self.rooms)
+
+    def first_free(self, start, end):
+        """``(room, None)`` for the smallest room free during ``[start, end)``.
+
+        Otherwise ``(None, moment)`` with the first moment a room comes free, or
+        ``(None, None)`` without rooms. Calls must come with non-decreasing ``start``.
+        """
+        resume = None
+        for index, room in enumerate(self.rooms):
+            busy, position = self.busy[index], self.positions[index]
+            while position < len(busy) and busy[position][1] <= start:
+                position += 1
+            self.positions[index] = position
+            if position == len(busy) or busy[position][0] >= end:
+                return room, None
+            if resume is None or busy[position][1] < resume:
+                resume = busy[position][1]
+        return None, resume
+
+
+def find_slots(participants, duration, start, end, capacity=0, limit=5):
+    """The first ``limit`` slots of ``duration`` in ``[start, end)`` that suit every participant, with a room.
+
+    Slots inside one free stretch follow each other back to back. Returns a
+    list of ``(start, end, room)``.
+    """
+    schedule = RoomSchedule(capacity, start, end)
+    slots = []
+    for gap_start, gap_end in gaps(participant_busy(participants, start, end), start, end):
+        moment = gap_start
+        while moment + duration <= gap_end:
+            room, resume = schedule.first_free(moment, moment + duration)
+            if room is not None:
+                slots.append((moment, moment + duration, room))
+                if len(slots) == limit:
+                    return slots
+                moment += duration
+            elif resume is None:
+                return slots
+            else:
+                moment = resume
+    return slots
@@ -1,3 +1,1582 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
+
+from common.filters import FullTextSearchFilter, TrigramSimilarityFilter
+from common.pagination import (
+    CountStrategyPaginator, CustomPageNumberPagination, KeysetPagination, UnsupportedOrdering, is_nullable
+)
+from contacts.models import Address, Contact, ContextContact
+from .models import Cycle, Meeting, MeetingAcceptance, MeetingContextContact, MeetingRoom, Project, State, Tag, Task
+from . import lookups
+from .bookings import conflicts
+from .dag import would_create_cycle
+from .events import EventStream
+from .materialize import materialize_cycles
+from .tree import rebuild_paths
+from .rollups import rebuild
+from .serializers import OCCURRENCE_TAKEN, PARENT_LOOP, PREREQUISITE_LOOP
+from .slots import gaps, merge
+from .views import TaskViewSet
+
+
+def office_address():
+    address, _ = Address.objects.get_or_create(
+        name='Kantoor', street='Straat 1', zip='9000', city='Gent', country='België'
+    )
+    return address
+
+
+def make_context_contacts(contact, contexts, function=''):
+    """One context contact of ``contact`` per context, at the office address."""
+    address = office_address()
+    return ContextContact.objects.bulk_create([
+        ContextContact(contact=contact, context=context, function=function, emailaddress='', telephone='',
+                       postaladdress=address, parking_info='')
+        for context in contexts
+    ])
+
+
+def make_context_contact(firstname, lastname, function=''):
+    """A new contact with a 'werk' context contact."""
+    contact = Contact.objects.create(firstname=firstname, lastname=lastname)
+    return make_context_contacts(contact, ['werk'], function)[0]
+
+
+class TaskListQueryCountTests(APITestCase):
+    url = '/api/tasks/tasks/'
+
+    @classmethod
+    def setUpTestData(cls):
+        contextcontact = make_context_contact('Jan', 'Peeters', 'ontwikkelaar')
+        project = Project.objects.create(name='Eindwerk')
+        room = MeetingRoom.objects.create(name='Zaal 1', capacity=10)
+        meeting = Meeting.objects.create(name='Overleg', meetingroom=room, digital_space='https://example.com')
+        tags = [Tag.objects.create(name=f'tag {i}') for i in range(3)]
+
+        tasks = Task.objects.bulk_create([
+            Task(subject=f'Taak {i}', project=project, assignment=contextcontact)
+            for i in range(500)
+        ])
+        for task in tasks:
+            task.tags.set(tags)
+            task.meetings.set([meeting])
+            task.prerequisites.set([tasks[0]])
+
+    def count_queries(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(queries)
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        self.assertEqual(self.count_queries(6), self.count_queries(500))
+
+    def test_list_includes_related_names_and_m2m_ids(self):
+        response = self.client.get(self.url, {'page_size': 1})
+        task = response.data['results'][0]
+        self.assertEqual(task['project_name'], 'Eindwerk')
+        self.assertEqual(task['contextcontact_name'], 'Jan Peeters (ontwikkelaar)')
+        self.assertEqual(len(task['tags']), 3)
+        self.assertEqual(len(task['meetings']), 1)
+        self.assertEqual(len(task['prerequisites']), 1)
+
+    def test_detail_query_count(self):
+        task = Task.objects.first()
+        # The task, its changes for the ETag, and the prefetches.
+        with self.assertNumQueries(5):
+            response = self.client.get(f'{self.url}{task.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+
+class MeetingListQueryCountTests(APITestCase):
+    url = '/api/tasks/meetings/'
+
+    @classmethod
+    def setUpTestData(cls):
+        contact = Contact.objects.create(firstname='An', lastname='Janssens')
+        cls.contextcontacts = make_context_contacts(contact, [f'context {i}' for i in range(5)])
+        room = MeetingRoom.objects.create(name='Zaal 1', capacity=10)
+        for i in range(50):
+            meeting = Meeting.objects.create(name=f'Overleg {i}', meetingroom=room, digital_space='https://example.com')
+            meeting.contacts.set(cls.contextcontacts)
+
+    def setUp(self):
+        # Room names come from the lookup cache; load it so only the request's own queries are compared.
+        lookups.table(MeetingRoom)
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url, {'page_size': 50})
+        self.assertEqual(len(small), len(large))
+        meeting = response.data['results'][0]
+        self.assertEqual(meeting['meetingroom_name'], 'Zaal 1')
+        self.assertCountEqual(meeting['contacts'], [c.pk for c in self.contextcontacts])
+
+
+class MeetingParticipantWriteTests(APITestCase):
+    url = '/api/tasks/meetings/'
+
+    @classmethod
+    def setUpTestData(cls):
+        contact = Contact.objects.create(firstname='An', lastname='Janssens')
+        cls.contextcontacts = make_context_contacts(contact, [f'context {i}' for i in range(300)])
+        cls.room = MeetingRoom.objects.create(name='Zaal 1', capacity=300)
+        cls.accepted = MeetingAcceptance.objects.create(name='aanvaard')
+
+    def setUp(self):
+        # Room names come from the lookup cache; load it so only the request's own queries are compared.
+        lookups.table(MeetingRoom)
+
+    def payload(self, contacts):
+        return {
+            'name': 'Personeelsvergadering',
+            'meetingroom': self.room.pk,
+            'digital_space': 'https://example.com',
+            'contacts': [c.pk for c in contacts],
+        }
+
+    def test_create_query_count_is_independent_of_participant_count(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.payload(self.contextcontacts[:3]), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, self.payload(self.contextcontacts), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(response.data['contacts']), 300)
+
+    def test_update_keeps_status_of_remaining_participants(self):
+        response = self.client.post(self.url, self.payload(self.contextcontacts[:3]), format='json')
+        meeting_id = response.data['id']
+        MeetingContextContact.objects.filter(meeting_id=meeting_id).update(status=self.accepted)
+
+        response = self.client.put(
+            f'{self.url}{meeting_id}/', self.payload(self.contextcontacts[1:5]), format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.data['contacts'], [c.pk for c in self.contextcontacts[1:5]])
+        statuses = dict(
+            MeetingContextContact.objects.filter(meeting_id=meeting_id).values_list('contextcontact_id', 'status_id')
+        )
+        self.assertEqual(statuses[self.contextcontacts[1].pk], self.accepted.pk)
+        self.assertEqual(statuses[self.contextcontacts[2].pk], self.accepted.pk)
+        self.assertIsNone(statuses[self.contextcontacts[4].pk])
+        self.assertNotIn(self.contextcontacts[0].pk, statuses)
+
+    def test_unknown_contact_is_rejected(self):
+        payload = self.payload(self.contextcontacts[:1])
+        payload['contacts'].append(0)
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('contacts', response.data)
+
+
+class KeysetPaginationTests(APITestCase):
+    url = '/api/tasks/tasks/'
+
+    @classmethod
+    def setUpTestData(cls):
+        deadlines = [None, datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 6, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)]
+        Task.objects.bulk_create([Task(subject=f'Taak {i}', deadline=deadlines[i % 3]) for i in range(20)])
+
+    def walk(self, params, link='next'):
+        response = self.client.get(self.url, params)
+        pages = [response.data]
+        while response.data[link]:
+            response = self.client.get(response.data[link])
+            pages.append(response.data)
+        return pages
+
+    def test_forward_and_backward_follow_ordering(self):
+        expected = list(Task.objects.order_by('-deadline', 'id').values_list('id', flat=True))
+        pages = self.walk({'pagination': 'cursor', 'page_size': 3})
+        self.assertEqual([task['id'] for page in pages for task in page['results']], expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+        last = self.client.get(pages[-1]['previous']).data
+        backwards = [last]
+        while last['previous']:
+            last = self.client.get(last['previous']).data
+            backwards.append(last)
+        ids = [task['id'] for page in reversed(backwards) for task in page['results']]
+        self.assertEqual(ids, expected[:len(ids)])
+        self.assertEqual(len(ids), 18)
+
+    def test_ordering_parameter_is_used_as_keyset(self):
+        expected = list(Task.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        pages = self.walk({'pagination': 'cursor', 'page_size': 7, 'ordering': 'created_at'})
+        self.assertEqual([task['id'] for page in pages for task in page['results']], expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_seek_bounds_follow_nullability(self):
+        self.assertEqual([is_nullable(Task, name) for name in ['created_at', 'deadline', 'project__name', 'pk']],
+                         [False, True, True, False])
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        created = str(Task.objects.filter(
+            KeysetPagination.after([('created_at', False), ('pk', False)], [now, 1], {'created_at': False, 'pk': False})
+        ).query)
+        self.assertIn('"tasks_task"."created_at" >= ', created)
+        self.assertNotIn('IS NULL', created)
+        deadline = str(Task.objects.filter(
+            KeysetPagination.after([('deadline', False), ('pk', False)], [now, 1], {'deadline': True, 'pk': False})
+        ).query)
+        self.assertIn('"tasks_task"."deadline" >= ', deadline)
+        self.assertIn('"tasks_task"."deadline" IS NULL', deadline)
+
+    def test_expression_ordering_falls_back_to_page_numbers(self):
+        pagination = CustomPageNumberPagination()
+        request = Request(APIRequestFactory().get(self.url, {'pagination': 'cursor'}))
+        rows = pagination.paginate_queryset(Task.objects.order_by(Lower('subject')), request)
+        self.assertIsNone(pagination.keyset)
+        self.assertEqual(len(rows), pagination.page_size)
+        with self.assertRaises(UnsupportedOrdering):
+            KeysetPagination.get_keys(Task.objects.order_by('?'))
+
+
+@mock.patch.object(CountStrategyPaginator, 'exact_count_limit', 5)
+class CountStrategyTests(APITestCase):
+    url = '/api/tasks/tasks/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Task.objects.bulk_create([Task(subject=f'Taak {i}') for i in range(20)])
+        Task.objects.bulk_create([Task(subject=f'Klus {i}') for i in range(3)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_result_is_counted_exactly(self):
+        response = self.client.get(self.url, {'search': 'Klus'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse(response.data['count_is_approximate'])
+
+    def test_large_filtered_result_uses_cached_count(self):
+        response = self.client.get(self.url, {'search': 'Taak'})
+        self.assertEqual(response.data['count'], 20)
+        self.assertTrue(response.data['count_is_approximate'])
+
+        Task.objects.create(subject='Taak 20')
+        response = self.client.get(self.url, {'search': 'Taak'})
+        self.assertEqual(response.data['count'], 20)
+
+    def test_large_unfiltered_table_uses_planner_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE tasks_task')
+        response = self.client.get(self.url)
+        self.assertTrue(response.data['count_is_approximate'])
+        self.assertEqual(response.data['count'], 23)
+
+    def test_approximate_pages_detect_the_last_page(self):
+        response = self.client.get(self.url, {'search': 'Taak', 'page': 4})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+
+class FullTextSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Task.objects.bulk_create([
+            Task(subject='Offerte opmaken voor klant'),
+            Task(subject='Offerte opvolgen'),
+            Task(subject='Vergadering voorbereiden offerte offerte'),
+            Task(subject='Factuur versturen'),
+        ])
+        Contact.objects.create(firstname='Annelies', lastname='Vermeulen')
+        Contact.objects.create(firstname='Bart', lastname='Anseeuw')
+
+    def test_prefix_search_on_tasks(self):
+        response = self.client.get('/api/tasks/tasks/', {'search': 'offer opm'})
+        self.assertEqual([task['subject'] for task in response.data['results']], ['Offerte opmaken voor klant'])
+
+    def test_results_are_ranked(self):
+        response = self.client.get('/api/tasks/tasks/', {'search': 'offerte'})
+        subjects = [task['subject'] for task in response.data['results']]
+        self.assertEqual(len(subjects), 3)
+        self.assertEqual(subjects[0], 'Vergadering voorbereiden offerte offerte')
+
+    def test_explicit_ordering_wins_over_rank(self):
+        response = self.client.get('/api/tasks/tasks/', {'search': 'offerte', 'ordering': 'subject'})
+        subjects = [task['subject'] for task in response.data['results']]
+        self.assertEqual(subjects, sorted(subjects))
+
+    def test_search_on_contacts(self):
+        response = self.client.get('/api/contacts/', {'search': 'an'})
+        self.assertEqual(response.data['count'], 2)
+        response = self.client.get('/api/contacts/', {'search': 'verm'})
+        self.assertEqual([c['firstname'] for c in response.data['results']], ['Annelies'])
+
+    def test_search_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        request = Request(APIRequestFactory().get('/api/tasks/tasks/', {'search': 'offerte'}))
+        queryset = FullTextSearchFilter().filter_queryset(request, Task.objects.all(), TaskViewSet())
+        self.assertIn('task_search_idx', queryset.explain())
+
+
+class TrigramSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for firstname, lastname in [('Annelies', 'Vermeulen'), ('Annemie', 'Verhulst'), ('Bart', 'Anseeuw')]:
+            make_context_contact(firstname, lastname)
+        MeetingRoom.objects.create(name='Vergaderzaal Schelde', capacity=12)
+        MeetingRoom.objects.create(name='Leiezaal', capacity=6)
+
+    def test_fuzzy_filter_tolerates_typos(self):
+        response = self.client.get('/api/contacts/', {'fuzzy': 'Vermeulne'})
+        self.assertEqual([c['lastname'] for c in response.data['results']], ['Vermeulen'])
+
+    def test_typeahead_is_ranked_and_limited(self):
+        response = self.client.get('/api/contextcontacts/typeahead/', {'q': 'Annelies Verm', 'limit': 1})
+        self.assertEqual([c['contextcontact_name'] for c in response.data], ['Annelies Vermeulen (onbekend)'])
+
+    def test_typeahead_on_meeting_rooms(self):
+        response = self.client.get('/api/tasks/meetingrooms/typeahead/', {'q': 'schelde'})
+        self.assertEqual([room['name'] for room in response.data], ['Vergaderzaal Schelde'])
+        self.assertEqual(self.client.get('/api/tasks/meetingrooms/typeahead/').data, [])
+
+    def plan_without_scans(self):
+        # With three rows any plan is cheap; leave the trigram index as the only way
+        # to apply the condition without a disabled node (GIN only has bitmap scans).
+        with connection.cursor() as cursor:
+            for setting in ('enable_seqscan', 'enable_indexscan', 'enable_nestloop'):
+                cursor.execute(f'SET LOCAL {setting} = off')
+
+    def test_fuzzy_filter_uses_index(self):
+        self.plan_without_scans()
+        queryset = TrigramSimilarityFilter().search(
+            ContextContact.objects.all(), 'verm', ['contact__firstname', 'contact__lastname']
+        )
+        self.assertIn('contact_name_trgm_idx', queryset.explain())
+
+    def test_context_contact_endpoint_uses_contact_index(self):
+        self.plan_without_scans()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/contextcontacts/', {'fuzzy': 'verm'})
+        self.assertEqual(len(response.data['results']), 2)
+        page = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {page}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('contact_name_trgm_idx', plan)
+
+
+class CycleRecurrenceTests(SimpleTestCase):
+    def cycle(self, **kwargs):
+        kwargs.setdefault('start', date(2025, 1, 31))
+        kwargs.setdefault('end', date(2025, 12, 31))
+        kwargs.setdefault('number', 1)
+        return Cycle(**kwargs)
+
+    def test_each_month_keeps_the_day_of_the_start(self):
+        dates = self.cycle(cycle_model='each', one_level='month').get_repeating_dates()
+        self.assertEqual(dates[:3], [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)])
+        self.assertEqual(len(dates), 12)
+
+    def test_every_two_weeks(self):
+        dates = self.cycle(cycle_model='every', number=2, level='weeks').get_repeating_dates()
+        self.assertEqual(dates[:2], [date(2025, 1, 31), date(2025, 2, 14)])
+        self.assertEqual(dates, self.cycle(cycle_model='every', number=2, level='weeks').every())
+
+    def test_dayofweek(self):
+        dates = self.cycle(cycle_model='dayofweek', weekday='Monday').get_repeating_dates()
+        self.assertEqual(dates[0], date(2025, 2, 3))
+        self.assertTrue(all(d.weekday() == 0 for d in dates))
+
+    def test_monthsofyear(self):
+        cycle = self.cycle(cycle_model='monthsofyear', month='February', start=date(2020, 1, 30), end=date(2025, 1, 1))
+        self.assertEqual(cycle.get_repeating_dates(), [
+            date(2020, 2, 29), date(2021, 2, 28), date(2022, 2, 28), date(2023, 2, 28), date(2024, 2, 29)
+        ])
+
+    def test_firstlastof(self):
+        first_monday = self.cycle(cycle_model='firstlastof', number=1, one_level='month', weekday='Monday')
+        self.assertEqual(first_monday.get_repeating_dates()[:2], [date(2025, 2, 3), date(2025, 3, 3)])
+        last_day = self.cycle(cycle_model='firstlastof', number=-1, one_level='month')
+        self.assertEqual(last_day.get_repeating_dates()[:2], [date(2025, 1, 31), date(2025, 2, 28)])
+        last_friday = self.cycle(cycle_model='firstlastof', number=-1, one_level='year', weekday='Friday')
+        self.assertEqual(last_friday.get_repeating_dates(), [date(2025, 12, 26)])
+
+    def test_dayofmonth(self):
+        dates = self.cycle(cycle_model='dayofmonth', number=15).get_repeating_dates()
+        self.assertEqual(dates[0], date(2025, 2, 15))
+        self.assertEqual(len(dates), 11)
+
+    def test_window_and_next_occurrence_do_not_iterate_from_start(self):
+        cycle = self.cycle(cycle_model='each', one_level='day', start=date(1900, 1, 1), end=date(2999, 12, 31))
+        window = list(cycle.occurrences(date(2025, 3, 1), date(2025, 3, 7)))
+        self.assertEqual(window, [date(2025, 3, d) for d in range(1, 8)])
+        self.assertEqual(cycle.next_occurrence(date(2999, 12, 30)), date(2999, 12, 31))
+        self.assertIsNone(cycle.next_occurrence(date(2999, 12, 31)))
+
+
+class MaterializeCyclesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name='wekelijks'), Tag.objects.create(name='team')]
+        cls.source = Task.objects.create(
+            subject='Teamoverleg voorbereiden', execution_startdate=date(2025, 1, 6),
+            execution_enddate=date(2025, 1, 7), deadline=datetime(2025, 1, 8, 9, tzinfo=timezone.utc)
+        )
+        cls.source.tags.set(cls.tags)
+        cls.cycle = Cycle.objects.create(
+            source_task=cls.source, start=date(2025, 1, 6), end=date(2025, 12, 31),
+            cycle_model='dayofweek', weekday='Monday', number=1
+        )
+
+    def test_occurrences_are_cloned_with_tags(self):
+        created = materialize_cycles(today=date(2025, 3, 1), horizon_days=28)
+        self.assertEqual(created, 4)
+        clone = Task.objects.get(cycle_group=self.cycle.pk, execution_startdate=date(2025, 3, 3))
+        self.assertEqual(clone.subject, 'Teamoverleg voorbereiden')
+        self.assertEqual(clone.execution_enddate, date(2025, 3, 4))
+        self.assertEqual(clone.deadline, datetime(2025, 3, 5, 9, tzinfo=timezone.utc))
+        self.assertCountEqual(clone.tags.all(), self.tags)
+
+    def test_rerun_only_adds_missing_occurrences(self):
+        materialize_cycles(today=date(2025, 3, 1), horizon_days=28)
+        self.assertEqual(materialize_cycles(today=date(2025, 3, 1), horizon_days=28), 0)
+        self.assertEqual(materialize_cycles(today=date(2025, 3, 8), horizon_days=28), 1)
+        self.assertEqual(Task.objects.filter(cycle_group=self.cycle.pk).count(), 5)
+
+    def test_query_count_is_independent_of_cycle_count(self):
+        for _ in range(10):
+            Cycle.objects.create(
+                source_task=self.source, start=date(2025, 1, 1), end=date(2025, 12, 31),
+                cycle_model='each', one_level='day', number=1
+            )
+        with self.assertNumQueries(8):
+            materialize_cycles(today=date(2025, 3, 1), horizon_days=28)
+
+    def test_source_date_is_not_cloned(self):
+        self.assertEqual(materialize_cycles(today=date(2025, 1, 6), horizon_days=7), 1)
+        self.assertEqual(
+            list(Task.objects.filter(cycle_group=self.cycle.pk).values_list('execution_startdate', flat=True)),
+            [date(2025, 1, 13)],
+        )
+
+    def test_occurrences_are_unique(self):
+        materialize_cycles(today=date(2025, 3, 1), horizon_days=7)
+        with self.assertRaises(IntegrityError):
+            Task.objects.create(subject='Dubbel', cycle_group=self.cycle.pk, execution_startdate=date(2025, 3, 3))
+
+    def test_put_without_cycle_fields_keeps_the_occurrence(self):
+        materialize_cycles(today=date(2025, 3, 1), horizon_days=7)
+        clone = Task.objects.get(cycle_group=self.cycle.pk)
+        response = self.client.put(
+            f'/api/tasks/tasks/{clone.pk}/', json.dumps({'subject': 'Overleg'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        clone.refresh_from_db()
+        self.assertEqual((clone.cycle_group, clone.execution_startdate), (self.cycle.pk, date(2025, 3, 3)))
+
+    def test_api_rejects_a_taken_occurrence(self):
+        materialize_cycles(today=date(2025, 3, 1), horizon_days=7)
+        occurrence = {'cycle_group': self.cycle.pk, 'execution_startdate': '2025-03-03'}
+        response = self.client.post(
+            '/api/tasks/tasks/', json.dumps({'subject': 'Dubbel', **occurrence}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'execution_startdate': [OCCURRENCE_TAKEN]})
+        response = self.client.patch(
+            f'/api/tasks/tasks/{self.source.pk}/', json.dumps({'cycle_group': self.cycle.pk}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class CalendarTests(APITestCase):
+    url = '/api/tasks/calendar/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Eindwerk')
+        source = Task.objects.create(subject='Stand-up', execution_startdate=date(2025, 1, 1), project=cls.project)
+        cls.cycle = Cycle.objects.create(
+            source_task=source, start=date(2025, 1, 1), end=date(2030, 12, 31),
+            cycle_model='each', one_level='day', number=1
+        )
+        Task.objects.create(
+            subject='Stand-up', execution_startdate=date(2025, 3, 3), cycle_group=cls.cycle.pk, project=cls.project
+        )
+        Task.objects.create(
+            subject='Verslag', deadline=datetime(2025, 3, 2, 12, tzinfo=timezone.utc), project=cls.project
+        )
+        Task.objects.create(subject='Ander project', execution_startdate=date(2025, 3, 2))
+        room = MeetingRoom.objects.create(name='Zaal 1', capacity=10)
+        Meeting.objects.create(
+            name='Demo', meetingroom=room, digital_space='https://example.com',
+            startdate=datetime(2025, 3, 2, 9, tzinfo=timezone.utc),
+            enddate=datetime(2025, 3, 2, 10, tzinfo=timezone.utc)
+        )
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_window_merges_tasks_meetings_and_cycles_in_date_order(self):
+        entries = self.get(start='2025-03-01', end='2025-03-03')
+        self.assertEqual([(e['kind'], e['title']) for e in entries], [
+            ('occurrence', 'Stand-up'),
+            ('task', 'Ander project'),
+            ('occurrence', 'Stand-up'),
+            ('meeting', 'Demo'),
+            ('task', 'Verslag'),
+            ('task', 'Stand-up'),
+        ])
+        self.assertEqual(Task.objects.count(), 4)
+
+    def test_project_filter(self):
+        entries = self.get(start='2025-03-01', end='2025-03-03', project=self.project.pk)
+        self.assertNotIn('Ander project', [e['title'] for e in entries])
+        self.assertNotIn('Demo', [e['title'] for e in entries])
+
+    def test_year_window(self):
+        entries = self.get(start='2026-01-01', end='2026-12-31')
+        self.assertEqual(len(entries), 365)
+
+    def test_invalid_window(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2025-03-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2025-03-01', 'end': '2027-03-01'}).status_code, 400)
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-03', 'project': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.data)
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-03', 'assignment': '1x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PrerequisiteGraphTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Verbouwing')
+        hours = {'ontwerp': 8, 'vergunning': 40, 'afbraak': 16, 'bouw': 80, 'schilderen': 24}
+        cls.tasks = {
+            subject: Task.objects.create(
+                subject=subject, project=cls.project, duration_projected_internal=timedelta(hours=internal)
+            )
+            for subject, internal in hours.items()
+        }
+        cls.tasks['vergunning'].duration_projected_external = timedelta(hours=8)
+        cls.tasks['vergunning'].save()
+        cls.tasks['vergunning'].prerequisites.set([cls.tasks['ontwerp']])
+        cls.tasks['afbraak'].prerequisites.set([cls.tasks['ontwerp']])
+        cls.tasks['bouw'].prerequisites.set([cls.tasks['vergunning'], cls.tasks['afbraak']])
+        cls.tasks['schilderen'].prerequisites.set([cls.tasks['bouw']])
+
+    def test_schedule(self):
+        response = self.client.get(f'/api/tasks/projects/{self.project.pk}/schedule/')
+        ids = {task.pk: subject for subject, task in self.tasks.items()}
+        self.assertEqual([ids[pk] for pk in response.data['critical_path']],
+                         ['ontwerp', 'vergunning', 'bouw', 'schilderen'])
+        order = [ids[pk] for pk in response.data['order']]
+        self.assertLess(order.index('afbraak'), order.index('bouw'))
+        self.assertEqual(response.data['duration'], '6 16:00:00')
+        bouw = next(t for t in response.data['tasks'] if t['id'] == self.tasks['bouw'].pk)
+        self.assertEqual(bouw['earliest_start'], '2 08:00:00')
+
+    def test_cycle_is_rejected(self):
+        response = self.client.patch(
+            f"/api/tasks/tasks/{self.tasks['ontwerp'].pk}/",
+            {'prerequisites': [self.tasks['schilderen'].pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('prerequisites', response.data)
+
+    def test_self_prerequisite_is_rejected(self):
+        task = self.tasks['bouw']
+        self.assertTrue(would_create_cycle(task.pk, [task.pk]))
+        self.assertFalse(would_create_cycle(self.tasks['schilderen'].pk, [self.tasks['afbraak'].pk]))
+
+
+class TaskTreeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.open = State.objects.create(name='Open')
+        cls.done = State.objects.create(name='Klaar')
+        deadline = datetime(2030, 6, 1, 12, tzinfo=timezone.utc)
+        cls.root = Task.objects.create(subject='Verhuis', state=cls.open)
+        cls.pack = Task.objects.create(
+            subject='Inpakken', parent=cls.root, state=cls.done, duration_registered=timedelta(hours=3)
+        )
+        cls.boxes = Task.objects.create(
+            subject='Dozen', parent=cls.pack, state=cls.open, duration_registered=timedelta(hours=1),
+            deadline=deadline,
+        )
+        cls.move = Task.objects.create(subject='Verhuiswagen', parent=cls.root, deadline=deadline + timedelta(days=2))
+
+    def assert_tree(self):
+        response = self.client.get(f'/api/tasks/tasks/{self.root.pk}/tree/')
+        self.assertEqual(response.status_code, 200)
+        nodes = {node['id']: node for node in response.data}
+        self.assertEqual(response.data[0]['id'], self.root.pk)
+        rollup = nodes[self.root.pk]['rollup']
+        self.assertEqual(rollup['subtask_count'], 3)
+        self.assertEqual(rollup['duration_registered'], '04:00:00')
+        self.assertEqual(rollup['state_counts'], {self.open.pk: 2, self.done.pk: 1})
+        self.assertEqual(rollup['earliest_deadline'], '2030-06-01T12:00:00Z')
+        self.assertEqual(nodes[self.pack.pk]['rollup']['subtask_count'], 1)
+        self.assertEqual(nodes[self.move.pk]['parent'], self.root.pk)
+
+    def test_tree_with_recursive_query(self):
+        self.assert_tree()
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/tasks/tasks/{self.root.pk}/tree/')
+
+    @override_settings(TASK_TREE_PATHS=True)
+    def test_tree_with_materialized_paths(self):
+        rebuild_paths()
+        self.boxes.refresh_from_db()
+        self.assertEqual(self.boxes.path, f'{self.root.pk}/{self.pack.pk}/{self.boxes.pk}/')
+        self.assert_tree()
+
+        self.client.patch(f'/api/tasks/tasks/{self.pack.pk}/', {'parent': self.move.pk}, format='json')
+        self.boxes.refresh_from_db()
+        self.assertEqual(self.boxes.path, f'{self.root.pk}/{self.move.pk}/{self.pack.pk}/{self.boxes.pk}/')
+
+    @override_settings(TASK_TREE_PATHS=True)
+    def test_materialized_occurrences_get_paths(self):
+        rebuild_paths()
+        Task.objects.filter(pk=self.boxes.pk).update(execution_startdate=date(2030, 5, 6))
+        cycle = Cycle.objects.create(
+            source_task=self.boxes, start=date(2030, 5, 6), end=date(2030, 12, 31),
+            cycle_model='dayofweek', weekday='Monday', number=1
+        )
+        self.assertEqual(materialize_cycles(today=date(2030, 5, 7), horizon_days=7), 1)
+        clone = Task.objects.get(cycle_group=cycle.pk)
+        self.assertEqual(clone.path, f'{self.root.pk}/{self.pack.pk}/{clone.pk}/')
+        response = self.client.get(f'/api/tasks/tasks/{self.pack.pk}/tree/')
+        self.assertEqual([node['id'] for node in response.data], [self.pack.pk, self.boxes.pk, clone.pk])
+        self.assertEqual(self.client.get(f'/api/tasks/tasks/{clone.pk}/tree/').status_code, 200)
+
+    def test_parent_loop_is_rejected(self):
+        response = self.client.patch(f'/api/tasks/tasks/{self.root.pk}/', {'parent': self.boxes.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+    def test_unknown_task(self):
+        self.assertEqual(self.client.get('/api/tasks/tasks/999999/tree/').status_code, 404)
+
+
+class MeetingRoomBookingTests(APITestCase):
+    url = '/api/tasks/meetings/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = MeetingRoom.objects.create(name='Zaal 1', capacity=10)
+        cls.other_room = MeetingRoom.objects.create(name='Zaal 2', capacity=10)
+        cls.start = datetime(2030, 3, 4, 10, tzinfo=timezone.utc)
+        cls.meeting = Meeting.objects.create(
+            name='Overleg', meetingroom=cls.room, startdate=cls.start, enddate=cls.start + timedelta(hours=1),
+            digital_space='https://example.com',
+        )
+
+    def payload(self, start, hours=1, room=None):
+        return {
+            'name': 'Planning', 'meetingroom': (room or self.room).pk, 'digital_space': 'https://example.com',
+            'startdate': start.isoformat(), 'enddate': (start + timedelta(hours=hours)).isoformat(),
+        }
+
+    def test_overlapping_booking_is_rejected(self):
+        response = self.client.post(self.url, self.payload(self.start + timedelta(minutes=30)), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('meetingroom', response.data)
+
+    def test_concurrent_overlap_is_reported_as_validation_error(self):
+        # As if the clashing meeting was committed after validate() ran.
+        with mock.patch('tasks.serializers.bookings.conflicts', return_value=Meeting.objects.none()):
+            response = self.client.post(self.url, self.payload(self.start), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('meetingroom', response.data)
+
+    def test_adjacent_and_other_room_bookings_are_allowed(self):
+        response = self.client.post(self.url, self.payload(self.start + timedelta(hours=1)), format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(self.url, self.payload(self.start, room=self.other_room), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_moving_a_meeting_does_not_clash_with_itself(self):
+        response = self.client.patch(
+            f'{self.url}{self.meeting.pk}/', {'enddate': (self.start + timedelta(hours=2)).isoformat()}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_database_rejects_overlap(self):
+        with self.assertRaises(IntegrityError):
+            Meeting.objects.create(
+                name='Dubbel', meetingroom=self.room, startdate=self.start, enddate=self.start + timedelta(hours=3),
+                digital_space='https://example.com',
+            )
+
+    def test_conflicts_endpoint(self):
+        params = {
+            'meetingroom': self.room.pk,
+            'start': (self.start - timedelta(hours=1)).isoformat(),
+            'end': (self.start + timedelta(minutes=1)).isoformat(),
+        }
+        response = self.client.get(f'{self.url}conflicts/', params)
+        self.assertEqual([meeting['id'] for meeting in response.data], [self.meeting.pk])
+        response = self.client.get(f'{self.url}conflicts/', {**params, 'exclude': self.meeting.pk})
+        self.assertEqual(response.data, [])
+        self.assertEqual(self.client.get(f'{self.url}conflicts/', {'meetingroom': self.room.pk}).status_code, 400)
+
+    def test_migration_reports_existing_overlaps(self):
+        migration = importlib.import_module('tasks.migrations.0030_meeting_meeting_room_no_overlap')
+        migration.report_overlaps(None, connection.schema_editor())
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ALTER TABLE tasks_meeting DROP CONSTRAINT meeting_room_no_overlap')
+        clash = Meeting.objects.create(
+            name='Dubbel', meetingroom=self.room, startdate=self.start, enddate=self.start + timedelta(hours=3),
+            digital_space='https://example.com',
+        )
+        overlap = f'lokaal {self.room.pk}: vergaderingen {self.meeting.pk} en {clash.pk}'
+        with self.assertRaisesMessage(RuntimeError, overlap):
+            migration.report_overlaps(None, connection.schema_editor())
+
+    def test_conflicts_use_the_exclusion_index(self):
+        queryset = conflicts(Meeting.objects.all(), self.room.pk, self.start, self.start + timedelta(hours=1))
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('meeting_room_no_overlap', queryset.explain())
+
+
+class FreeSlotTests(APITestCase):
+    url = '/api/tasks/slots/'
+
+    @classmethod
+    def setUpTestData(cls):
+        contact = Contact.objects.create(firstname='An', lastname='Janssens')
+        cls.an, cls.bert = make_context_contacts(contact, ['werk', 'vereniging'])
+        cls.booth = MeetingRoom.objects.create(name='Cabine', capacity=1)
+        cls.small = MeetingRoom.objects.create(name='Klein', capacity=2)
+        cls.large = MeetingRoom.objects.create(name='Groot', capacity=10)
+        cls.day = datetime(2030, 3, 4, tzinfo=timezone.utc)
+
+        standup = Meeting.objects.create(
+            name='Standup', meetingroom=cls.booth, startdate=cls.at(9), enddate=cls.at(10),
+            digital_space='https://x.be',
+        )
+        MeetingContextContact.objects.create(meeting=standup, contextcontact=cls.an)
+        Task.objects.create(
+            subject='Klant bellen', assignment=cls.bert, execution_startdate=cls.day.date(),
+            execution_starttime=cls.at(10).time(), duration_projected_internal=timedelta(hours=1),
+        )
+        Meeting.objects.create(
+            name='Training', meetingroom=cls.large, startdate=cls.at(11), enddate=cls.at(12),
+            digital_space='https://x.be',
+        )
+
+    @classmethod
+    def at(cls, hour):
+        return cls.day + timedelta(hours=hour)
+
+    def find(self, **params):
+        query = {
+            'participants': f'{self.an.pk},{self.bert.pk}', 'duration': '01:00:00',
+            'start': self.at(9).isoformat(), 'end': self.at(17).isoformat(), **params,
+        }
+        return self.client.get(self.url, query)
+
+    def test_first_slot_skips_busy_participants(self):
+        response = self.find(capacity=2, limit=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['start'], self.at(11))
+        self.assertEqual(response.data[0]['meetingroom'], self.small.pk)
+
+    def test_slots_wait_for_a_room_with_enough_capacity(self):
+        response = self.find(capacity=5, limit=2)
+        self.assertEqual([slot['start'] for slot in response.data], [self.at(12), self.at(13)])
+        self.assertEqual({slot['meetingroom'] for slot in response.data}, {self.large.pk})
+
+    def test_query_count_does_not_depend_on_participants(self):
+        participants = ','.join(str(pk) for pk in [self.an.pk, self.bert.pk] * 15)
+        with self.assertNumQueries(4):
+            self.find(participants=participants, end=(self.day + timedelta(days=31)).isoformat())
+
+    def test_invalid_duration(self):
+        self.assertEqual(self.find(duration='lang').status_code, 400)
+
+
+class IntervalTests(SimpleTestCase):
+    def test_merge_and_gaps(self):
+        busy = merge([(5, 7), (1, 3), (2, 4), (7, 8), (10, 11)])
+        self.assertEqual(busy, [[1, 4], [5, 8], [10, 11]])
+        self.assertEqual(list(gaps(busy, 0, 12)), [(0, 1), (4, 5), (8, 10), (11, 12)])
+        self.assertEqual(list(gaps(busy, 2, 9)), [(4, 5), (8, 9)])
+
+
+class ProjectRollupTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.open = State.objects.create(name='Open')
+        cls.done = State.objects.create(name='Klaar')
+        cls.project = Project.objects.create(name='Website')
+        cls.other = Project.objects.create(name='Intranet')
+
+    def totals(self, project):
+        project.refresh_from_db()
+        return (project.total_projected_time_internal, project.total_projected_time_external,
+                project.total_registered_time, project.task_count, project.state_counts)
+
+    def test_totals_follow_task_writes(self):
+        design = Task.objects.create(
+            subject='Ontwerp', project=self.project, state=self.open,
+            duration_projected_internal=timedelta(hours=4), duration_registered=timedelta(hours=1),
+        )
+        Task.objects.create(
+            subject='Teksten', project=self.project, duration_projected_external=timedelta(hours=2)
+        )
+        self.assertEqual(self.totals(self.project), (
+            timedelta(hours=4), timedelta(hours=2), timedelta(hours=1), 2, {str(self.open.pk): 1}
+        ))
+
+        design.state = self.done
+        design.duration_registered = timedelta(hours=5)
+        design.save()
+        self.assertEqual(self.totals(self.project)[2:], (timedelta(hours=5), 2, {str(self.done.pk): 1}))
+
+        design.project = self.other
+        design.save()
+        self.assertEqual(self.totals(self.project), (timedelta(), timedelta(hours=2), timedelta(), 1, {}))
+        self.assertEqual(self.totals(self.other)[3:], (1, {str(self.done.pk): 1}))
+
+        design.delete()
+        self.assertEqual(self.totals(self.other), (timedelta(), timedelta(), timedelta(), 0, {}))
+
+    def test_rebuild_repairs_drift(self):
+        Task.objects.create(
+            subject='Ontwerp', project=self.project, state=self.open, duration_projected_internal=timedelta(hours=3)
+        )
+        expected = self.totals(self.project)
+        Project.objects.update(task_count=42, state_counts={'99': 1}, total_projected_time_internal=timedelta())
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(self.totals(self.project), expected)
+        self.assertEqual(self.totals(self.other), (timedelta(), timedelta(), timedelta(), 0, {}))
+
+    def test_project_list_reads_stored_totals(self):
+        Task.objects.create(subject='Ontwerp', project=self.project, duration_projected_internal=timedelta(hours=3))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/projects/')
+        self.assertFalse(any(Task._meta.db_table in query['sql'] for query in queries))
+        project = next(p for p in response.data['results'] if p['id'] == self.project.pk)
+        self.assertEqual(project['total_projected_time_internal'], '03:00:00')
+        self.assertEqual(project['task_count'], 1)
+
+
+class BatchEndpointTests(APITestCase):
+    url = '/api/tasks/tasks/batch/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Import')
+        cls.state = State.objects.create(name='Open')
+        cls.tags = [Tag.objects.create(name='import'), Tag.objects.create(name='klant')]
+
+    def items(self, count):
+        return [
+            {
+                'subject': f'Taak {i}', 'project': self.project.pk, 'state': self.state.pk,
+                'duration_projected_internal': '01:00:00', 'tags': [tag.pk for tag in self.tags],
+            }
+            for i in range(count)
+        ]
+
+    def test_create(self):
+        response = self.client.post(self.url, self.items(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ids']), 3)
+        task = Task.objects.get(pk=response.data['ids'][1])
+        self.assertEqual(task.subject, 'Taak 1')
+        self.assertCountEqual(task.tags.all(), self.tags)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.total_projected_time_internal), (3, timedelta(hours=3)))
+
+    def test_query_count_is_independent_of_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.items(5), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, self.items(200), format='json')
+        self.assertEqual(len(small), len(large))
+
+    def test_errors_per_item_and_nothing_written(self):
+        items = self.items(3)
+        items[1]['project'] = 999999
+        items[2]['subject'] = ''
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['errors']), [1, 2])
+        self.assertIn('project', response.data['errors'][1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_update_and_delete(self):
+        ids = self.client.post(self.url, self.items(3), format='json').data['ids']
+        done = State.objects.create(name='Klaar')
+        before = Task.objects.get(pk=ids[0]).updated_at
+
+        response = self.client.patch(self.url, [
+            {'id': ids[0], 'state': done.pk, 'tags': [self.tags[0].pk]}, {'id': ids[1], 'subject': 'Hernoemd'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        task = Task.objects.get(pk=ids[0])
+        self.assertEqual((task.state, task.subject), (done, 'Taak 0'))
+        self.assertEqual(list(task.tags.all()), [self.tags[0]])
+        self.assertGreater(task.updated_at, before)
+        self.assertEqual(Task.objects.get(pk=ids[1]).subject, 'Hernoemd')
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.state_counts, {str(self.state.pk): 2, str(done.pk): 1})
+
+        self.assertEqual(self.client.delete(self.url, [ids[0], 999999], format='json').status_code, 400)
+        response = self.client.delete(self.url, ids[:2], format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.state_counts), (1, {str(self.state.pk): 1}))
+
+    def test_loops_made_within_the_batch(self):
+        first, second, third = self.client.post(self.url, self.items(3), format='json').data['ids']
+        response = self.client.patch(self.url, [
+            {'id': first, 'prerequisites': [second]}, {'id': second, 'prerequisites': [first]},
+            {'id': third, 'parent': first}, {'id': first, 'parent': third},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {
+            0: {'prerequisites': [PREREQUISITE_LOOP]}, 1: {'prerequisites': [PREREQUISITE_LOOP]},
+            2: {'parent': [PARENT_LOOP]}, 3: {'parent': [PARENT_LOOP]},
+        })
+        self.assertFalse(Task.objects.filter(prerequisites__isnull=False).exists())
+
+        response = self.client.patch(self.url, [
+            {'id': first, 'prerequisites': [second]}, {'id': second, 'prerequisites': [third]},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(TASK_TREE_PATHS=True)
+    def test_paths_of_moved_subtrees(self):
+        root = Task.objects.create(subject='Verhuis')
+        ids = self.client.post(self.url, [{'subject': 'Inpakken', 'parent': root.pk}, {'subject': 'Dozen'}],
+                               format='json').data['ids']
+        self.assertEqual(Task.objects.get(pk=ids[0]).path, f'{root.pk}/{ids[0]}/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(self.url, [{'id': ids[1], 'parent': ids[0]}, {'id': ids[0], 'parent': None}],
+                              format='json')
+        self.assertFalse([query for query in queries if 'parent_id IS NULL' in query['sql']])
+        self.assertEqual(Task.objects.get(pk=ids[1]).path, f'{ids[0]}/{ids[1]}/')
+        self.assertEqual(Task.objects.get(pk=root.pk).path, f'{root.pk}/')
+
+    def test_items_for_the_same_occurrence(self):
+        occurrence = {'cycle_group': 7, 'execution_startdate': '2025-03-03'}
+        response = self.client.post(self.url, [
+            {'subject': 'Eerste', **occurrence}, {'subject': 'Ander', 'cycle_group': 7},
+            {'subject': 'Dubbel', **occurrence},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {2: {'execution_startdate': [OCCURRENCE_TAKEN]}})
+        self.assertFalse(Task.objects.filter(cycle_group=7).exists())
+
+    def test_contacts_batch(self):
+        response = self.client.post('/api/contacts/batch/', [
+            {'firstname': 'An', 'lastname': 'Peeters'}, {'firstname': 'Bert', 'lastname': 'Claes'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Contact.objects.filter(pk__in=response.data['ids']).count(), 2)
+
+    def test_context_contacts_batch_looks_up_relations_once(self):
+        address = office_address()
+        contacts = Contact.objects.bulk_create([Contact(firstname=f'Contact {i}') for i in range(20)])
+
+        def items(count):
+            return [
+                {
+                    'contact': contact.pk, 'postaladdress': address.pk, 'context': 'werk', 'function': 'lid',
+                    'emailaddress': 'x@example.com', 'telephone': '09 123 45 67', 'parking_info': 'Achteraan',
+                }
+                for contact in contacts[:count]
+            ]
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/api/contextcontacts/batch/', items(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post('/api/contextcontacts/batch/', items(20), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small), len(large))
+        response = self.client.post('/api/contextcontacts/batch/', [{**items(1)[0], 'contact': 999999}], format='json')
+        self.assertIn('contact', response.data['errors'][0])
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.task = Task.objects.create(subject='Offerte')
+        cls.state = State.objects.create(name='Open')
+
+    def test_unchanged_task_page(self):
+        url = '/api/tasks/tasks/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Last-Modified', response)
+        self.assertFalse(response.content)
+        # Count, page ids and one aggregate over their changes: no page rows, prefetches or serializing.
+        self.assertEqual(len(queries), 3)
+        self.assertIn(f'"object_id" IN ({self.task.pk})', queries[2]['sql'])
+
+        self.task.subject = 'Offerte v2'
+        self.task.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_page_and_filters_have_their_own_etag(self):
+        url = '/api/tasks/tasks/'
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'search': 'off'})['ETag'])
+
+    def test_table_without_updated_at(self):
+        project = Project.objects.create(name='Website')
+        url = '/api/tasks/projects/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Project.objects.filter(pk=project.pk).update(name='Intranet')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail(self):
+        url = f'/api/tasks/states/{self.state.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch(url, {'name': 'Gepland'}, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rows_the_serializer_shows(self):
+        project = Project.objects.create(name='Website')
+        Task.objects.filter(pk=self.task.pk).update(project=project, state=self.state)
+        url = '/api/tasks/tasks/'
+        etag = self.client.get(url)['ETag']
+        Project.objects.filter(pk=project.pk).update(name='Intranet')
+        etag, previous = self.client.get(url, HTTP_IF_NONE_MATCH=etag)['ETag'], etag
+        self.assertNotEqual(etag, previous)
+        State.objects.filter(pk=self.state.pk).update(name='Gepland')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_model_without_recorded_changes(self):
+        cycle = Cycle.objects.create(source_task=self.task, start=date(2025, 1, 1), end=date(2025, 12, 31), number=1)
+        for url in ['/api/tasks/cycles/', f'/api/tasks/cycles/{cycle.pk}/']:
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            Cycle.objects.filter(pk=cycle.pk).update(number=2)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            Cycle.objects.filter(pk=cycle.pk).update(number=1)
+
+    def test_meeting_participants(self):
+        room = MeetingRoom.objects.create(name='Zaal', capacity=4)
+        meeting = Meeting.objects.create(name='Overleg', meetingroom=room, digital_space='https://x.be')
+        contextcontact = make_context_contact('An', 'Peeters')
+        urls = ['/api/tasks/meetings/', f'/api/tasks/meetings/{meeting.pk}/']
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        MeetingContextContact.objects.create(meeting=meeting, contextcontact=contextcontact)
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sparse_detail_reads_no_deferred_fields(self):
+        url = f'/api/tasks/tasks/{self.task.pk}/'
+        # The task and its changes.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'id,subject'})
+        self.assertEqual(response.data, {'id': self.task.pk, 'subject': 'Offerte'})
+        self.assertIn('Last-Modified', response)
+
+    def test_filtered_list_with_annotations(self):
+        MeetingRoom.objects.create(name='Vergaderzaal', capacity=8)
+        response = self.client.get('/api/tasks/meetingrooms/', {'fuzzy': 'vergader'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+
+
+class LookupCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.state = State.objects.create(name='Open')
+        cls.room = MeetingRoom.objects.create(name='Zaal 1', capacity=10)
+
+    def test_unfiltered_list_and_detail_come_from_the_cache(self):
+        self.client.get('/api/tasks/states/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/states/')
+            etag = response['ETag']
+            self.assertIn(self.state.pk, [state['id'] for state in response.data['results']])
+            self.assertEqual(self.client.get(f'/api/tasks/states/{self.state.pk}/').data['name'], 'Open')
+            self.assertEqual(self.client.get('/api/tasks/states/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/tasks/states/999999/').status_code, 404)
+
+    def test_writes_invalidate(self):
+        etag = self.client.get('/api/tasks/states/')['ETag']
+        self.client.patch(f'/api/tasks/states/{self.state.pk}/', {'name': 'Gepland'}, format='json')
+        response = self.client.get('/api/tasks/states/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups.name(State, self.state.pk), 'Gepland')
+        self.client.delete(f'/api/tasks/states/{self.state.pk}/')
+        self.assertIsNone(lookups.name(State, self.state.pk))
+
+    def test_filtered_list_uses_the_database(self):
+        # Count, page ids and their changes for the ETag, count and page.
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/tasks/states/', {'search': 'op'})
+        self.assertEqual(response.data['results'][0]['name'], 'Open')
+
+    def test_serializers_resolve_names_without_joins(self):
+        task = Task.objects.create(subject='Plannen', state=self.state)
+        lookups.table(State)
+        response = self.client.get(f'/api/tasks/tasks/{task.pk}/')
+        self.assertEqual(response.data['state_name'], 'Open')
+        self.assertIsNone(response.data['tasktype_name'])
+
+    def test_process_backend_expires_writes_from_other_processes(self):
+        backend = lookups.ProcessBackend(timeout=60)
+        with mock.patch.object(lookups, '_backends', {'process': backend}):
+            self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal 1')
+            # As written by another process: no signal reaches this one.
+            MeetingRoom.objects.filter(pk=self.room.pk).update(name='Zaal A')
+            self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal 1')
+            now = lookups.time.monotonic()
+            with mock.patch.object(lookups.time, 'monotonic', return_value=now + 61):
+                self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal A')
+
+    @override_settings(LOOKUP_CACHE='default')
+    def test_django_cache_backend(self):
+        self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal 1')
+        MeetingRoom.objects.filter(pk=self.room.pk).update(name='Zaal A')
+        self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal 1')
+        lookups.invalidate(MeetingRoom)
+        self.assertEqual(lookups.name(MeetingRoom, self.room.pk), 'Zaal A')
+
+
+class SparseFieldsetTests(APITestCase):
+    url = '/api/tasks/tasks/'
+
+    @classmethod
+    def setUpTestData(cls):
+        assignment = make_context_contact('Jan', 'Peeters', 'ontwikkelaar')
+        project = Project.objects.create(name='Eindwerk')
+        task = Task.objects.create(subject='Verslag', project=project, assignment=assignment)
+        task.tags.set([Tag.objects.create(name='school')])
+
+    def test_fields_trim_output_and_query(self):
+        fields = 'id,subject,project_name,contextcontact_name,onbekend'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': fields})
+        task = response.data['results'][0]
+        self.assertEqual(set(task), {'id', 'subject', 'project_name', 'contextcontact_name'})
+        self.assertEqual(task['contextcontact_name'], 'Jan Peeters (ontwikkelaar)')
+        self.assertEqual(task['project_name'], 'Eindwerk')
+        page_query = queries[-1]['sql']
+        self.assertNotIn('attachment', page_query)
+        self.assertNotIn('"tasks_project"."startdate"', page_query)
+        self.assertFalse(any('tasks_task_tags' in query['sql'] for query in queries))
+
+    def test_omit_skips_prefetches(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'omit': 'tags,meetings'})
+        task = response.data['results'][0]
+        self.assertNotIn('tags', task)
+        self.assertIn('prerequisites', task)
+        self.assertIn('attachment', task)
+        self.assertFalse(any('tasks_task_tags' in query['sql'] for query in queries))
+        self.assertTrue(any('tasks_task_prerequisites' in query['sql'] for query in queries))
+
+    def test_detail_and_writes(self):
+        task = Task.objects.get()
+        response = self.client.get(f'{self.url}{task.pk}/', {'fields': 'subject'})
+        self.assertEqual(response.data, {'subject': 'Verslag'})
+        response = self.client.patch(f'{self.url}{task.pk}/?fields=subject', {'subject': 'Rapport'}, format='json')
+        self.assertIn('tags', response.data)
+
+
+class OptionsEndpointTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for firstname, lastname, function in [('Jan', 'Peeters', 'ontwikkelaar'), ('An', 'Janssens', '')]:
+            make_context_contact(firstname, lastname, function)
+        Project.objects.create(name='Website')
+        Project.objects.create(name='Eindwerk')
+
+    def test_pairs_sorted_on_label_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/contextcontacts/options/')
+        self.assertEqual(len(queries), 1)
+        labels = [label for _, label in response.data]
+        self.assertEqual(labels, ['An Janssens (onbekend)', 'Jan Peeters (ontwikkelaar)'])
+        serialized = self.client.get('/api/contextcontacts/', {'fields': 'id,contextcontact_name'}).data['results']
+        self.assertEqual(
+            sorted(response.data), sorted([item['id'], item['contextcontact_name']] for item in serialized)
+        )
+
+    def test_prefix_filter_and_etag(self):
+        response = self.client.get('/api/tasks/projects/options/', {'q': 'eind'})
+        self.assertEqual(response.data, [[Project.objects.get(name='Eindwerk').pk, 'Eindwerk']])
+        response = self.client.get('/api/tasks/projects/options/')
+        self.assertEqual([label for _, label in response.data], ['Eindwerk', 'Website'])
+        response = self.client.get('/api/tasks/projects/options/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Project.objects.create(name='Archief')
+        response = self.client.get('/api/tasks/projects/options/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        for url in ['/api/tasks/states/options/', '/api/tasks/tags/options/', '/api/tasks/meetingrooms/options/']:
+            self.assertEqual(self.client.get(url).data, [])
+
+
+class ExportTests(APITestCase):
+    url = '/api/tasks/tasks/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        assignment = make_context_contact('Jan', 'Peeters')
+        project = Project.objects.create(name='Eindwerk')
+        state = State.objects.create(name='Bezig')
+        Task.objects.create(
+            subject='Verslag', project=project, assignment=assignment, state=state,
+            duration_registered=timedelta(hours=1, minutes=30),
+        )
+        Task.objects.create(subject='Presentatie, slides', project=project)
+
+    def test_ndjson_joins_names_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,subject,project_name,contextcontact_name,state_name,'
+                                                            'duration_registered,created_at'})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(len([query for query in queries if 'tasks_task' in query['sql']]), 1)
+        verslag = next(row for row in rows if row['subject'] == 'Verslag')
+        self.assertEqual(verslag['project_name'], 'Eindwerk')
+        self.assertEqual(verslag['contextcontact_name'], 'Jan Peeters (onbekend)')
+        self.assertEqual(verslag['state_name'], 'Bezig')
+        self.assertEqual(verslag['duration_registered'], '01:30:00')
+        detail = self.client.get(f"/api/tasks/tasks/{verslag['id']}/").data
+        self.assertEqual(verslag['created_at'], detail['created_at'])
+        presentatie = next(row for row in rows if row['subject'] == 'Presentatie, slides')
+        self.assertEqual(presentatie['contextcontact_name'], '')
+        self.assertEqual(set(verslag), {'id', 'subject', 'project_name', 'contextcontact_name', 'state_name',
+                                        'duration_registered', 'created_at'})
+
+    def test_csv_with_search(self):
+        response = self.client.get(self.url, {'format': 'csv', 'search': 'present', 'fields': 'subject,project_name'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ['subject', 'project_name'], ['Presentatie, slides', 'Eindwerk'],
+        ])
+
+    async def test_streamed_as_chunks_under_asgi(self):
+        response = await self.async_client.get(self.url, {'fields': 'subject', 'ordering': 'subject'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().splitlines(), [
+            '{"subject": "Presentatie, slides"}', '{"subject": "Verslag"}',
+        ])
+
+    def test_contacts_and_unknown_columns(self):
+        response = self.client.get('/api/contacts/export/', HTTP_ACCEPT='text/csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines()[0], 'id,firstname,lastname,date_of_birth')
+        response = self.client.get('/api/contacts/export/', {'fields': 'onbekend'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkImportTests(APITestCase):
+    url = '/api/tasks/tasks/import/'
+
+    @classmethod
+    def setUpTestData(cls):
+        make_context_contact('Jan', 'Peeters', 'ontwikkelaar')
+        project = Project.objects.create(name='Eindwerk')
+        State.objects.create(name='Bezig')
+        cls.verslag = Task.objects.create(subject='Verslag', project=project)
+
+    def test_csv_upserts_resolves_names_and_rejects(self):
+        body = '\n'.join([
+            'subject,project_name,contextcontact_name,state_name,deadline,duration_registered,full_days',
+            'Verslag,Eindwerk,Jan Peeters (ontwikkelaar),Bezig,2026-05-01T12:00:00Z,01:30:00,true',
+            'Slides,Eindwerk,,,,,',
+            'Fout,Archief,,,,,',
+            'Datum,Eindwerk,,,morgen,,',
+            ',Eindwerk,,,,,',
+            'Kort,Eindwerk',
+            'Slides,Eindwerk,,Bezig,,,',
+        ])
+        response = self.client.post(self.url, body, content_type='text/csv')
+        report = response.data
+        self.assertEqual((report['rows'], report['inserted'], report['updated'], report['rejected']), (7, 1, 1, 4))
+        self.assertEqual(report['ignored_columns'], [])
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5, 6, 7])
+        self.assertEqual(report['errors'][0]['error'], 'onbekende project_name: Archief')
+        self.assertEqual(report['errors'][1]['error'], 'ongeldige waarde voor deadline: morgen')
+
+        verslag = Task.objects.get(subject='Verslag')
+        self.assertEqual(verslag.assignment.contact.firstname, 'Jan')
+        self.assertEqual(verslag.duration_registered, timedelta(hours=1, minutes=30))
+        self.assertTrue(verslag.full_days)
+        slides = Task.objects.get(subject='Slides')
+        self.assertEqual(slides.state.name, 'Bezig')
+        self.assertFalse(slides.full_days)
+        project = Project.objects.get()
+        self.assertEqual(project.task_count, 2)
+        self.assertEqual(project.total_registered_time, timedelta(hours=1, minutes=30))
+
+    def test_lines_with_an_id_update_that_row(self):
+        duplicate = Task.objects.create(subject='Verslag', project=self.verslag.project)
+        body = '\n'.join([
+            'id,subject,project_name,git_branch',
+            f'{self.verslag.pk},Verslag,Eindwerk,main',
+            f'{duplicate.pk},Verslag v2,Eindwerk,',
+            '999999,Verslag,Eindwerk,',
+            ',Verslag,Eindwerk,',
+        ])
+        report = self.client.post(self.url, body, content_type='text/csv').data
+        self.assertEqual((report['inserted'], report['updated'], report['rejected']), (0, 2, 2))
+        self.assertEqual(report['errors'], [
+            {'line': 4, 'error': 'onbekende id: 999999'},
+            {'line': 5, 'error': 'meerdere treffers voor project_name, subject'},
+        ])
+        self.assertEqual(Task.objects.get(pk=self.verslag.pk).git_branch, 'main')
+        self.assertEqual(Task.objects.get(pk=duplicate.pk).subject, 'Verslag v2')
+
+    def test_repeated_cycle_occurrences_are_rejected(self):
+        Task.objects.create(subject='Overleg', cycle_group=3, execution_startdate=date(2025, 3, 3))
+        body = '\n'.join([
+            'subject,cycle_group,execution_startdate',
+            'Overleg,3,2025-03-03',
+            'Ander overleg,3,2025-03-03',
+            'Planning,4,2025-03-03',
+            'Planning bis,4,2025-03-03',
+            'Los,,2025-03-03',
+            'Los bis,,2025-03-03',
+        ])
+        report = self.client.post(self.url, body, content_type='text/csv').data
+        self.assertEqual((report['inserted'], report['unchanged'], report['rejected']), (3, 1, 2))
+        self.assertEqual(report['errors'], [
+            {'line': 3, 'error': 'cycle_group en execution_startdate bestaan al'},
+            {'line': 5, 'error': 'cycle_group en execution_startdate al eerder in het bestand'},
+        ])
+        self.assertEqual(Task.objects.get(cycle_group=4).subject, 'Planning')
+
+    def test_tasks_with_the_same_subject_import_back(self):
+        Task.objects.create(subject='Verslag', project=self.verslag.project, git_branch='feature')
+        exported = b''.join(
+            self.client.get('/api/tasks/tasks/export/', {'format': 'csv', 'fields': 'id,subject,project_name'})
+            .streaming_content
+        )
+        report = self.client.post(self.url, exported, content_type='text/csv').data
+        self.assertEqual((report['inserted'], report['updated'], report['unchanged'], report['rejected']), (0, 0, 2, 0))
+        self.assertEqual(Task.objects.filter(subject='Verslag').count(), 2)
+        self.assertEqual(Task.objects.get(git_branch='feature').project, self.verslag.project)
+
+    def test_ndjson_and_missing_columns(self):
+        body = '{"firstname": "An", "lastname": "Janssens", "date_of_birth": "1990-02-03"}\n' \
+               '{"firstname": "Jan", "lastname": "Peeters", "date_of_birth": "1985-07-08"}\n' \
+               'geen json\n'
+        response = self.client.post('/api/contacts/import/', body, content_type='application/x-ndjson')
+        self.assertEqual((response.data['inserted'], response.data['updated'], response.data['rejected']), (1, 1, 1))
+        self.assertEqual(Contact.objects.get(firstname='Jan').date_of_birth, date(1985, 7, 8))
+
+        response = self.client.post('/api/contacts/import/', 'firstname\nAn\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_imports_back(self):
+        exported = b''.join(self.client.get('/api/contextcontacts/export/', {'format': 'csv'}).streaming_content)
+        response = self.client.post('/api/contextcontacts/import/', exported, content_type='text/csv')
+        report = response.data
+        self.assertEqual((report['inserted'], report['updated'], report['unchanged'], report['rejected']), (0, 0, 1, 0))
+        changed = exported.decode().replace('ontwikkelaar', 'analist').encode()
+        response = self.client.post('/api/contextcontacts/import/', changed, content_type='text/csv')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(ContextContact.objects.get().function, 'analist')
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('name,street,zip,city,country\n'
+                       'Kantoor,Straat 1,9000,Gent,België\nThuis,Laan 2,1000,Brussel,België\n')
+            file.flush()
+            output = io.StringIO()
+            call_command('bulk_import', 'addresses', file.name, stdout=output)
+        self.assertIn('1 nieuw, 0 bijgewerkt, 1 ongewijzigd, 0 geweigerd', output.getvalue())
+        self.assertEqual(Address.objects.count(), 2)
+
+
+class ChangeFeedTests(APITransactionTestCase):
+    # The feed only serves committed transactions, so these tests commit.
+    url = '/api/tasks/tasks/changes/'
+
+    def test_changes_and_tombstones_after_cursor(self):
+        project = Project.objects.create(name='Eindwerk')
+        first = Task.objects.create(subject='Verslag', project=project)
+        second = Task.objects.create(subject='Slides')
+
+        response = self.client.get(self.url)
+        self.assertEqual([change['id'] for change in response.data['changes']], [first.pk, second.pk])
+        self.assertEqual(response.data['changes'][0]['object']['subject'], 'Verslag')
+        self.assertFalse(response.data['more'])
+        cursor = response.data['cursor']
+        self.assertEqual(self.client.get(self.url, {'updated_since': cursor}).data['changes'], [])
+
+        first.tags.add(Tag.objects.create(name='school'))
+        second_id = second.pk
+        second.delete()
+        Task.objects.filter(pk=first.pk).update(subject='Rapport')
+        response = self.client.get(self.url, {'updated_since': cursor})
+        changes = response.data['changes']
+        self.assertEqual(
+            [(change['id'], change['deleted']) for change in changes], [(second_id, True), (first.pk, False)]
+        )
+        self.assertIsNone(changes[0]['object'])
+        self.assertEqual(changes[1]['object']['subject'], 'Rapport')
+        self.assertEqual(len(changes[1]['object']['tags']), 1)
+        self.assertEqual(response.data['cursor'], changes[-1]['cursor'])
+
+        response = self.client.get('/api/tasks/projects/changes/', {'limit': 1})
+        self.assertEqual(response.data['changes'][0]['object']['task_count'], 1)
+        self.assertEqual(self.client.get(self.url, {'updated_since': 'gisteren'}).status_code, 400)
+
+
+class EventStreamTests(TestCase):
+    def stream(self, topic):
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/api/events/{topic}/', 'headers': []}
+        return ApplicationCommunicator(EventStream(None), scope)
+
+    async def connect(self, communicator):
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        if start['status'] == 200:
+            self.assertEqual((await communicator.receive_output(1))['body'], b'retry: 5000\n\n')
+        return start
+
+    def move_task(self, task, project):
+        with self.captureOnCommitCallbacks(execute=True):
+            task.project = project
+            task.save()
+
+    def test_subscribers_hear_about_changes_to_their_topic(self):
+        project, other = Project.objects.create(name='Eindwerk'), Project.objects.create(name='Stage')
+        task = Task.objects.create(subject='Verslag', project=other)
+
+        async def listen():
+            tasks, here = self.stream('tasks'), self.stream(f'projects/{project.pk}')
+            elsewhere = self.stream('meetings')
+            for communicator in (tasks, here, elsewhere):
+                await self.connect(communicator)
+            await sync_to_async(self.move_task)(task, project)
+            change = f'event: change\ndata: {{"resource": "tasks", "id": {task.pk}, "deleted": false}}\n\n'.encode()
+            self.assertEqual((await tasks.receive_output(1))['body'], change)
+            self.assertEqual((await here.receive_output(1))['body'], change)
+            self.assertTrue(await elsewhere.receive_nothing())
+            for communicator in (tasks, here, elsewhere):
+                await communicator.send_input({'type': 'http.disconnect'})
+                await communicator.wait(1)
+        async_to_sync(listen)()
+
+    def test_bulk_writes_are_published(self):
+        project = Project.objects.create(name='Eindwerk')
+        with mock.patch('tasks.events.task_changed') as task_changed:
+            response = self.client.post('/api/tasks/tasks/batch/', [{'subject': 'Verslag', 'project': project.pk}],
+                                        content_type='application/json')
+            task_changed.assert_called_once_with(response.json()['ids'][0], [project.pk])
+
+            task_changed.reset_mock()
+            source = Task.objects.create(subject='Stand-up', execution_startdate=date(2029, 12, 31))
+            Cycle.objects.create(source_task=source, start=date(2029, 12, 31), end=date(2030, 1, 3),
+                                 cycle_model='each', one_level='day', number=1)
+            task_changed.reset_mock()
+            self.assertEqual(materialize_cycles(today=date(2030, 1, 1), horizon_days=2), 3)
+            self.assertEqual(task_changed.call_count, 3)
+
+        with mock.patch('tasks.events.MAX_PENDING', 1), mock.patch('tasks.events.reload') as reload:
+            self.client.patch('/api/tasks/tasks/batch/', [{'id': source.pk, 'subject': 'Standup'},
+                                                          {'id': response.json()['ids'][0], 'subject': 'Rapport'}],
+                              content_type='application/json')
+            reload.assert_called_once_with('tasks', 'projects')
+
+    def test_unknown_topic_is_not_found(self):
+        async def connect():
+            return await self.connect(self.stream('contacts'))
+        self.assertEqual(async_to_sync(connect)()['status'], 404)
+
+
+class ValuesListTests(APITestCase):
+    url = '/api/tasks/tasks/'
+
+    @classmethod
+    def setUpTestData(cls):
+        assignment = make_context_contact(' Jan', 'Peeters')
+        project = Project.objects.create(name='Eindwerk')
+        room = MeetingRoom.objects.create(name='Zaal 1', capacity=4)
+        meetings = [
+            Meeting.objects.create(name=f'Overleg {day}', startdate=datetime(2025, 3, day, 9, tzinfo=timezone.utc),
+                                   meetingroom=room, digital_space='https://example.com/overleg')
+            for day in (3, 5)
+        ]
+        first = Task.objects.create(
+            subject='Verslag', project=project, assignment=assignment, state=State.objects.create(name='Bezig'),
+            location=assignment.postaladdress, attachment='bijlagen/verslag.pdf', full_days=True,
+            execution_startdate=date(2025, 3, 1), execution_starttime=datetime(2025, 3, 1, 8, 30).time(),
+            deadline=datetime(2025, 3, 7, 17, 0, 0, 123456, tzinfo=timezone.utc),
+            duration_registered=timedelta(days=1, hours=2, seconds=5), duration_projected_internal=timedelta(),
+        )
+        first.tags.set([Tag.objects.create(name='school'), Tag.objects.create(name='dringend')])
+        first.meetings.set(meetings)
+        second = Task.objects.create(subject='Slides', parent=first)
+        second.prerequisites.add(first)
+
+    def assertSameAsSerializer(self, params, url=url):
+        response = self.client.get(url, params)
+        with mock.patch('tasks.mixins.compile_fields', return_value=None):
+            expected = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_same_bytes_as_the_serializer(self):
+        for params in [
+            {}, {'ordering': 'subject'}, {'page_size': 1}, {'search': 'verslag'}, {'pagination': 'cursor'},
+            {'fields': 'id,project_name,contextcontact_name,tags'}, {'omit': 'meetings,deadline'},
+        ]:
+            with self.subTest(params=params):
+                response = self.assertSameAsSerializer(params)
+        next_page = self.assertSameAsSerializer({'pagination': 'cursor', 'page_size': 1}).data['next']
+        self.assertSameAsSerializer({}, url=next_page)
+
+        row = next(row for row in response.data['results'] if row['subject'] == 'Verslag')
+        self.assertEqual(row['contextcontact_name'], 'Jan Peeters (onbekend)')
+        self.assertEqual(row['attachment'], 'http://testserver/bijlagen/verslag.pdf')
+        self.assertNotIn('project_name', next(row for row in response.data['results'] if row['subject'] == 'Slides'))
+
+    def test_one_query_per_many_to_many_field(self):
+        lookups.table(State)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'omit': 'prerequisites'})
+        # Count, page ids and their changes for the ETag, then count, page, tags and meetings.
+        self.assertEqual(len(queries), 7)
+        # The count selects the ids only, so PostgreSQL drops the joins of the page query.
+        self.assertIn('SELECT "tasks_task"."id" AS "pk" FROM', queries[3]['sql'])
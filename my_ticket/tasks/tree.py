@@ -0,0 +1,199 @@
+"""Subtrees of the ``Task.parent`` hierarchy with rollups.
+
+A subtree is fetched in one query: a recursive CTE over ``parent_id`` by
+default, or, with ``settings.TASK_TREE_PATHS`` enabled, a prefix scan over the
+materialized ``Task.path`` (``"<root id>/<child id>/.../"``), which the
+``text_pattern_ops`` index answers for trees of any depth. Paths are kept up to
+date on save while the setting is on, and for the subtrees a bulk write
+touches; ``rebuild_task_paths`` fills them in after enabling it.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+from .models import Task
+
+COLUMNS = ['id', 'parent_id', 'subject', 'state_id', 'duration_registered', 'deadline']
+
+
+def paths_enabled():
+    return getattr(settings, 'TASK_TREE_PATHS', False)
+
+
+def fetch_subtree(root_id):
+    """The rows of the subtree under ``root_id``, itself included, as dicts."""
+    if paths_enabled():
+        root_path = Task.objects.filter(pk=root_id).values_list('path', flat=True).first()
+        if not root_path:
+            return []
+        return list(Task.objects.filter(path__startswith=root_path).values(*COLUMNS))
+
+    table = Task._meta.db_table
+    columns = ', '.join(f't.{column}' for column in COLUMNS)
+    # UNION rather than UNION ALL, so a loop in the parents cannot recurse forever.
+    sql = f"""
+        WITH RECURSIVE subtree AS (
+            SELECT {', '.join(COLUMNS)} FROM {table} WHERE id = %s
+            UNION
+            SELECT {columns} FROM {table} t JOIN subtree s ON t.parent_id = s.id
+        )
+        SELECT {', '.join(COLUMNS)} FROM subtree
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [root_id])
+        return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def rollup(rows, root_id):
+    """Order the subtree breadth-first from ``root_id`` and add a ``rollup`` to every row.
+
+    ``subtask_count`` counts the descendants of a node; ``duration_registered``,
+    ``state_counts`` (per ``State`` id) and ``earliest_deadline`` aggregate the
+    node together with its descendants.
+    """
+    children = {}
+    nodes = {}
+    for row in rows:
+        nodes[row['id']] = row
+        children.setdefault(row['parent_id'], []).append(row)
+    if root_id not in nodes:
+        return []
+
+    ordered = [nodes[root_id]]
+    seen = {root_id}
+    for row in ordered:
+        for child in sorted(children.get(row['id'], []), key=lambda child: child['id']):
+            if child['id'] not in seen:
+                seen.add(child['id'])
+                ordered.append(child)
+
+    for row in ordered:
+        row['rollup'] = {
+            'subtask_count': 0,
+            'duration_registered': row['duration_registered'],
+            'state_counts': {row['state_id']: 1} if row['state_id'] is not None else {},
+            'earliest_deadline': row['deadline'],
+        }
+
+    for row in reversed(ordered[1:]):
+        own, total = row['rollup'], nodes[row['parent_id']]['rollup']
+        total['subtask_count'] += own['subtask_count'] + 1
+        if own['duration_registered'] is not None:
+            total['duration_registered'] = (total['duration_registered'] or datetime.timedelta()) + \
+                own['duration_registered']
+        for state_id, count in own['state_counts'].items():
+            total['state_counts'][state_id] = total['state_counts'].get(state_id, 0) + count
+        if own['earliest_deadline'] is not None and (
+            total['earliest_deadline'] is None or own['earliest_deadline'] < total['earliest_deadline']
+        ):
+            total['earliest_deadline'] = own['earliest_deadline']
+    return ordered
+
+
+def is_in_subtree(root_id, task_id):
+    """Whether ``task_id`` is ``root_id`` or one of its descendants."""
+    if root_id == task_id:
+        return True
+    table = Task._meta.db_table
+    sql = f"""
+        WITH RECURSIVE ancestors(id, parent_id) AS (
+            SELECT id, parent_id FROM {table} WHERE id = %s
+            UNION
+            SELECT t.id, t.parent_id FROM {table} t JOIN ancestors a ON t.id = a.parent_id
+        )
+        SELECT EXISTS (SELECT 1 FROM ancestors WHERE id = %s)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [task_id, root_id])
+        return cursor.fetchone()[0]
+
+
+def loops_in_batch(parents):
+    """The tasks whose new parent would put them under themselves, checked for a whole batch in one query.
+
+    ``parents`` maps a task id to its new parent id (or ``None``); the stored
+    parents of the other tasks are used for the rest of the tree.
+    """
+    if not any(parent_id is not None for parent_id in parents.values()):
+        return set()
+    table = Task._meta.db_table
+    sql = f"""
+        WITH RECURSIVE batch(id, parent_id) AS (
+            SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+        ), parents(id, parent_id) AS (
+            SELECT id, parent_id FROM batch
+            UNION ALL
+            SELECT id, parent_id FROM {table} WHERE id <> ALL(%s::bigint[])
+        ), ancestors(origin, id) AS (
+            SELECT id, parent_id FROM batch WHERE parent_id IS NOT NULL
+            UNION
+            SELECT a.origin, p.parent_id FROM ancestors a JOIN parents p ON p.id = a.id WHERE p.parent_id IS NOT NULL
+        )
+        SELECT DISTINCT origin FROM ancestors WHERE id = origin
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(parents), list(parents.values()), list(parents)])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def update_path(task):
+    """Recompute the path of ``task`` and move its descendants along, in at most three queries."""
+    parent_path = ''
+    if task.parent_id is not None:
+        parent_path = Task.objects.filter(pk=task.parent_id).values_list('path', flat=True).first() or ''
+    path = f'{parent_path}{task.pk}/'
+    if task.path == path:
+        return
+
+    old_path = task.path
+    Task.objects.filter(pk=task.pk).update(path=path)
+    if old_path:
+        Task.objects.filter(path__startswith=old_path).exclude(pk=task.pk).update(
+            path=Concat(Value(path), Substr('path', len(old_path) + 1))
+        )
+    task.path = path
+
+
+def update_paths(root_ids):
+    """Recompute the paths of the subtrees under ``root_ids`` with one recursive update.
+
+    A subtree inside another one is reached from both roots; the path from the
+    outermost root, the longest walk, is the one kept.
+    """
+    if not root_ids:
+        return 0
+    table = Task._meta.db_table
+    sql = f"""
+        WITH RECURSIVE paths(id, path, depth) AS (
+            SELECT t.id, COALESCE(p.path, '') || t.id::text || '/', 0
+            FROM {table} t LEFT JOIN {table} p ON p.id = t.parent_id
+            WHERE t.id = ANY(%s::bigint[])
+            UNION ALL
+            SELECT t.id, p.path || t.id::text || '/', p.depth + 1 FROM {table} t JOIN paths p ON t.parent_id = p.id
+        )
+        UPDATE {table} SET path = paths.path
+        FROM (SELECT DISTINCT ON (id) id, path FROM paths ORDER BY id, depth DESC) paths
+        WHERE {table}.id = paths.id AND {table}.path IS DISTINCT FROM paths.path
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(root_ids)])
+        return cursor.rowcount
+
+
+def rebuild_paths():
+    """Recompute every path with one recursive update; returns the number of tasks."""
+    table = Task._meta.db_table
+    sql = f"""
+        WITH RECURSIVE paths(id, path) AS (
+            SELECT id, id::text || '/' FROM {table} WHERE parent_id IS NULL
+            UNION ALL
+            SELECT t.id, p.path || t.id::text || '/' FROM {table} t JOIN paths p ON t.parent_id = p.id
+        )
+        UPDATE {table} SET path = paths.path FROM paths WHERE {table}.id = paths.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.rowcount
@@ -16,5 +16,7 @@ router.register(r'tasks/meetingcontextcontacts', views.MeetingContextContactView
 router.register(r'tasks/projects', views.ProjectViewSet, basename='project')
 router.register(r'tasks/tasks', views.TaskViewSet, basename='task')
 router.register(r'tasks/cycles', views.CycleViewSet, basename='cycle')
+router.register(r'tasks/calendar', views.CalendarViewSet, basename='calendar')
+router.register(r'tasks/slots', views.FreeSlotViewSet, basename='slot')
 
 urlpatterns = router.urls
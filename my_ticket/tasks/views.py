@@ -1,4 +1,24 @@
-from rest_framework import viewsets, filters
+import datetime
+
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_duration
+from django.utils.duration import duration_string
+from rest_framework import viewsets, filters, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from common.export import streaming_response
+from common.filters import FullTextSearchFilter, TrigramSimilarityFilter
+from common.mixins import (
+    BatchMixin, ChangeFeedMixin, ConditionalGetMixin, ExportMixin, ImportMixin, OptionsMixin, SparseFieldsetMixin,
+    TypeaheadMixin
+)
+from contacts.models import ContextContact, address_name, contextcontact_name
+from . import bookings, dag, events, rollups, tree
+from .calendar import calendar_entries, stream_json
+from .imports import SPECS
+from .mixins import LookupCacheMixin, ValuesListMixin
 from .models import (
     Action, Context, State, Tag, TaskType, MeetingRoom, Meeting,
     MeetingAcceptance, MeetingContextContact, Project, Task, Cycle
@@ -7,89 +27,384 @@ from .serializers import (
     ActionSerializer, ContextSerializer, StateSerializer, TagSerializer,
     TaskTypeSerializer, MeetingRoomSerializer, MeetingSerializer,
     MeetingAcceptanceSerializer, MeetingContextContactSerializer,
-    ProjectSerializer, TaskSerializer, CycleSerializer
+    ProjectSerializer, TaskSerializer, CycleSerializer, OCCURRENCE_TAKEN, PARENT_LOOP, PREREQUISITE_LOOP,
+    cycle_occurrence
 )
+from .slots import find_slots
 
 
-class ActionViewSet(viewsets.ModelViewSet):
+class ActionViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, viewsets.ModelViewSet
+):
     queryset = Action.objects.all()
     serializer_class = ActionSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 
-class ContextViewSet(viewsets.ModelViewSet):
+class ContextViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, viewsets.ModelViewSet
+):
     queryset = Context.objects.all()
     serializer_class = ContextSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 
-class StateViewSet(viewsets.ModelViewSet):
+class StateViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, OptionsMixin, viewsets.ModelViewSet
+):
     queryset = State.objects.all()
     serializer_class = StateSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, OptionsMixin, viewsets.ModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 
-class TaskTypeViewSet(viewsets.ModelViewSet):
+class TaskTypeViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, viewsets.ModelViewSet
+):
     queryset = TaskType.objects.all()
     serializer_class = TaskTypeSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['subject', 'deadline']
 
 
-class MeetingRoomViewSet(viewsets.ModelViewSet):
+class MeetingRoomViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, OptionsMixin, TypeaheadMixin,
+    viewsets.ModelViewSet
+):
     queryset = MeetingRoom.objects.all()
     serializer_class = MeetingRoomSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, TrigramSimilarityFilter]
     search_fields = ['name', 'capacity']
+    trigram_fields = ['name']
 
 
-class MeetingViewSet(viewsets.ModelViewSet):
-    queryset = Meeting.objects.all()
+class MeetingViewSet(SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Meeting.objects.prefetch_related(Prefetch('contacts', queryset=ContextContact.objects.only('id')))
     serializer_class = MeetingSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'meetingroom']
+    etag_relations = ['meetingroom']
+    export_fields = ['id', 'name', 'startdate', 'enddate', 'meetingroom', 'meetingroom_name', 'digital_space']
+    export_expressions = {'meetingroom_name': F('meetingroom__name')}
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """Meetings that clash with a proposed booking of ``?meetingroom=`` from ``?start=`` to ``?end=``.
+
+        Pass ``?exclude=`` with the id of the meeting being edited to leave it out.
+        """
+        params = request.query_params
+        try:
+            start = parse_datetime(params.get('start', ''))
+            end = parse_datetime(params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise ValidationError({'start': 'Geef een geldig begin en einde (jjjj-mm-ddTuu:mm).'})
+        if end < start:
+            raise ValidationError({'end': 'Het einde ligt voor het begin.'})
+        if not params.get('meetingroom', '').isdigit():
+            raise ValidationError({'meetingroom': 'Geef een geldig lokaal.'})
+        exclude = params.get('exclude')
+        if exclude is not None and not exclude.isdigit():
+            raise ValidationError({'exclude': 'Geef een geldige vergadering.'})
 
+        meetings = bookings.conflicts(self.get_queryset(), int(params['meetingroom']), start, end, exclude)
+        return Response(self.get_serializer(meetings, many=True).data)
 
-class MeetingAcceptanceViewSet(viewsets.ModelViewSet):
+
+class MeetingAcceptanceViewSet(
+    LookupCacheMixin, SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, viewsets.ModelViewSet
+):
     queryset = MeetingAcceptance.objects.all()
     serializer_class = MeetingAcceptanceSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
 
-class MeetingContextContactViewSet(viewsets.ModelViewSet):
+class MeetingContextContactViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = MeetingContextContact.objects.all()
     serializer_class = MeetingContextContactSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['contextcontact', 'meeting', 'status']
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(SparseFieldsetMixin, ConditionalGetMixin, ChangeFeedMixin, OptionsMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'startdate', 'enddate', 'total_projected_time_internal', 'total_projected_time_external']
 
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        """Dependency order, critical path and earliest start/finish of the project's tasks."""
+        project = self.get_object()
+        try:
+            plan = dag.schedule(*dag.load_project_graph(project.pk))
+        except dag.CycleError as error:
+            return Response({'detail': str(error), 'tasks': sorted(error.task_ids)}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'order': plan['order'],
+            'critical_path': plan['critical_path'],
+            'duration': duration_string(plan['duration']),
+            'tasks': [
+                {
+                    'id': task_id,
+                    'earliest_start': duration_string(plan['earliest_start'][task_id]),
+                    'earliest_finish': duration_string(plan['earliest_finish'][task_id]),
+                }
+                for task_id in plan['order']
+            ],
+        })
 
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all()
+
+class TaskViewSet(
+    SparseFieldsetMixin, ConditionalGetMixin, ValuesListMixin, BatchMixin, ChangeFeedMixin, ExportMixin, ImportMixin,
+    viewsets.ModelViewSet
+):
+    queryset = Task.objects.select_related(
+        'project', 'assignment__contact'
+    ).prefetch_related('tags', 'meetings', 'prerequisites')
     serializer_class = TaskSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    import_spec = SPECS['tasks']
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
     search_fields = ["subject"]
     ordering_fields = ["deadline", "subject", "created_at"]
     ordering = ["-deadline"]
+    # The rows behind project_name, contextcontact_name and the lookup names.
+    etag_relations = ['project', 'assignment', 'assignment__contact', 'action', 'context', 'tasktype', 'state']
+    export_fields = [
+        'id', 'subject', 'project', 'project_name', 'assignment', 'contextcontact_name', 'parent',
+        'action', 'action_name', 'context', 'context_name', 'tasktype', 'tasktype_name', 'state', 'state_name',
+        'location', 'location_name', 'execution_startdate', 'execution_starttime', 'execution_enddate',
+        'execution_endtime', 'full_days', 'deadline', 'duration_projected_internal', 'duration_projected_external',
+        'duration_registered', 'cycle_group', 'git_branch', 'created_at', 'updated_at',
+    ]
+    export_expressions = {
+        'project_name': F('project__name'),
+        'contextcontact_name': contextcontact_name('assignment__'),
+        'action_name': F('action__name'),
+        'context_name': F('context__name'),
+        'tasktype_name': F('tasktype__name'),
+        'state_name': F('state__name'),
+        'location_name': address_name('location__'),
+    }
+
+    def validate_batch(self, items, instances=None):
+        """Also reject items for the same cycle occurrence, and parents and prerequisites that close a loop."""
+        validated = super().validate_batch(items, instances)
+        positions = {}
+        for position, attrs in enumerate(validated):
+            occurrence = cycle_occurrence(attrs, instances[position] if instances is not None else None)
+            if occurrence is not None:
+                positions.setdefault(occurrence, []).append(position)
+        repeated = [position for same in positions.values() for position in same[1:]]
+        if repeated:
+            raise ValidationError({'errors': {
+                position: {'execution_startdate': [OCCURRENCE_TAKEN]} for position in sorted(repeated)
+            }})
+        if instances is None:
+            # New tasks have no ids anything could point back to.
+            return validated
+        parents = {
+            task.pk: attrs['parent'].pk if attrs['parent'] is not None else None
+            for task, attrs in zip(instances, validated) if 'parent' in attrs
+        }
+        prerequisites = {
+            task.pk: [prerequisite.pk for prerequisite in attrs['prerequisites']]
+            for task, attrs in zip(instances, validated) if 'prerequisites' in attrs
+        }
+        loops = {
+            'parent': (tree.loops_in_batch(parents), PARENT_LOOP),
+            'prerequisites': (dag.cycles_in_batch(prerequisites), PREREQUISITE_LOOP),
+        }
+        errors = {}
+        for position, (task, attrs) in enumerate(zip(instances, validated)):
+            for field, (task_ids, message) in loops.items():
+                if field in attrs and task.pk in task_ids:
+                    errors.setdefault(position, {})[field] = [message]
+        if errors:
+            raise ValidationError({'errors': errors})
+        return validated
 
+    def perform_batch_create(self, objects):
+        super().perform_batch_create(objects)
+        rollups.tasks_created(objects)
+        if tree.paths_enabled():
+            tree.update_paths([task.pk for task in objects])
+        events.tasks_changed({task.pk: [task.project_id] for task in objects})
 
-class CycleViewSet(viewsets.ModelViewSet):
+    def perform_batch_update(self, objects, fields):
+        before = rollups.stored_values_in_bulk([task.pk for task in objects])
+        super().perform_batch_update(objects, fields)
+        rollups.tasks_updated(before, objects)
+        if tree.paths_enabled() and 'parent' in fields:
+            tree.update_paths([task.pk for task in objects])
+        events.tasks_changed({task.pk: [before[task.pk]['project_id'], task.project_id] for task in objects})
+
+    def perform_batch_destroy(self, queryset):
+        with rollups.deferred():
+            super().perform_batch_destroy(queryset)
+
+    @action(detail=True, methods=['get'])
+    def tree(self, request, pk=None):
+        """The task with all its subtasks, flat and breadth-first, each with rollups over its own subtree."""
+        try:
+            root_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        rows = tree.rollup(tree.fetch_subtree(root_id), root_id)
+        if not rows:
+            raise NotFound()
+
+        deadline = serializers.DateTimeField()
+
+        def duration(value):
+            return duration_string(value) if value is not None else None
+
+        def moment(value):
+            return deadline.to_representation(value) if value is not None else None
+
+        return Response([
+            {
+                'id': row['id'],
+                'parent': row['parent_id'],
+                'subject': row['subject'],
+                'state': row['state_id'],
+                'deadline': moment(row['deadline']),
+                'duration_registered': duration(row['duration_registered']),
+                'rollup': {
+                    'subtask_count': row['rollup']['subtask_count'],
+                    'duration_registered': duration(row['rollup']['duration_registered']),
+                    'state_counts': row['rollup']['state_counts'],
+                    'earliest_deadline': moment(row['rollup']['earliest_deadline']),
+                },
+            }
+            for row in rows
+        ])
+
+
+class CycleViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Cycle.objects.all()
     serializer_class = CycleSerializer
+
+
+class CalendarViewSet(viewsets.ViewSet):
+    """Tasks, meetings and cycle occurrences between ``?start=`` and ``?end=``, in date order.
+
+    Optionally narrowed to one ``?project=`` or ``?assignment=`` (context
+    contact). The response is streamed, cycles are expanded on the fly.
+    """
+    max_window_days = 400
+
+    def get_window(self, request):
+        try:
+            start = parse_date(request.query_params.get('start', ''))
+            end = parse_date(request.query_params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise ValidationError({'start': 'Geef een geldige start- en einddatum (jjjj-mm-dd).'})
+        if end < start:
+            raise ValidationError({'end': 'De einddatum ligt voor de startdatum.'})
+        if end - start > datetime.timedelta(days=self.max_window_days):
+            raise ValidationError({'end': f'Het venster is beperkt tot {self.max_window_days} dagen.'})
+        return start, end
+
+    @staticmethod
+    def get_id(request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Geef een geldig id (een getal).'})
+
+    def list(self, request):
+        start, end = self.get_window(request)
+        tasks, meetings, cycles = Task.objects.all(), Meeting.objects.all(), Cycle.objects.all()
+
+        project = self.get_id(request, 'project')
+        if project is not None:
+            tasks = tasks.filter(project_id=project)
+            meetings = meetings.filter(pk__in=Task.objects.filter(project_id=project).values('meetings'))
+            cycles = cycles.filter(source_task__project_id=project)
+        assignment = self.get_id(request, 'assignment')
+        if assignment is not None:
+            tasks = tasks.filter(assignment_id=assignment)
+            meetings = meetings.filter(
+                pk__in=MeetingContextContact.objects.filter(contextcontact_id=assignment).values('meeting')
+            )
+            cycles = cycles.filter(source_task__assignment_id=assignment)
+
+        entries = calendar_entries(start, end, tasks=tasks, meetings=meetings, cycles=cycles)
+        return streaming_response(request, stream_json(entries), 'application/json')
+
+
+class FreeSlotViewSet(viewsets.ViewSet):
+    """The first free slots for a meeting of ``?participants=`` (context contact ids, comma separated).
+
+    A slot lasts ``?duration=`` (``uu:mm:ss``), lies between ``?start=`` and
+    ``?end=``, keeps every participant free of meetings and timed tasks and
+    comes with the smallest free room of at least ``?capacity=`` seats.
+    ``?limit=`` slots are returned (5 by default).
+    """
+    max_window_days = 92
+    default_limit = 5
+    max_limit = 50
+
+    @staticmethod
+    def moment(value, field):
+        try:
+            moment = parse_datetime(value or '')
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({field: 'Geef een geldig tijdstip (jjjj-mm-ddTuu:mm).'})
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+    @staticmethod
+    def number(value, field, default):
+        if value in (None, ''):
+            return default
+        if not value.isdigit():
+            raise ValidationError({field: 'Geef een positief geheel getal.'})
+        return int(value)
+
+    def list(self, request):
+        params = request.query_params
+        start, end = self.moment(params.get('start'), 'start'), self.moment(params.get('end'), 'end')
+        if end <= start:
+            raise ValidationError({'end': 'Het einde ligt voor het begin.'})
+        if end - start > datetime.timedelta(days=self.max_window_days):
+            raise ValidationError({'end': f'Het venster is beperkt tot {self.max_window_days} dagen.'})
+
+        duration = parse_duration(params.get('duration', ''))
+        if duration is None or duration <= datetime.timedelta():
+            raise ValidationError({'duration': 'Geef een geldige duur (uu:mm:ss).'})
+
+        participants = [pk for pk in params.get('participants', '').split(',') if pk]
+        if not all(pk.isdigit() for pk in participants):
+            raise ValidationError({'participants': 'Geef de deelnemers als lijst van id\'s.'})
+
+        capacity = self.number(params.get('capacity'), 'capacity', 0)
+        limit = min(self.number(params.get('limit'), 'limit', self.default_limit), self.max_limit) or 1
+
+        slots = find_slots([int(pk) for pk in participants], duration, start, end, capacity, limit)
+        return Response([
+            {'start': slot_start, 'end': slot_end, 'meetingroom': room.pk, 'meetingroom_name': room.name}
+            for slot_start, slot_end, room in slots
+        ])